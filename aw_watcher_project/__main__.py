@@ -1,22 +1,284 @@
+import datetime
+from pathlib import Path
+from typing import List, Optional
+
 import typer
 
 from aw_watcher_project import autostart
-from aw_watcher_project.app import ProjectWatcherApp
+from aw_watcher_project.config import DEFAULT_CONFIG_PATH
+from aw_watcher_project.profiling import PROFILE_ENV_VAR
 
 app = typer.Typer()
 app.add_typer(autostart.app, name="autostart")
 
 
 @app.callback(invoke_without_command=True)
-def main(ctx: typer.Context):
+def main(
+    ctx: typer.Context,
+    profile: bool = typer.Option(
+        False,
+        envvar=PROFILE_ENV_VAR,
+        help="Profile the command in all threads, writing the results to the "
+        "profiles folder in the config folder",
+    ),
+    metrics_file: Optional[Path] = typer.Option(
+        None,
+        help="Write the metrics of the tray or command to this file for the "
+        "Prometheus textfile collector, while it runs and on exit",
+    ),
+):
     """
     Run command without arguments to start the system tray GUI.
-    Use the autostart subcommand to bootstrap or remove auto-start behavior
+    Use the daemon subcommand to run without a GUI and select to switch
+    projects in it. Use the autostart subcommand to bootstrap or remove
+    auto-start behavior
     """
+    if profile:
+        from aw_watcher_project.profiling import ProfileSession
+
+        session = ProfileSession(name=ctx.invoked_subcommand or "tray")
+        session.start()
+        ctx.call_on_close(session.stop)
+    if metrics_file is not None:
+        from aw_watcher_project.metrics import TextfileWriter
+
+        writer = TextfileWriter(metrics_file)
+        writer.start()
+        ctx.call_on_close(writer.stop)
     if ctx.invoked_subcommand is None:
-        # Ran without arguments, start GUI
+        # Ran without arguments, start GUI. Imported here so that subcommands
+        # do not load Qt and the ActivityWatch client
+        from aw_watcher_project.app import ProjectWatcherApp
+        from aw_watcher_project.profiling import install_dump_handler
+
+        install_dump_handler(name="tray")
         ProjectWatcherApp()
 
 
+@app.command()
+def daemon(
+    interval: float = typer.Option(5, help="Seconds between heartbeats"),
+    config: Path = typer.Option(DEFAULT_CONFIG_PATH, help="Projects config file"),
+    socket: Optional[Path] = typer.Option(None, help="Control socket path"),
+    auto_select: bool = typer.Option(
+        False, help="Select projects from the current window using rules in the config"
+    ),
+    metrics_file: Optional[Path] = typer.Option(
+        None, help="Write metrics to this file for the Prometheus textfile collector"
+    ),
+    metrics_interval: float = typer.Option(15, help="Seconds between metrics file writes"),
+):
+    """
+    Run without a GUI, selecting projects with the select command
+    """
+    from aw_watcher_project.daemon import run_daemon
+    from aw_watcher_project.ipc import DEFAULT_SOCKET_PATH
+    from aw_watcher_project.profiling import install_dump_handler
+
+    install_dump_handler(name="daemon")
+    run_daemon(
+        config,
+        socket or DEFAULT_SOCKET_PATH,
+        interval=interval,
+        auto_select=auto_select,
+        metrics_file=metrics_file,
+        metrics_interval=metrics_interval,
+    )
+
+
+@app.command()
+def select(
+    project: Optional[str] = typer.Argument(
+        None, help="Project to select, leave out to select no project"
+    ),
+    add: bool = typer.Option(False, help="Add the project if it does not exist"),
+    socket: Optional[Path] = typer.Option(None, help="Control socket path"),
+):
+    """
+    Select the project in a running daemon
+    """
+    from aw_watcher_project import ipc
+
+    _run_ipc(lambda path: ipc.select(project, add=add, socket_path=path), socket)
+
+
+@app.command()
+def status(socket: Optional[Path] = typer.Option(None, help="Control socket path")):
+    """
+    Show the project selected in a running daemon
+    """
+    from aw_watcher_project import ipc
+
+    response = _run_ipc(ipc.status, socket)
+    typer.echo(response["project"] or "N/A")
+
+
+@app.command()
+def metrics(
+    json_output: bool = typer.Option(False, "--json", help="Print a JSON snapshot"),
+    socket: Optional[Path] = typer.Option(None, help="Control socket path"),
+):
+    """
+    Show the metrics of a running daemon in the Prometheus text format
+    """
+    import json
+
+    from aw_watcher_project import ipc
+    from aw_watcher_project.metrics import prometheus_text
+
+    snapshot = _run_ipc(ipc.metrics, socket)["metrics"]
+    if json_output:
+        typer.echo(json.dumps(snapshot, indent=2))
+    else:
+        typer.echo(prometheus_text(snapshot), nl=False)
+
+
+@app.command()
+def backfill(
+    begin: datetime.datetime = typer.Argument(..., help="Start of the range to backfill"),
+    end: datetime.datetime = typer.Argument(..., help="End of the range to backfill"),
+    config: Path = typer.Option(DEFAULT_CONFIG_PATH, help="Config file with the rules"),
+    workers: Optional[int] = typer.Option(None, help="Processes, defaults to the CPU count"),
+):
+    """
+    Attribute past window activity to projects using the auto-select rules,
+    for time when no project was selected
+    """
+    from aw_watcher_project.backfill import backfill as run_backfill
+    from aw_watcher_project.client import get_client
+    from aw_watcher_project.config import ProjectWatcherConfig
+    from aw_watcher_project.exc import RuleException
+
+    rules = ProjectWatcherConfig(config).rules
+    if not rules:
+        typer.echo(f"No rules in {config}", err=True)
+        raise typer.Exit(1)
+    local = datetime.datetime.now().astimezone().tzinfo
+    try:
+        result = run_backfill(
+            get_client(),
+            rules,
+            begin.replace(tzinfo=begin.tzinfo or local),
+            end.replace(tzinfo=end.tzinfo or local),
+            max_workers=workers,
+        )
+    except RuleException as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
+    typer.echo(
+        f"Added {result.spans} project events from {result.window_events} window events"
+    )
+
+
+@app.command()
+def export(
+    output: Path = typer.Argument(
+        ..., help="File to write, .csv, .ndjson or .parquet, or - for standard output"
+    ),
+    begin: Optional[datetime.datetime] = typer.Option(
+        None, help="Start of the range, defaults to when the watcher was first run"
+    ),
+    end: Optional[datetime.datetime] = typer.Option(None, help="End of the range, defaults to today"),
+    format: Optional[str] = typer.Option(
+        None, help="csv, ndjson or parquet, defaults to the file suffix"
+    ),
+    windows: bool = typer.Option(
+        False, help="Split events by window, adding app and title columns"
+    ),
+    flood_time: Optional[float] = typer.Option(
+        None, help="Join events with gaps of up to this many seconds"
+    ),
+    chunk: str = typer.Option("week", help="Time read at once: day, week or month"),
+):
+    """
+    Export not-AFK project events, streaming them in chunks of time
+    """
+    from aw_watcher_project.exc import ExportException
+    from aw_watcher_project.export import export_events
+
+    local = datetime.datetime.now().astimezone().tzinfo
+    try:
+        rows = export_events(
+            str(output),
+            format=format,
+            begin=begin and begin.replace(tzinfo=begin.tzinfo or local),
+            end=end and end.replace(tzinfo=end.tzinfo or local),
+            flood_time=flood_time,
+            chunk=chunk,
+            windows=windows,
+        )
+    except ExportException as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
+    if str(output) != "-":
+        typer.echo(f"Exported {rows} rows to {output}", err=True)
+
+
+@app.command()
+def report(
+    begin: Optional[datetime.datetime] = typer.Option(
+        None, help="First day, defaults to six days before the last"
+    ),
+    end: Optional[datetime.datetime] = typer.Option(None, help="Last day, defaults to today"),
+    project: Optional[List[str]] = typer.Option(
+        None, "--project", "-p", help="Only report this project, can be repeated"
+    ),
+    by: str = typer.Option("project", help="Totals by project, day or week"),
+    top: int = typer.Option(5, help="Apps and titles shown per project, 0 for none"),
+    json_output: bool = typer.Option(False, "--json", help="Print the report as JSON"),
+    follow: bool = typer.Option(
+        False, help="Refresh the report, rereading only the days in progress"
+    ),
+    interval: float = typer.Option(60, help="Seconds between refreshes with --follow"),
+    cache: bool = typer.Option(True, help="Use the aggregates stored for elapsed days"),
+):
+    """
+    Show time spent by project, day or week with the top apps and titles of
+    each project
+    """
+    import json
+
+    from aw_watcher_project.report import GROUPS, follow_report, get_report
+
+    if by not in GROUPS:
+        typer.echo(f"--by must be one of {', '.join(GROUPS)}", err=True)
+        raise typer.Exit(1)
+    options = dict(
+        begin=begin and begin.date(),
+        end=end and end.date(),
+        projects=set(project) if project else None,
+        windows=top > 0,
+        use_cache=cache,
+    )
+
+    def show(result):
+        if json_output:
+            typer.echo(json.dumps(result.to_dict(top), indent=None if follow else 2))
+        else:
+            typer.echo(result.format_table(by, top))
+
+    if not follow:
+        show(get_report(**options))
+        return
+    try:
+        for result in follow_report(interval=interval, **options):
+            if not json_output:
+                typer.clear()
+            show(result)
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_ipc(func, socket: Optional[Path]) -> dict:
+    from aw_watcher_project import ipc
+    from aw_watcher_project.exc import DaemonException
+
+    try:
+        return func(socket or ipc.DEFAULT_SOCKET_PATH)
+    except DaemonException as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(1)
+
+
 if __name__ == "__main__":
     app()
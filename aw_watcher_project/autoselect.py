@@ -0,0 +1,130 @@
+import threading
+from typing import Callable, List, Optional
+
+import requests
+from aw_client import ActivityWatchClient
+
+from aw_watcher_project.buckets import WINDOW_BUCKET_PREFIX, find_bucket
+from aw_watcher_project.client import SharedActivityWatchClient
+from aw_watcher_project.config import ProjectWatcherConfig, RuleData
+from aw_watcher_project.events.window import WindowEvent
+from aw_watcher_project.exc import RuleException
+from aw_watcher_project.logger import logger
+from aw_watcher_project.rules import RuleSet
+
+AUTO_SELECT_CLIENT_NAME = "aw-watcher-project-auto-select"
+DEFAULT_POLL_INTERVAL = 1
+
+
+class AutoSelectWatcher:
+    """
+    Polls the current window from the window watcher's bucket and selects the
+    project of the first config rule it matches
+
+    ``on_select`` is only called when the matched project changes, so a
+    project selected by hand stays until the window matches another rule.
+    Windows matching no rule keep the current project unless
+    ``clear_unmatched`` is set. Rules are rebuilt when the config is edited.
+    """
+
+    def __init__(
+        self,
+        client: ActivityWatchClient,
+        config: ProjectWatcherConfig,
+        on_select: Callable[[Optional[str]], None],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        bucket_prefix: str = WINDOW_BUCKET_PREFIX,
+        clear_unmatched: bool = False,
+    ):
+        self.client = client
+        self.config = config
+        self.on_select = on_select
+        self.poll_interval = poll_interval
+        self.bucket_prefix = bucket_prefix
+        self.clear_unmatched = clear_unmatched
+        self.matched: Optional[str] = None
+        self._rules_data: Optional[List[RuleData]] = None
+        self._rules = RuleSet([])
+        self._bucket_id: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._update_rules()
+
+    @property
+    def rules(self) -> RuleSet:
+        return self._rules
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="auto-select", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 0):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and timeout != 0:
+            thread.join(timeout)
+
+    def poll(self) -> Optional[str]:
+        """
+        Matches the current window, selecting its project if it changed, and
+        returns the matched project
+        """
+        self.config.reload_if_changed()
+        self._update_rules()
+        window = self._current_window()
+        project = None if window is None else self._rules.match_event(window)
+        if project != self.matched:
+            self.matched = project
+            if project is not None or self.clear_unmatched:
+                logger.debug(f"Window matched project {project}")
+                self.on_select(project)
+        return project
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except requests.RequestException as e:
+                logger.debug(f"Could not get current window: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _update_rules(self):
+        if self.config.rules is self._rules_data:
+            return
+        self._rules_data = self.config.rules
+        try:
+            self._rules = RuleSet.from_config(self.config)
+        except RuleException as e:
+            logger.error(f"Keeping previous auto-select rules: {e}")
+            return
+        logger.info(f"Loaded {len(self._rules)} auto-select rules")
+
+    def _current_window(self) -> Optional[WindowEvent]:
+        if self._bucket_id is None:
+            self._bucket_id = find_bucket(self.client.get_buckets(), self.bucket_prefix)
+            if self._bucket_id is None:
+                return None
+        events = self.client.get_events(self._bucket_id, limit=1)
+        if not events:
+            return None
+        return WindowEvent.from_aw_event(events[0])
+
+
+def create_auto_select_watcher(
+    config: ProjectWatcherConfig,
+    on_select: Callable[[Optional[str]], None],
+    aw_testing: bool = False,
+) -> AutoSelectWatcher:
+    """
+    Watcher polling with a client of its own, so that it does not share the
+    process-wide query client with reports run for the whole daemon lifetime
+    """
+    client = SharedActivityWatchClient(AUTO_SELECT_CLIENT_NAME, testing=aw_testing)
+    return AutoSelectWatcher(client, config, on_select)
@@ -1,18 +1,53 @@
 import datetime
+from typing import Optional, Tuple
 
-from aw_client import ActivityWatchClient
 from tzlocal import get_localzone
 
 from aw_watcher_project.config import BUCKET_NAME
 
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECONDS_PER_SECOND = 1_000_000
+
+
+def to_epoch_us(time: datetime.datetime) -> int:
+    """
+    Microseconds since the epoch, taking naive times as UTC
+    """
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=datetime.timezone.utc)
+    return timedelta_us(time - EPOCH)
+
+
+def from_epoch_us(us: int) -> datetime.datetime:
+    """
+    UTC time ``us`` microseconds after the epoch
+    """
+    return EPOCH + datetime.timedelta(microseconds=us)
+
+
+def timedelta_us(delta: datetime.timedelta) -> int:
+    return (delta.days * 86_400 + delta.seconds) * MICROSECONDS_PER_SECOND + delta.microseconds
+
+
+def seconds_us(seconds: float) -> int:
+    """
+    Microseconds in ``seconds``, rounded exactly as aw_core does when it
+    builds a timedelta from a float
+    """
+    return timedelta_us(datetime.timedelta(seconds=seconds))
+
 
 def get_begin_time(bucket_name: str = BUCKET_NAME) -> datetime.datetime:
-    client = ActivityWatchClient()
-    buckets = client.get_buckets()
+    # Imported here so that the event modules using the helpers above do not
+    # load the ActivityWatch client
+    from aw_watcher_project.client import get_client
+
+    buckets = get_client().get_buckets()
     selected_bucket = None
     for bucket in buckets.values():
         if bucket["id"] == bucket_name + "_" + bucket["hostname"]:
             selected_bucket = bucket
+            break
     if selected_bucket is None:
         raise ValueError(f"bucket {bucket_name} does not exist, run project watcher")
 
@@ -24,4 +59,25 @@ def get_begin_time(bucket_name: str = BUCKET_NAME) -> datetime.datetime:
 def get_default_end_time() -> datetime.datetime:
     return datetime.datetime.now().replace(
         tzinfo=get_localzone(), hour=23, minute=59, second=59
-    )
\ No newline at end of file
+    )
+
+def local_time(time: datetime.datetime) -> datetime.datetime:
+    """
+    ``time``, taking it in the local time zone if it is naive
+    """
+    if time.tzinfo is None:
+        return time.replace(tzinfo=get_localzone())
+    return time
+
+
+def get_time_range(
+    begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    ``begin`` and ``end`` with a time zone, defaulting to the day the watcher
+    was first run and the end of today
+    """
+    return (
+        local_time(get_begin_time() if begin is None else begin),
+        local_time(get_default_end_time() if end is None else end),
+    )
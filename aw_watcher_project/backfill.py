@@ -0,0 +1,282 @@
+import datetime
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from aw_core import Event as AWEvent
+
+from aw_watcher_project.buckets import (
+    PROJECT_BUCKET_PREFIX,
+    WINDOW_BUCKET_PREFIX,
+    find_bucket,
+)
+from aw_watcher_project.client import SharedActivityWatchClient
+from aw_watcher_project.config import BACKFILL_BUCKET_NAME, RuleData
+from aw_watcher_project.events.base import Event
+from aw_watcher_project.events.window import WindowEvent
+from aw_watcher_project.heartbeat import EVENT_TYPE
+from aw_watcher_project.logger import logger
+from aw_watcher_project.periods import TimePeriod, clip_event_data, split_time_range
+from aw_watcher_project.rules import RuleSet
+
+DEFAULT_CHUNK = "day"
+DEFAULT_MERGE_GAP = 60
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ProjectSpan(NamedTuple):
+    start: datetime.datetime
+    end: datetime.datetime
+    project: str
+
+    def to_event(self) -> AWEvent:
+        return AWEvent(
+            timestamp=self.start,
+            duration=self.end - self.start,
+            data={"project": self.project},
+        )
+
+
+class BackfillResult(NamedTuple):
+    window_events: int
+    spans: int
+    seconds: float
+
+
+def merge_spans(
+    spans: Iterable[ProjectSpan], merge_gap: float = DEFAULT_MERGE_GAP
+) -> List[ProjectSpan]:
+    """
+    Joins spans of the same project following each other with at most
+    ``merge_gap`` seconds between them. Spans must be sorted by start.
+    """
+    gap = datetime.timedelta(seconds=merge_gap)
+    merged: List[ProjectSpan] = []
+    for span in spans:
+        if merged:
+            last = merged[-1]
+            if span.project == last.project and span.start - last.end <= gap:
+                merged[-1] = last._replace(end=max(last.end, span.end))
+                continue
+        merged.append(span)
+    return merged
+
+
+def subtract_periods(
+    spans: Sequence[ProjectSpan], periods: Sequence[TimePeriod]
+) -> List[ProjectSpan]:
+    """
+    Parts of ``spans`` outside of ``periods``, both sorted by start
+    """
+    out: List[ProjectSpan] = []
+    i = 0
+    for span in spans:
+        start = span.start
+        # Periods ending before this span cannot overlap later spans either
+        while i < len(periods) and periods[i][1] <= start:
+            i += 1
+        j = i
+        while j < len(periods) and periods[j][0] < span.end:
+            period_start, period_end = periods[j]
+            if period_start > start:
+                out.append(span._replace(start=start, end=period_start))
+            start = max(start, period_end)
+            j += 1
+        if start < span.end:
+            out.append(span._replace(start=start))
+    return out
+
+
+def _periods(event_data: Sequence[Dict[str, Any]]) -> List[TimePeriod]:
+    periods = sorted((event.time, event.end_time) for event in map(Event, event_data))
+    merged: List[TimePeriod] = []
+    for start, end in periods:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+_rule_set: Optional[RuleSet] = None
+
+
+def _init_worker(rules: Sequence[RuleData]):
+    global _rule_set
+    _rule_set = RuleSet(rules)
+
+
+def classify_chunk(
+    window_data: Sequence[Dict[str, Any]],
+    selected_data: Sequence[Dict[str, Any]],
+    period: TimePeriod,
+    merge_gap: float = DEFAULT_MERGE_GAP,
+) -> List[ProjectSpan]:
+    """
+    Merged project spans for the window events of one period, leaving out the
+    time covered by selected project events
+
+    Runs in the worker processes, using the rules they were started with.
+    """
+    assert _rule_set is not None, "worker was not initialized with rules"
+    events = sorted(
+        (WindowEvent(data) for data in clip_event_data(window_data, period)),  # type: ignore
+        key=lambda event: event.time,
+    )
+    spans: List[ProjectSpan] = []
+    for event in events:
+        project = _rule_set.match(event.app, event.title)
+        if project is not None and event.duration > 0:
+            spans.append(ProjectSpan(event.time, event.end_time, project))
+    spans = merge_spans(spans, merge_gap)
+    if selected_data:
+        spans = subtract_periods(spans, _periods(clip_event_data(selected_data, period)))
+    return spans
+
+
+class _SerialExecutor:
+    """
+    Runs submitted calls right away, for ``max_workers=1``
+    """
+
+    def __init__(self, rules: Sequence[RuleData]):
+        _init_worker(rules)
+
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait: bool = True):
+        pass
+
+
+def backfill(
+    client: SharedActivityWatchClient,
+    rules: Sequence[RuleData],
+    begin: datetime.datetime,
+    end: datetime.datetime,
+    bucket_id: Optional[str] = None,
+    chunk: str = DEFAULT_CHUNK,
+    max_workers: Optional[int] = None,
+    merge_gap: float = DEFAULT_MERGE_GAP,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> BackfillResult:
+    """
+    Classifies window events between ``begin`` and ``end`` into projects using
+    ``rules`` and inserts the merged spans as project events into a bucket of
+    their own, skipping time when a project was selected
+
+    Each day (or other ``chunk``) of window events is classified in a process
+    pool. Only a couple of chunks per worker are fetched ahead, so memory does
+    not grow with the range. Running it twice over the same range inserts the
+    events twice.
+    """
+    started = time.monotonic()
+    # Invalid rules would only fail in the workers' initializer, as a broken pool
+    RuleSet(rules)
+    buckets = client.get_buckets()
+    window_bucket = find_bucket(buckets, WINDOW_BUCKET_PREFIX)
+    if window_bucket is None:
+        logger.warning("No window bucket to backfill from")
+        return BackfillResult(0, 0, 0.0)
+    selected_bucket = find_bucket(buckets, PROJECT_BUCKET_PREFIX)
+    if bucket_id is None:
+        bucket_id = f"{BACKFILL_BUCKET_NAME}_{client.client_hostname}"
+    client.create_bucket(bucket_id, EVENT_TYPE)
+
+    periods = split_time_range(begin, end, chunk)
+    workers = max_workers or os.cpu_count() or 1
+    executor: Any
+    if workers == 1:
+        executor = _SerialExecutor(rules)
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(rules,))
+    n_events = 0
+    n_spans = 0
+    batch: List[AWEvent] = []
+    pending: Deque[Tuple[Future, int]] = deque()
+    try:
+        for spans, chunk_events in _classify_periods(
+            executor, client, window_bucket, selected_bucket, periods, merge_gap,
+            max_in_flight=2 * workers, pending=pending,
+        ):
+            n_events += chunk_events
+            for span in spans:
+                batch.append(span.to_event())
+            n_spans += len(spans)
+            if len(batch) >= batch_size:
+                client.insert_events(bucket_id, batch)
+                batch = []
+        if batch:
+            client.insert_events(bucket_id, batch)
+    finally:
+        # Chunks not started yet are dropped after an error,
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future, _ in pending:
+            future.cancel()
+        executor.shutdown()
+    seconds = time.monotonic() - started
+    logger.info(
+        f"Backfilled {n_spans} project events from {n_events} window events in {seconds:.1f}s"
+    )
+    return BackfillResult(n_events, n_spans, seconds)
+
+
+def _classify_periods(
+    executor: Any,
+    client: SharedActivityWatchClient,
+    window_bucket: str,
+    selected_bucket: Optional[str],
+    periods: Sequence[TimePeriod],
+    merge_gap: float,
+    max_in_flight: int,
+    pending: Optional[Deque[Tuple[Future, int]]] = None,
+) -> Iterator[Tuple[List[ProjectSpan], int]]:
+    """
+    Yields the finished spans with the number of window events they came from,
+    in time order, holding back the last span of each chunk so it can be
+    merged with the first of the next
+
+    Futures not yet yielded are kept in ``pending``, which the caller may pass
+    to cancel them if it stops early.
+    """
+    if pending is None:
+        pending = deque()
+    carry: List[ProjectSpan] = []
+
+    def finish(future: Future, n_events: int) -> Tuple[List[ProjectSpan], int]:
+        nonlocal carry
+        # Only rejoin spans cut at the boundary, a gap there may be selected time
+        spans = merge_spans(carry + future.result(), 0)
+        carry = spans[-1:]
+        return spans[:-1], n_events
+
+    for period in periods:
+        window_data = client.get_event_data(window_bucket, *period)
+        selected_data = (
+            client.get_event_data(selected_bucket, *period) if selected_bucket else []
+        )
+        future = executor.submit(
+            classify_chunk, window_data, selected_data, period, merge_gap
+        )
+        pending.append((future, len(window_data)))
+        while len(pending) >= max_in_flight:
+            yield finish(*pending.popleft())
+    while pending:
+        yield finish(*pending.popleft())
+    if carry:
+        yield carry, 0
@@ -0,0 +1,90 @@
+import datetime
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from aw_client import ActivityWatchClient
+
+from aw_watcher_project.cache import QueryCache, cached_query
+from aw_watcher_project.config import BUCKET_NAME
+from aw_watcher_project.intervals import Intervals, filter_data
+from aw_watcher_project.metrics import REGISTRY
+
+AFK_BUCKET_PREFIX = "aw-watcher-afk_"
+PROJECT_BUCKET_PREFIX = f"{BUCKET_NAME}_"
+WINDOW_BUCKET_PREFIX = "aw-watcher-window_"
+
+EventData = Dict[str, Any]
+
+QUERY_SECONDS = REGISTRY.histogram(
+    "aw_watcher_project_query_seconds",
+    "Time to get the events of a bucket in a time range, cached or from the server",
+    ("bucket",),
+)
+
+
+def find_bucket(buckets: Iterable[str], prefix: str) -> Optional[str]:
+    """
+    First of the bucket ids starting with ``prefix``, like the server's
+    ``find_bucket``, or ``None``
+    """
+    return next((bucket for bucket in buckets if bucket.startswith(prefix)), None)
+
+
+def bucket_query(prefix: str) -> str:
+    return f"RETURN = query_bucket(find_bucket({json.dumps(prefix)}));"
+
+
+def query_bucket(
+    client: ActivityWatchClient,
+    prefix: str,
+    begin: datetime.datetime,
+    end: datetime.datetime,
+    cache: Optional[QueryCache] = None,
+) -> List[EventData]:
+    """
+    Raw events of the first bucket starting with ``prefix`` in a time range,
+    with elapsed days served from ``cache`` if given
+
+    The same query is used for a bucket whatever is computed from it, so the
+    cached days are shared by every report.
+    """
+    query = bucket_query(prefix)
+    with QUERY_SECONDS.labels(prefix).time():
+        if cache is not None:
+            return cached_query(client, query, begin, end, cache)
+        return client.query(query, [(begin, end)])[0]
+
+
+def query_buckets(
+    client: ActivityWatchClient,
+    prefixes: Sequence[str],
+    begin: datetime.datetime,
+    end: datetime.datetime,
+    cache: Optional[QueryCache] = None,
+) -> List[List[EventData]]:
+    return [query_bucket(client, prefix, begin, end, cache) for prefix in prefixes]
+
+
+def not_afk_intervals(
+    project_events: Sequence[EventData], afk_events: Sequence[EventData]
+) -> Intervals:
+    """
+    Parts of project events when the user was not AFK, as aw-server computes
+    them with ``filter_period_intersect``
+    """
+    not_afk = filter_data(afk_events, "status", ["not-afk"])
+    return Intervals.from_event_data(project_events).intersect(
+        Intervals.from_event_data(not_afk)
+    )
+
+
+def get_not_afk_project_event_data(
+    client: ActivityWatchClient,
+    begin: datetime.datetime,
+    end: datetime.datetime,
+    cache: Optional[QueryCache] = None,
+) -> List[EventData]:
+    project_events, afk_events = query_buckets(
+        client, (PROJECT_BUCKET_PREFIX, AFK_BUCKET_PREFIX), begin, end, cache
+    )
+    return not_afk_intervals(project_events, afk_events).to_event_data(project_events)
@@ -0,0 +1,299 @@
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from aw_client import ActivityWatchClient
+
+from aw_watcher_project.config import DEFAULT_CONFIG_DIR, ensure_parent_dir
+from aw_watcher_project.fetch import DEFAULT_MAX_WORKERS, query_periods
+from aw_watcher_project.logger import logger
+from aw_watcher_project.periods import (
+    TimePeriod,
+    combine_period_results,
+    day_periods,
+    is_whole_day,
+)
+
+DEFAULT_CACHE_PATH = DEFAULT_CONFIG_DIR / "cache.sqlite"
+DEFAULT_MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    query TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    period_end_ts REAL NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (query, period_start, period_end)
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS buckets (
+    id TEXT PRIMARY KEY,
+    created TEXT,
+    last_updated TEXT
+);
+"""
+
+
+def _query_key(query: str) -> str:
+    return hashlib.sha1(query.strip().encode("utf8")).hexdigest()
+
+
+def _timestamp(time: datetime.datetime) -> float:
+    return time.timestamp()
+
+
+class QueryCache:
+    """
+    On-disk cache of ActivityWatch query results for fully elapsed days
+
+    Entries are invalidated when buckets on the server are created, deleted or
+    updated after the cached period, see :meth:`sync_buckets`. Once the cache
+    grows beyond ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        self.path = ensure_parent_dir(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, query: str, period: TimePeriod) -> Optional[Any]:
+        key = (_query_key(query), period[0].isoformat(), period[1].isoformat())
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT result FROM results "
+                "WHERE query = ? AND period_start = ? AND period_end = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed = ? "
+                "WHERE query = ? AND period_start = ? AND period_end = ?",
+                (_timestamp(datetime.datetime.now(datetime.timezone.utc)), *key),
+            )
+        return json.loads(row[0])
+
+    def get_many(self, query: str, periods: Sequence[TimePeriod]) -> List[Optional[Any]]:
+        """
+        Cached results of several periods, ``None`` where missing, read in one
+        transaction
+        """
+        query_key = _query_key(query)
+        keys = [(query_key, start.isoformat(), end.isoformat()) for start, end in periods]
+        with self._lock, self._conn:
+            rows = [
+                self._conn.execute(
+                    "SELECT result FROM results "
+                    "WHERE query = ? AND period_start = ? AND period_end = ?",
+                    key,
+                ).fetchone()
+                for key in keys
+            ]
+            accessed = _timestamp(datetime.datetime.now(datetime.timezone.utc))
+            self._conn.executemany(
+                "UPDATE results SET accessed = ? "
+                "WHERE query = ? AND period_start = ? AND period_end = ?",
+                [(accessed, *key) for key, row in zip(keys, rows) if row is not None],
+            )
+        return [None if row is None else json.loads(row[0]) for row in rows]
+
+    def put(self, query: str, period: TimePeriod, result: Any):
+        data = json.dumps(result)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _query_key(query),
+                    period[0].isoformat(),
+                    period[1].isoformat(),
+                    _timestamp(period[1]),
+                    data,
+                    len(data),
+                    _timestamp(datetime.datetime.now(datetime.timezone.utc)),
+                ),
+            )
+            self._evict()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT query, period_start, period_end, size FROM results "
+            "ORDER BY accessed"
+        )
+        evict = []
+        for query, start, end, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((query, start, end))
+            total -= size
+        logger.debug(f"Evicting {len(evict)} entries from query cache")
+        self._conn.executemany(
+            "DELETE FROM results WHERE query = ? AND period_start = ? AND period_end = ?",
+            evict,
+        )
+
+    def invalidate(self, since: Optional[datetime.datetime] = None):
+        """
+        Drops cached periods which end after ``since``, or everything if not passed
+        """
+        with self._lock, self._conn:
+            if since is None:
+                self._conn.execute("DELETE FROM results")
+            else:
+                self._conn.execute(
+                    "DELETE FROM results WHERE period_end_ts > ?", (_timestamp(since),)
+                )
+
+    def sync_buckets(self, buckets: Dict[str, dict]):
+        """
+        Invalidates cached results using bucket metadata from the server
+
+        A created or deleted bucket, or one which was recreated, drops the whole
+        cache. A bucket whose ``last_updated`` moved drops every period ending
+        after the previously seen ``last_updated``, as data in those periods may
+        still have been arriving when they were cached.
+        """
+        with self._lock:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in self._conn.execute(
+                    "SELECT id, created, last_updated FROM buckets"
+                )
+            }
+        current = {
+            bucket_id: (bucket.get("created"), bucket.get("last_updated"))
+            for bucket_id, bucket in buckets.items()
+        }
+        if current == known:
+            return
+
+        if set(current) != set(known) or any(
+            known[bucket_id][0] != created for bucket_id, (created, _) in current.items()
+        ):
+            logger.debug("Buckets changed, clearing query cache")
+            self.invalidate()
+        else:
+            since: Optional[datetime.datetime] = None
+            for bucket_id, (_, last_updated) in current.items():
+                previous = known[bucket_id][1]
+                if previous == last_updated:
+                    continue
+                if previous is None:
+                    self.invalidate()
+                    since = None
+                    break
+                previous_time = datetime.datetime.fromisoformat(
+                    previous.replace("Z", "+00:00")
+                )
+                if since is None or previous_time < since:
+                    since = previous_time
+            if since is not None:
+                logger.debug(f"Buckets updated, invalidating query cache since {since}")
+                self.invalidate(since)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM buckets")
+            self._conn.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?)",
+                [(bucket_id, *values) for bucket_id, values in current.items()],
+            )
+
+
+def cached_query(
+    client: ActivityWatchClient,
+    query: str,
+    begin: datetime.datetime,
+    end: datetime.datetime,
+    cache: QueryCache,
+    now: Optional[datetime.datetime] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Any:
+    """
+    Runs a query over a time range, reusing cached results for elapsed days
+
+    The range is split into days and run through :func:`cached_day_results`.
+    Returns the same shape as one element of :meth:`ActivityWatchClient.query`
+    over the whole range.
+    """
+    periods = day_periods(begin, end)
+    results = cached_day_results(
+        client, query, periods, cache, now=now, max_workers=max_workers
+    )
+    return combine_period_results(results, periods)
+
+
+def cached_day_results(
+    client: ActivityWatchClient,
+    query: str,
+    periods: Sequence[TimePeriod],
+    cache: QueryCache,
+    now: Optional[datetime.datetime] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[Any]:
+    """
+    Runs a query over each of ``periods``, returning one result per period
+
+    Whole days which have ended are served from the cache when possible and the
+    remaining periods are fetched with :func:`~aw_watcher_project.fetch.query_periods`.
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    cache.sync_buckets(client.get_buckets())
+
+    results: List[Any] = [None] * len(periods)
+    cacheable = [i for i, period in enumerate(periods) if is_whole_day(period) and period[1] <= now]
+    for i, result in zip(cacheable, cache.get_many(query, [periods[i] for i in cacheable])):
+        results[i] = result
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    logger.debug(
+        f"Query cache hit for {len(periods) - len(missing)} of {len(periods)} days"
+    )
+    if missing:
+        fetched = query_periods(
+            client, query, [periods[i] for i in missing], max_workers=max_workers
+        )
+        for i, result in zip(missing, fetched):
+            results[i] = result
+            period = periods[i]
+            if is_whole_day(period) and period[1] <= now:
+                cache.put(query, period, result)
+    return results
+
+
+_default_cache: Optional[QueryCache] = None
+
+
+def get_default_cache() -> QueryCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = QueryCache()
+    return _default_cache
@@ -0,0 +1,140 @@
+import datetime
+import os
+import threading
+import time
+from contextlib import suppress
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+from aw_client import ActivityWatchClient
+from aw_client.client import always_raise_for_request_errors
+
+from aw_watcher_project.fetch import DEFAULT_MAX_WORKERS
+
+DEFAULT_CLIENT_NAME = "aw-watcher-project-reports"
+DEFAULT_BUCKETS_TTL = 60
+
+
+class SharedActivityWatchClient(ActivityWatchClient):
+    """
+    ActivityWatch client which keeps one HTTP session alive for all requests
+    and caches bucket metadata for ``buckets_ttl`` seconds
+
+    Safe to share between threads, use :func:`get_client` to get the process-wide instance.
+    Unlike a watcher's client, any number of processes can create one at the
+    same time.
+    """
+
+    def __init__(
+        self,
+        client_name: str = DEFAULT_CLIENT_NAME,
+        testing: bool = False,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        buckets_ttl: float = DEFAULT_BUCKETS_TTL,
+        pool_size: int = DEFAULT_MAX_WORKERS,
+    ):
+        # aw-client locks the client name so that only one instance of a
+        # watcher runs, exiting the process otherwise. Take the lock under a
+        # name of this process and release it right away
+        super().__init__(
+            f"{client_name}-{os.getpid()}", testing=testing, host=host, port=port
+        )
+        self.client_name = client_name
+        self._release_instance_lock()
+        self.buckets_ttl = buckets_ttl
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._buckets: Optional[Dict[str, dict]] = None
+        self._buckets_fetched_at = 0.0
+        self._buckets_lock = threading.Lock()
+
+    def _release_instance_lock(self):
+        instance, self.instance = self.instance, None
+        lock_file = getattr(instance, "fp", None)
+        if lock_file is not None:
+            lock_file.close()
+            with suppress(OSError):
+                os.remove(instance.lockfile)
+
+    @always_raise_for_request_errors
+    def _get(self, endpoint: str, params: Optional[dict] = None) -> requests.Response:
+        return self.session.get(self._url(endpoint), params=params)
+
+    @always_raise_for_request_errors
+    def _post(
+        self,
+        endpoint: str,
+        data: Union[List[Any], Dict[str, Any]],
+        params: Optional[dict] = None,
+    ) -> requests.Response:
+        return self.session.post(self._url(endpoint), json=data, params=params)
+
+    @always_raise_for_request_errors
+    def _delete(self, endpoint: str, data: Any = None) -> requests.Response:
+        return self.session.delete(self._url(endpoint), json=data or {})
+
+    def get_buckets(self) -> dict:
+        with self._buckets_lock:
+            age = time.monotonic() - self._buckets_fetched_at
+            if self._buckets is None or age > self.buckets_ttl:
+                self._buckets = super().get_buckets()
+                self._buckets_fetched_at = time.monotonic()
+            return self._buckets
+
+    def invalidate_buckets(self):
+        with self._buckets_lock:
+            self._buckets = None
+
+    def create_bucket(self, bucket_id: str, event_type: str, queued=False):
+        super().create_bucket(bucket_id, event_type, queued=queued)
+        self.invalidate_buckets()
+
+    def delete_bucket(self, bucket_id: str, force: bool = False):
+        super().delete_bucket(bucket_id, force=force)
+        self.invalidate_buckets()
+
+    def get_event_data(
+        self,
+        bucket_id: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        limit: int = -1,
+    ) -> List[Dict[str, Any]]:
+        """
+        Events of a bucket as the dicts the server returns, newest first,
+        without building an aw_core Event for each
+        """
+        params = {"limit": str(limit)}
+        if start is not None:
+            params["start"] = start.isoformat()
+        if end is not None:
+            params["end"] = end.isoformat()
+        return self._get(f"buckets/{bucket_id}/events", params=params).json()
+
+    def close(self):
+        self.session.close()
+
+
+_clients: Dict[Tuple[bool, Optional[str], Optional[int]], SharedActivityWatchClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(
+    testing: bool = False, host: Optional[str] = None, port: Optional[int] = None
+) -> SharedActivityWatchClient:
+    """
+    Process-wide client for queries, created on first use
+    """
+    key = (testing, host, port)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = SharedActivityWatchClient(
+                testing=testing, host=host, port=port
+            )
+        return client
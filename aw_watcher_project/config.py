@@ -1,8 +1,9 @@
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 from typing_extensions import TypedDict
-from typing import Union, List
-
-import yaml
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union, List
 
 from aw_watcher_project.exc import (
     CannotAddProjectException,
@@ -10,61 +11,259 @@ from aw_watcher_project.exc import (
 )
 from aw_watcher_project.logger import logger
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
 BUCKET_NAME = "aw-watcher-project-selected"
+BACKFILL_BUCKET_NAME = "aw-watcher-project-backfilled"
 DEFAULT_CONFIG_DIR = Path.home() / ".aw-watcher-project"
-if not DEFAULT_CONFIG_DIR.exists():
-    DEFAULT_CONFIG_DIR.mkdir()
 DEFAULT_CONFIG_PATH = DEFAULT_CONFIG_DIR / "config.yml"
 
 ASSETS_PATH = Path(__file__).parent / 'assets'
 
 
-class ConfigData(TypedDict):
+def ensure_parent_dir(path: Union[str, Path]) -> Path:
+    """
+    Creates the directory holding ``path`` if needed, for files which go in the
+    config directory
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class _RuleDataRequired(TypedDict):
+    project: str
+
+
+class RuleData(_RuleDataRequired, total=False):
+    """
+    Selects ``project`` for windows matching every condition given: ``app``
+    is a case-insensitive glob on the application, ``title`` a regex searched
+    in the window title and ``path`` a path prefix found in the title
+    """
+
+    app: str
+    title: str
+    path: str
+
+
+class _ConfigDataRequired(TypedDict):
     projects: List[str]
 
 
+class ConfigData(_ConfigDataRequired, total=False):
+    rules: List[RuleData]
+
+
+def _yaml_loader():
+    import yaml
+
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _yaml_dumper():
+    import yaml
+
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
 class ProjectWatcherConfig:
+    """
+    Projects config stored as YAML
+
+    Projects are kept in insertion order with constant time membership
+    checks. Saves write a temporary file and rename it over the config, so
+    readers never see a partial file. Each change holds an advisory lock
+    on a file next to the config, reloads the config if another process
+    modified it, see :meth:`reload_if_changed`, and saves before releasing
+    the lock, so processes sharing the config do not lose each other's
+    changes. Changes made inside :meth:`batch` are saved once at the end.
+    The lock needs ``fcntl``, so it is skipped on Windows.
+    """
+
     def __init__(self, config_path: Union[str, Path] = DEFAULT_CONFIG_PATH):
         self.config_path = Path(config_path)
+        self._projects: Dict[str, None] = {}
+        self.rules: List[RuleData] = []
+        self._file_state: Optional[Tuple[int, int, int]] = None
+        self._batch_depth = 0
+        self._unsaved = False
         if self.config_path.exists():
             logger.info(f"Loading config from {self.config_path}")
-            data: ConfigData = yaml.safe_load(self.config_path.read_text())
-            self.projects = data["projects"]
+            self.reload()
         else:
             logger.info(
                 f"No config file exists at {self.config_path}, will create once a project is added"
             )
-            if not self.config_path.parent.exists():
-                self.config_path.parent.mkdir()
-            self.projects = []
+            ensure_parent_dir(self.config_path)
+
+    @property
+    def projects(self) -> List[str]:
+        return list(self._projects)
+
+    def __contains__(self, project: object) -> bool:
+        return project in self._projects
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._projects)
+
+    def __len__(self) -> int:
+        return len(self._projects)
 
     def add_project(self, project: str):
         logger.debug(f"Adding project {project}")
-        if project in self.projects:
-            raise CannotAddProjectException(f"project {project} already exists")
-        self.projects.append(project)
-        self.save()
+        with self.batch():
+            if project in self._projects:
+                raise CannotAddProjectException(f"project {project} already exists")
+            self._projects[project] = None
+            self._unsaved = True
 
     def remove_project(self, project: str):
         logger.debug(f"Removing project {project}")
-        if project not in self.projects:
-            raise CannotRemoveProjectException(
-                f"project {project} not in existing projects: {self.projects}"
-            )
-        self.projects.remove(project)
-        self.save()
+        with self.batch():
+            if project not in self._projects:
+                raise CannotRemoveProjectException(
+                    f"project {project} not in existing projects"
+                )
+            del self._projects[project]
+            self._unsaved = True
+
+    def add_projects(self, projects: Iterable[str]) -> List[str]:
+        """
+        Adds the projects which do not exist yet with a single save, returning them
+        """
+        with self.batch():
+            added = [
+                project
+                for project in dict.fromkeys(projects)
+                if project not in self._projects
+            ]
+            self._projects.update(dict.fromkeys(added))
+            self._unsaved = self._unsaved or bool(added)
+        logger.debug(f"Added {len(added)} projects")
+        return added
+
+    def remove_projects(self, projects: Iterable[str]) -> List[str]:
+        """
+        Removes the projects which exist with a single save, returning them
+        """
+        with self.batch():
+            removed = [
+                project for project in dict.fromkeys(projects) if project in self._projects
+            ]
+            for project in removed:
+                del self._projects[project]
+            self._unsaved = self._unsaved or bool(removed)
+        logger.debug(f"Removed {len(removed)} projects")
+        return removed
+
+    @contextmanager
+    def batch(self):
+        """
+        Saves once when the outermost batch exits instead of on every change
+        """
+        with ExitStack() as stack:
+            if self._batch_depth == 0:
+                stack.enter_context(self._locked())
+                self.reload_if_changed()
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._unsaved:
+                    self.save()
+
+    @property
+    def lock_path(self) -> Path:
+        return self.config_path.with_name(f".{self.config_path.name}.lock")
+
+    @contextmanager
+    def _locked(self):
+        # A separate file, as saving replaces the config and with it any lock
+        # held on it
+        if fcntl is None:
+            yield
+            return
+        ensure_parent_dir(self.lock_path)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def reload(self):
+        import yaml
+
+        state = self._stat()
+        data: Optional[ConfigData] = yaml.load(
+            self.config_path.read_text(), Loader=_yaml_loader()
+        )
+        self._projects = dict.fromkeys(data["projects"] if data else [])
+        self.rules = (data.get("rules") if data else None) or []
+        self._file_state = state
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the config if the file changed since it was last read or
+        written, returning whether it did
+        """
+        state = self._stat()
+        if state is None or state == self._file_state:
+            return False
+        logger.debug(f"Config at {self.config_path} changed, reloading")
+        self.reload()
+        return True
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.config_path.stat()
+        except FileNotFoundError:
+            return None
+        # Every save replaces the file, so a new inode catches a save within
+        # the same mtime tick that kept the size
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
 
     @property
     def data(self) -> ConfigData:
-        return ConfigData(projects=self.projects)
+        data = ConfigData(projects=self.projects)
+        if self.rules:
+            data["rules"] = self.rules
+        return data
 
     @property
     def yaml(self) -> str:
-        return yaml.safe_dump(self.data)
+        import yaml
+
+        return yaml.dump(self.data, Dumper=_yaml_dumper())
 
     def save(self):
         logger.debug(f"Saving config to {self.config_path}")
-        self.config_path.write_text(self.yaml)
+        ensure_parent_dir(self.config_path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.config_path.parent, prefix=f".{self.config_path.name}.", suffix=".tmp"
+        )
+        try:
+            # Keep the permissions of the existing file rather than mkstemp's 0600
+            mode = self.config_path.stat().st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        try:
+            with os.fdopen(fd, "w") as f:
+                os.chmod(temp_path, mode)
+                f.write(self.yaml)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.config_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._file_state = self._stat()
+        self._unsaved = False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from aw_watcher_project.autoselect import AutoSelectWatcher, create_auto_select_watcher
+from aw_watcher_project.config import (
+    DEFAULT_CONFIG_PATH,
+    ProjectWatcherConfig,
+    ensure_parent_dir,
+)
+from aw_watcher_project.exc import (
+    ConfigException,
+    DaemonAlreadyRunningException,
+)
+from aw_watcher_project.heartbeat import HeartbeatWorker, create_heartbeat_worker
+from aw_watcher_project.ipc import DEFAULT_SOCKET_PATH, Response, encode
+from aw_watcher_project.logger import logger
+from aw_watcher_project.metrics import REGISTRY, TextfileWriter
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_ControlServer"
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise TypeError("expected a JSON object")
+                response = self.server.daemon.handle(request)
+            except (ValueError, TypeError) as e:
+                response = {"ok": False, "error": f"invalid request: {e}"}
+            self.wfile.write(encode(response))
+            self.wfile.flush()
+
+
+class _ControlServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: "ProjectWatcherDaemon"):
+        self.daemon = daemon
+        super().__init__(path, _Handler)
+
+
+class ProjectWatcherDaemon:
+    """
+    Sends project heartbeats without a GUI, controlled through a Unix socket
+
+    Accepts the commands ``select`` (with ``project`` and optionally ``add``),
+    ``clear``, ``status``, ``list`` and ``metrics``, see
+    :mod:`aw_watcher_project.ipc` for the client. Selecting only hands the
+    project to the heartbeat worker, so commands return without waiting for
+    the server. With ``auto_select`` the watcher's rule matches are selected
+    as well. With ``metrics`` the metrics are also written to a textfile.
+    """
+
+    def __init__(
+        self,
+        config: ProjectWatcherConfig,
+        heartbeats: HeartbeatWorker,
+        socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH,
+        auto_select: Optional[AutoSelectWatcher] = None,
+        metrics: Optional[TextfileWriter] = None,
+    ):
+        self.config = config
+        self.heartbeats = heartbeats
+        self.socket_path = Path(socket_path)
+        self.auto_select = auto_select
+        self.metrics = metrics
+        self._server: Optional[_ControlServer] = None
+        self._commands: Dict[str, Callable[[Dict[str, Any]], Response]] = {
+            "select": self._select,
+            "clear": self._clear,
+            "status": self._status,
+            "list": self._list,
+            "metrics": self._metrics,
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Response:
+        command = self._commands.get(request.get("command"))
+        if command is None:
+            return {"ok": False, "error": f"unknown command {request.get('command')!r}"}
+        try:
+            return command(request)
+        except ConfigException as e:
+            return {"ok": False, "error": str(e)}
+
+    def _select(self, request: Dict[str, Any]) -> Response:
+        project = request.get("project")
+        if not isinstance(project, str) or not project:
+            return {"ok": False, "error": "select needs a project"}
+        self.config.reload_if_changed()
+        if project not in self.config:
+            if not request.get("add"):
+                return {"ok": False, "error": f"project {project} does not exist"}
+            self.config.add_project(project)
+        self.heartbeats.select(project)
+        logger.debug(f"selected project {project}")
+        return {"ok": True, "project": project}
+
+    def _clear(self, request: Dict[str, Any]) -> Response:
+        self.heartbeats.select(None)
+        return {"ok": True, "project": None}
+
+    def _status(self, request: Dict[str, Any]) -> Response:
+        return {
+            "ok": True,
+            "project": self.heartbeats.project,
+            "bucket_ready": self.heartbeats.bucket_ready,
+            "auto_select": self.auto_select is not None,
+            "pid": os.getpid(),
+        }
+
+    def _list(self, request: Dict[str, Any]) -> Response:
+        self.config.reload_if_changed()
+        return {"ok": True, "projects": self.config.projects}
+
+    def _metrics(self, request: Dict[str, Any]) -> Response:
+        return {"ok": True, "metrics": REGISTRY.snapshot()}
+
+    def start(self):
+        """
+        Binds the control socket, replacing a stale one left by a crashed daemon
+        """
+        ensure_parent_dir(self.socket_path)
+        if self.socket_path.exists():
+            if _is_listening(self.socket_path):
+                raise DaemonAlreadyRunningException(
+                    f"a daemon is already listening at {self.socket_path}"
+                )
+            self.socket_path.unlink()
+        self._server = _ControlServer(str(self.socket_path), self)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Listening for commands at {self.socket_path}")
+        if self.auto_select is not None:
+            self.auto_select.start()
+        if self.metrics is not None:
+            self.metrics.start()
+
+    def serve_forever(self):
+        if self._server is None:
+            self.start()
+        assert self._server is not None
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def shutdown(self):
+        """
+        Stops serving and sends the closing heartbeat, safe to call from any thread
+        """
+        if self._server is not None:
+            # Blocks until serve_forever returns, so never call it on that thread
+            threading.Thread(target=self._server.shutdown).start()
+
+    def _close(self):
+        if self.auto_select is not None:
+            self.auto_select.stop()
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.heartbeats.stop(timeout=None)
+        if self.metrics is not None:
+            # After the closing heartbeat, so that it is counted
+            self.metrics.stop()
+        logger.info("Daemon stopped")
+
+
+def _is_listening(path: Path) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def run_daemon(
+    config_path: Union[str, Path] = DEFAULT_CONFIG_PATH,
+    socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH,
+    interval: float = 5,
+    aw_testing: bool = False,
+    auto_select: bool = False,
+    metrics_file: Optional[Union[str, Path]] = None,
+    metrics_interval: float = 15,
+):
+    """
+    Runs the daemon until interrupted or terminated
+
+    :param metrics_file: Prometheus textfile to write the metrics to every
+        ``metrics_interval`` seconds
+    """
+    config = ProjectWatcherConfig(config_path)
+    heartbeats = create_heartbeat_worker(interval, aw_testing=aw_testing)
+    watcher: Optional[AutoSelectWatcher] = None
+    if auto_select:
+        watcher = create_auto_select_watcher(config, heartbeats.select, aw_testing=aw_testing)
+    metrics = None if metrics_file is None else TextfileWriter(metrics_file, metrics_interval)
+    daemon = ProjectWatcherDaemon(
+        config, heartbeats, socket_path, auto_select=watcher, metrics=metrics
+    )
+    daemon.start()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: daemon.shutdown())
+    daemon.serve_forever()
@@ -1,15 +1,15 @@
-from typing import TypedDict, List, Generator
+from typing import Dict, List, Generator
 
 from aw_watcher_project.events.window import WindowEventData, WindowEvent
 
-
-class ActivityData(TypedDict):
-    aw_watcher_window_events: List[WindowEventData]
+# Events by activity bucket event name, e.g. aw_watcher_window_events
+ActivityData = Dict[str, List[WindowEventData]]
 
 
 class Activity:
     def __init__(self, events: List[WindowEventData]):
         self.events = [WindowEvent(event) for event in events]
+        self.buckets: Dict[str, 'Activity'] = {}
 
     def __getitem__(self, item) -> WindowEvent:
         return self.events[item]
@@ -17,16 +17,34 @@ class Activity:
     def __iter__(self) -> Generator[WindowEvent, WindowEvent, None]:
         yield from self.events
 
+    def __len__(self) -> int:
+        return len(self.events)
+
     @classmethod
     def from_events(cls, events: List[WindowEvent]):
         obj = cls([])
         obj.events = events
         return obj
 
+    @classmethod
+    def from_activity_data(cls, data: ActivityData) -> 'Activity':
+        """
+        Activity from the events of several buckets, as returned by an activity
+        query. Events from all buckets are merged in time order and the events of
+        each bucket are kept in :attr:`buckets`.
+        """
+        buckets = {name: cls(events) for name, events in data.items()}
+        events = [event for activity in buckets.values() for event in activity]
+        if len(buckets) > 1:
+            events.sort(key=lambda event: event.time)
+        obj = cls.from_events(events)
+        obj.buckets = buckets
+        return obj
+
     def for_app(self, name: str) -> 'Activity':
         events = [event for event in self if event.app == name]
         return self.__class__.from_events(events)
 
     @property
     def titles(self) -> List[str]:
-        return [event.title for event in self]
\ No newline at end of file
+        return [event.title for event in self]
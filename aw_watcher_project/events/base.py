@@ -12,28 +12,41 @@ class AllEventData(TypedDict):
 
 
 class Event:
+    """
+    Compact record of an ActivityWatch event
+
+    The timestamp is parsed once when the event is built. :attr:`data` rebuilds
+    the original dict shape on access for callers that still use it.
+    """
+
+    __slots__ = ("id", "time", "duration")
+
     def __init__(self, data: AllEventData):
-        self.data = data
+        self.id = data.get("id")
+        self.time = datetime.datetime.fromisoformat(data["timestamp"])
+        self.duration = data["duration"]
 
     @classmethod
     def from_aw_event(cls, event: AWEvent) -> 'Event':
-        data: AllEventData = AllEventData(
-            id=event.id,
-            timestamp=event.timestamp.isoformat(),
-            duration=event.duration.total_seconds(),
-        )
-        return cls(data)
+        obj = cls.__new__(cls)
+        obj._set_from_aw_event(event)
+        return obj
+
+    def _set_from_aw_event(self, event: AWEvent):
+        self.id = event.id
+        self.time = event.timestamp
+        self.duration = event.duration.total_seconds()
 
     def __repr__(self) -> str:
         return f"<Event(time={self.time}, duration={self.duration})>"
 
     @property
-    def duration(self) -> float:
-        return self.data["duration"]
-
-    @property
-    def time(self) -> datetime.datetime:
-        return datetime.datetime.fromisoformat(self.data["timestamp"])
+    def data(self) -> AllEventData:
+        return AllEventData(
+            id=self.id,
+            timestamp=self.time.isoformat(),
+            duration=self.duration,
+        )
 
     @property
     def end_time(self) -> datetime.datetime:
@@ -45,4 +58,4 @@ class Event:
 
     @property
     def start_end_duration(self) -> Tuple[datetime.datetime, datetime.datetime, float]:
-        return self.time, self.end_time, self.duration
\ No newline at end of file
+        return self.time, self.end_time, self.duration
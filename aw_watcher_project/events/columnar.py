@@ -0,0 +1,169 @@
+import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from aw_watcher_project.aw_time import EPOCH, MICROSECONDS_PER_SECOND, to_epoch_us
+
+if TYPE_CHECKING:
+    from aw_watcher_project.events.project import ProjectEvent
+
+EPOCH_DATE = EPOCH.date()
+MICROSECONDS_PER_DAY = 86_400 * MICROSECONDS_PER_SECOND
+
+# Marks timestamps that were stored without a UTC offset. They are treated as UTC
+# for the epoch column and converted back to naive datetimes on the way out
+NAIVE_OFFSET = np.iinfo(np.int32).min
+
+
+def _utc_offset_seconds(time: datetime.datetime) -> int:
+    offset = time.utcoffset()
+    if offset is None:
+        return int(NAIVE_OFFSET)
+    return offset.days * 86_400 + offset.seconds
+
+
+def offset_timezone(offset: int) -> Optional[datetime.timezone]:
+    """
+    Time zone of a UTC offset column value, ``None`` for naive timestamps
+    """
+    if offset == NAIVE_OFFSET:
+        return None
+    return datetime.timezone(datetime.timedelta(seconds=offset))
+
+
+class ProjectEventColumns:
+    """
+    Columnar representation of project events for fast aggregations
+
+    Start times are stored as int64 microseconds since the epoch along with the
+    UTC offset they were recorded in, durations as float64 seconds and projects
+    as int32 codes into :attr:`projects`, which holds each project in order of
+    first appearance.
+    """
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        durations: np.ndarray,
+        utc_offsets: np.ndarray,
+        codes: np.ndarray,
+        projects: List[Optional[str]],
+    ):
+        self.starts = starts
+        self.durations = durations
+        self.utc_offsets = utc_offsets
+        self.codes = codes
+        self.projects = projects
+
+    @classmethod
+    def from_events(cls, events: Sequence["ProjectEvent"]) -> "ProjectEventColumns":
+        n = len(events)
+        starts = np.empty(n, dtype=np.int64)
+        durations = np.empty(n, dtype=np.float64)
+        utc_offsets = np.empty(n, dtype=np.int32)
+        codes = np.empty(n, dtype=np.int32)
+        project_codes: Dict[Optional[str], int] = {}
+        for i, event in enumerate(events):
+            time = event.time
+            starts[i] = to_epoch_us(time)
+            utc_offsets[i] = _utc_offset_seconds(time)
+            durations[i] = event.duration
+            project = event.project
+            code = project_codes.get(project)
+            if code is None:
+                code = project_codes[project] = len(project_codes)
+            codes[i] = code
+        return cls(starts, durations, utc_offsets, codes, list(project_codes))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __repr__(self) -> str:
+        return f"<ProjectEventColumns(events={len(self)}, projects={len(self.projects)})>"
+
+    @property
+    def local_starts(self) -> np.ndarray:
+        """
+        Start times as microseconds since the epoch, shifted into the UTC offset
+        each event was recorded in
+        """
+        offsets = np.where(self.utc_offsets == NAIVE_OFFSET, 0, self.utc_offsets)
+        return self.starts + offsets.astype(np.int64) * MICROSECONDS_PER_SECOND
+
+    @property
+    def days(self) -> np.ndarray:
+        """
+        Local calendar day of each event as days since the epoch
+        """
+        return self.local_starts // MICROSECONDS_PER_DAY
+
+    def duration_by_project(
+        self, into: Optional[Dict[Optional[str], float]] = None
+    ) -> Dict[Optional[str], float]:
+        """
+        Total duration by project
+
+        :param into: Running totals to add to, which are updated in place. The
+            additions happen in event order so that accumulating batches gives
+            exactly the same floats as aggregating all events at once.
+        """
+        if into is None:
+            totals = np.bincount(
+                self.codes, weights=self.durations, minlength=len(self.projects)
+            )
+            return dict(zip(self.projects, totals.tolist()))
+
+        totals = np.array(
+            [into.get(project, 0) for project in self.projects], dtype=np.float64
+        )
+        np.add.at(totals, self.codes, self.durations)
+        into.update(zip(self.projects, totals.tolist()))
+        return into
+
+    def duration_by_day_by_project(
+        self, into: Optional[Dict[datetime.date, Dict[Optional[str], float]]] = None
+    ) -> Dict[datetime.date, Dict[Optional[str], float]]:
+        """
+        Total duration by local day of the event start and project
+
+        :param into: Running totals to add to, see :meth:`duration_by_project`
+        """
+        day_data = {} if into is None else into
+        if not len(self):
+            return day_data
+        days = self.days
+        first_day = days.min()
+        keys = (days - first_day) * len(self.projects) + self.codes
+        unique_keys, first_idx, inverse = np.unique(
+            keys, return_index=True, return_inverse=True
+        )
+        inverse = inverse.ravel()
+        day_offsets, codes = np.divmod(unique_keys, len(self.projects))
+        day_offsets_list = day_offsets.tolist()
+        unique_dates = {
+            day_offset: EPOCH_DATE + datetime.timedelta(days=int(first_day) + day_offset)
+            for day_offset in set(day_offsets_list)
+        }
+        dates = [unique_dates[day_offset] for day_offset in day_offsets_list]
+        if into is None:
+            totals = np.bincount(inverse, weights=self.durations)
+        else:
+            totals = np.array(
+                [
+                    into.get(date, {}).get(self.projects[code], 0)
+                    for date, code in zip(dates, codes.tolist())
+                ],
+                dtype=np.float64,
+            )
+            np.add.at(totals, inverse, self.durations)
+
+        # Emit groups in order of first appearance to match the per-event loop
+        codes_list = codes.tolist()
+        totals_list = totals.tolist()
+        for group in np.argsort(first_idx, kind="stable").tolist():
+            projects = day_data.get(dates[group])
+            if projects is None:
+                projects = day_data[dates[group]] = {}
+            projects[self.projects[codes_list[group]]] = totals_list[group]
+        return day_data
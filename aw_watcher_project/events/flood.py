@@ -0,0 +1,117 @@
+from typing import List, Sequence
+
+from aw_watcher_project.aw_time import (
+    MICROSECONDS_PER_SECOND,
+    from_epoch_us,
+    seconds_us,
+    to_epoch_us,
+)
+from aw_watcher_project.events.project import ProjectEvent
+from aw_watcher_project.logger import logger
+
+# Negative gaps smaller than this between events of different projects are
+# treated as touching, as in aw_transform
+NEGATIVE_GAP_TRIM_US = 100_000
+
+
+def _truncate_ms(us: int) -> int:
+    # aw_core drops sub-millisecond precision whenever a timestamp is set
+    return us - us % 1000
+
+
+def _half(us: int) -> int:
+    # Rounds half to even like dividing a timedelta by 2
+    q, r = divmod(us, 2)
+    return q + 1 if r and q % 2 else q
+
+
+def flood(events: Sequence[ProjectEvent], pulsetime: float = 5) -> List[ProjectEvent]:
+    """
+    Fills gaps of up to ``pulsetime`` seconds between events and merges
+    overlapping and nearby events of the same project
+
+    Gives the same events as converting to aw_core events and running
+    :func:`aw_transform.flood`, see its docstring for the rules, without
+    building an aw_core event per event. Like aw_core, start times come out
+    in UTC truncated to milliseconds. Events are compared by project only.
+    """
+    n = len(events)
+    starts = [_truncate_ms(to_epoch_us(event.time)) for event in events]
+    durations = [seconds_us(event.duration) for event in events]
+    order = sorted(range(n), key=lambda i: (starts[i], durations[i]))
+    starts = [starts[i] for i in order]
+    durations = [durations[i] for i in order]
+    projects = [events[i].project for i in order]
+    ids = [events[i].id for i in order]
+    pulse_us = seconds_us(pulsetime)
+
+    warned_safe = False
+    warned_unsafe = False
+    for i in range(n - 1):
+        j = i + 1
+        gap = starts[j] - (starts[i] + durations[i])
+        if not gap:
+            continue
+        same = projects[i] == projects[j]
+        if gap < 0 and same:
+            # Earlier pairs may have moved this event past the next one
+            start = min(starts[i], starts[j])
+            end = max(starts[i] + durations[i], starts[j] + durations[j])
+            starts[i] = start
+            durations[i] = end - start
+            starts[j] = _truncate_ms(end)
+            durations[j] = 0
+            if not warned_safe:
+                logger.warning(f"Merged events overlapping by {-gap / 1e6}s")
+                warned_safe = True
+        elif gap < -NEGATIVE_GAP_TRIM_US and not warned_unsafe:
+            logger.warning(
+                f"Events of different projects overlap by {-gap / 1e6}s, not merging"
+            )
+            warned_unsafe = True
+        elif -NEGATIVE_GAP_TRIM_US < gap <= pulse_us:
+            end_j = starts[j] + durations[j]
+            if same:
+                if durations[i] >= durations[j]:
+                    durations[i] = end_j - starts[i]
+                    starts[j] = _truncate_ms(end_j)
+                    durations[j] = 0
+                else:
+                    starts[j] = starts[i]
+                    durations[j] = end_j - starts[j]
+                    durations[i] = 0
+            else:
+                midpoint = starts[i] + durations[i] + _half(gap)
+                durations[i] = midpoint - starts[i]
+                starts[j] = _truncate_ms(midpoint)
+                durations[j] = end_j - midpoint
+
+    # Later events win where differing projects still overlap
+    kept: List[int] = []
+    for i in range(n):
+        if durations[i] <= 0:
+            continue
+        while kept and starts[kept[-1]] + durations[kept[-1]] > starts[i]:
+            previous = kept[-1]
+            if projects[previous] == projects[i]:
+                end = max(starts[previous] + durations[previous], starts[i] + durations[i])
+                durations[previous] = end - starts[previous]
+                break
+            durations[previous] = starts[i] - starts[previous]
+            if durations[previous] <= 0:
+                kept.pop()
+                continue
+            kept.append(i)
+            break
+        else:
+            kept.append(i)
+
+    flooded: List[ProjectEvent] = []
+    for i in kept:
+        event = ProjectEvent.__new__(ProjectEvent)
+        event.id = ids[i]
+        event.time = from_epoch_us(starts[i])
+        event.duration = durations[i] / MICROSECONDS_PER_SECOND
+        event.project = projects[i]
+        flooded.append(event)
+    return flooded
@@ -1,12 +1,26 @@
 import datetime
 from collections import defaultdict
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 
 from typing_extensions import TypedDict
 
 from aw_watcher_project.events.base import AllEventData, Event
+from aw_watcher_project.events.columnar import ProjectEventColumns
 from aw_core import Event as AWEvent
 from aw_watcher_project.exc import ProjectDoesNotExistException
+from aw_watcher_project.metrics import REGISTRY, timed
+
+PARSE_SECONDS = REGISTRY.histogram(
+    "aw_watcher_project_parse_seconds", "Time to parse event dicts", ("kind",)
+)
+PARSED_EVENTS = REGISTRY.counter(
+    "aw_watcher_project_parsed_events_total", "Event dicts parsed", ("kind",)
+)
+AGGREGATION_SECONDS = REGISTRY.histogram(
+    "aw_watcher_project_aggregation_seconds",
+    "Time to aggregate project events, per batch for streamed events",
+    ("function",),
+)
 
 
 class ProjectData(TypedDict):
@@ -18,29 +32,30 @@ class ProjectEventData(AllEventData):
 
 
 class ProjectEvent(Event):
-    data: ProjectEventData
+    __slots__ = ("project",)
 
     def __init__(self, data: ProjectEventData):
         super().__init__(data)
+        self.project: str = data["data"]["project"]
 
     @classmethod
     def from_aw_event(cls, event: AWEvent) -> 'ProjectEvent':
-        data: ProjectEventData = ProjectEventData(
-            id=event.id,
-            timestamp=event.timestamp.isoformat(),
-            duration=event.duration.total_seconds(),
-            data=ProjectData(
-                project=event.data['project']
-            )
-        )
-        return cls(data)
+        obj = cls.__new__(cls)
+        obj._set_from_aw_event(event)
+        obj.project = event.data['project']
+        return obj
 
     def __repr__(self) -> str:
         return f"<ProjectEvent(project={self.project}, time={self.time}, duration={self.duration})>"
 
     @property
-    def project(self) -> str:
-        return self.data["data"]["project"]
+    def data(self) -> ProjectEventData:  # type: ignore
+        return ProjectEventData(
+            id=self.id,
+            timestamp=self.time.isoformat(),
+            duration=self.duration,
+            data=ProjectData(project=self.project),
+        )
 
 
 def duration_by_project(events: List[ProjectEvent]) -> Dict[str, float]:
@@ -81,30 +96,66 @@ def events_by_project(events: List[ProjectEvent]) -> Dict[str, List[ProjectEvent
 
 
 class ProjectEvents:
+    """
+    Collection of project events
+
+    Aggregations run as vectorized group-bys on a columnar copy of the events
+    which is built on first use and rebuilt whenever :attr:`events` is replaced.
+    """
+
+    @timed(PARSE_SECONDS, "project_events")
     def __init__(self, events: List[ProjectEventData]):
         self.events = [ProjectEvent(event) for event in events]
+        PARSED_EVENTS.labels("project_events").inc(len(events))
+
+    @property
+    def events(self) -> List[ProjectEvent]:
+        return self._events
+
+    @events.setter
+    def events(self, events: List[ProjectEvent]):
+        self._events = events
+        self._columns: Optional[ProjectEventColumns] = None
+
+    @property
+    def columns(self) -> ProjectEventColumns:
+        if self._columns is None:
+            self._columns = ProjectEventColumns.from_events(self.events)
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self.events)
 
     def __getitem__(self, item) -> ProjectEvent:
         return self.events[item]
 
     @classmethod
     def from_aw_events(cls, events: List[AWEvent]) -> 'ProjectEvents':
-        project_events = [ProjectEvent.from_aw_event(e) for e in events]
+        return cls.from_events([ProjectEvent.from_aw_event(e) for e in events])
+
+    @classmethod
+    def from_events(cls, events: List[ProjectEvent]) -> 'ProjectEvents':
         obj = cls([])
-        obj.events = project_events
+        obj.events = events
         return obj
 
+    @timed(AGGREGATION_SECONDS, "duration_by_project")
     def duration_by_project(self) -> Dict[str, float]:
-        return duration_by_project(self.events)
+        return self.columns.duration_by_project()  # type: ignore
 
+    @timed(AGGREGATION_SECONDS, "duration_by_day_by_project")
     def duration_by_day_by_project(self) -> Dict[datetime.date, Dict[str, float]]:
-        return duration_by_day_by_project(self.events)
+        return self.columns.duration_by_day_by_project()  # type: ignore
 
+    @timed(AGGREGATION_SECONDS, "start_end_durations_by_project")
     def start_end_durations_by_project(
         self,
     ) -> Dict[str, List[Tuple[datetime.datetime, datetime.datetime, float]]]:
+        # Events already hold parsed datetimes, so grouping them directly is
+        # cheaper than rebuilding datetimes from the columns
         return start_end_durations_by_project(self.events)
 
+    @timed(AGGREGATION_SECONDS, "events_by_project")
     def events_by_project(self) -> Dict[str, List[ProjectEvent]]:
         return events_by_project(self.events)
 
@@ -113,4 +164,33 @@ class ProjectEvents:
         try:
             return events_dict[project]
         except KeyError:
-            raise ProjectDoesNotExistException(project)
\ No newline at end of file
+            raise ProjectDoesNotExistException(project)
+
+
+def duration_by_project_from_batches(
+    batches: Iterable[ProjectEvents],
+) -> Dict[str, float]:
+    """
+    Total duration by project over a stream of event batches, such as from
+    :func:`~aw_watcher_project.get_time_spent.iter_events`
+    """
+    durations: Dict[str, float] = {}
+    seconds = AGGREGATION_SECONDS.labels("duration_by_project_from_batches")
+    for batch in batches:
+        with seconds.time():
+            batch.columns.duration_by_project(into=durations)  # type: ignore
+    return durations
+
+
+def duration_by_day_by_project_from_batches(
+    batches: Iterable[ProjectEvents],
+) -> Dict[datetime.date, Dict[str, float]]:
+    """
+    Total duration by day and project over a stream of event batches
+    """
+    day_data: Dict[datetime.date, Dict[str, float]] = {}
+    seconds = AGGREGATION_SECONDS.labels("duration_by_day_by_project_from_batches")
+    for batch in batches:
+        with seconds.time():
+            batch.columns.duration_by_day_by_project(into=day_data)  # type: ignore
+    return day_data
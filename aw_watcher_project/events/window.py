@@ -2,6 +2,7 @@ import datetime
 from collections import defaultdict
 from typing import List, Dict, Tuple
 
+from aw_core import Event as AWEvent
 from typing_extensions import TypedDict
 
 from aw_watcher_project.events.base import AllEventData, Event
@@ -17,18 +18,35 @@ class WindowEventData(AllEventData):
 
 
 class WindowEvent(Event):
-    data: WindowEventData
+    """
+    Event of an activity bucket, keeping its data dict as it came from the
+    server so that fields such as the ``url`` of browser watchers are kept
+    """
+
+    __slots__ = ("app", "title", "window_data")
 
     def __init__(self, data: WindowEventData):
         super().__init__(data)
+        self._set_data(data["data"])
+
+    def _set_from_aw_event(self, event: AWEvent):
+        super()._set_from_aw_event(event)
+        self._set_data(event.data)  # type: ignore
+
+    def _set_data(self, data: WindowData):
+        self.window_data = data
+        # Buckets other than aw-watcher-window, such as browser watchers, may not have an app
+        self.app: str = data.get("app", "")
+        self.title: str = data.get("title", "")
 
     def __repr__(self) -> str:
         return f"<WindowEvent(app={self.app}, title={self.title}, time={self.time}, duration={self.duration})>"
 
     @property
-    def app(self) -> str:
-        return self.data["data"]["app"]
-
-    @property
-    def title(self) -> str:
-        return self.data["data"]["title"]
\ No newline at end of file
+    def data(self) -> WindowEventData:  # type: ignore
+        return WindowEventData(
+            id=self.id,
+            timestamp=self.time.isoformat(),
+            duration=self.duration,
+            data=self.window_data.copy(),
+        )
@@ -11,4 +11,28 @@ class CannotRemoveProjectException(ConfigException):
 
 
 class ProjectDoesNotExistException(ValueError):
-    pass
\ No newline at end of file
+    pass
+
+
+class DaemonException(Exception):
+    pass
+
+
+class DaemonNotRunningException(DaemonException):
+    pass
+
+
+class DaemonAlreadyRunningException(DaemonException):
+    pass
+
+
+class DaemonCommandException(DaemonException):
+    pass
+
+
+class RuleException(ConfigException):
+    pass
+
+
+class ExportException(Exception):
+    pass
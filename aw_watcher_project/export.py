@@ -0,0 +1,284 @@
+"""
+Streaming export of project events to CSV, NDJSON or Parquet
+
+Events are read with :func:`~aw_watcher_project.get_time_spent.iter_events`
+one chunk at a time and written as each chunk arrives, Parquet buffering at
+most one row group, so memory use does not grow with the exported range.
+"""
+import csv
+import datetime
+import json
+import sys
+from pathlib import Path
+from typing import IO, Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from aw_watcher_project.aw_time import MICROSECONDS_PER_SECOND, from_epoch_us
+from aw_watcher_project.buckets import WINDOW_BUCKET_PREFIX, query_bucket
+from aw_watcher_project.cache import get_default_cache
+from aw_watcher_project.client import get_client
+from aw_watcher_project.events.columnar import (
+    NAIVE_OFFSET,
+    ProjectEventColumns,
+    offset_timezone,
+)
+from aw_watcher_project.events.project import ProjectEvents
+from aw_watcher_project.exc import ExportException
+from aw_watcher_project.get_time_spent import iter_events
+from aw_watcher_project.intervals import Intervals
+
+FORMATS = ("csv", "ndjson", "parquet")
+SUFFIX_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet"}
+COLUMNS = ("start", "end", "duration", "project", "day")
+WINDOW_COLUMNS = ("app", "title")
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+
+class ExportRow(NamedTuple):
+    start: datetime.datetime
+    end: datetime.datetime
+    duration: float
+    project: str
+    day: datetime.date
+    app: Optional[str] = None
+    title: Optional[str] = None
+
+
+def event_rows(events: ProjectEvents) -> List[ExportRow]:
+    return [
+        ExportRow(event.time, event.end_time, event.duration, event.project, event.day)
+        for event in events
+    ]
+
+
+def window_rows(events: ProjectEvents, window_events: Sequence[Dict[str, Any]]) -> List[ExportRow]:
+    """
+    Project events split at the window events they overlap, with the app and
+    title of each window
+
+    Parts of project events without a window event are kept with no app and
+    title, so durations add up to those of the project events.
+    """
+    if not len(events):
+        return []
+    columns = events.columns
+    projects = Intervals.from_arrays(columns.starts, _ends(columns))
+    windows = Intervals.from_event_data(window_events)
+    joined, joined_windows = projects.join(windows)
+    # Zero-length parts where a window touches an event add nothing
+    keep = joined.ends > joined.starts
+    uncovered = projects.difference(windows)
+    starts = np.concatenate([joined.starts[keep], uncovered.starts])
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order].tolist()
+    ends_list = np.concatenate([joined.ends[keep], uncovered.ends])[order].tolist()
+    event_index = np.concatenate([joined.index[keep], uncovered.index])[order].tolist()
+    window_index = np.concatenate(
+        [joined_windows[keep], np.full(len(uncovered), -1, dtype=np.int64)]
+    )[order].tolist()
+
+    offsets = columns.utc_offsets.tolist()
+    project_names = [columns.projects[code] for code in columns.codes.tolist()]
+    rows: List[ExportRow] = []
+    for start, end, i, w in zip(starts, ends_list, event_index, window_index):
+        start_time = _to_datetime(start, offsets[i])
+        window = window_events[w]["data"] if w >= 0 else {}
+        rows.append(
+            ExportRow(
+                start_time,
+                _to_datetime(end, offsets[i]),
+                (end - start) / MICROSECONDS_PER_SECOND,
+                project_names[i],
+                start_time.date(),
+                window.get("app"),
+                window.get("title"),
+            )
+        )
+    return rows
+
+
+def _to_datetime(us: int, offset: int) -> datetime.datetime:
+    time = from_epoch_us(us)
+    if offset == NAIVE_OFFSET:
+        return time.replace(tzinfo=None)
+    return time.astimezone(offset_timezone(offset))
+
+
+def _ends(columns: ProjectEventColumns) -> np.ndarray:
+    return columns.starts + np.rint(columns.durations * MICROSECONDS_PER_SECOND).astype(np.int64)
+
+
+def _batch_range(events: ProjectEvents) -> Tuple[datetime.datetime, datetime.datetime]:
+    columns = events.columns
+    return (
+        from_epoch_us(int(columns.starts.min())),
+        from_epoch_us(int(_ends(columns).max())),
+    )
+
+
+def _text_values(row: ExportRow, n: int) -> tuple:
+    return (
+        row.start.isoformat(),
+        row.end.isoformat(),
+        row.duration,
+        row.project,
+        row.day.isoformat(),
+        *row[5:n],
+    )
+
+
+class _CsvWriter:
+    def __init__(self, file: IO[str], columns: Sequence[str]):
+        self.columns = columns
+        self._writer = csv.writer(file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: Sequence[ExportRow]):
+        n = len(self.columns)
+        self._writer.writerows(_text_values(row, n) for row in rows)
+
+    def close(self):
+        pass
+
+
+class _NdjsonWriter:
+    def __init__(self, file: IO[str], columns: Sequence[str]):
+        self.columns = columns
+        self._file = file
+
+    def write(self, rows: Sequence[ExportRow]):
+        n = len(self.columns)
+        for row in rows:
+            values = _text_values(row, n)
+            self._file.write(json.dumps(dict(zip(self.columns, values))) + "\n")
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter:
+    def __init__(self, path: Path, columns: Sequence[str], row_group_size: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ExportException(
+                "Parquet export needs pyarrow, install aw-watcher-project[parquet]"
+            ) from e
+        self._pa = pa
+        self.columns = columns
+        self.row_group_size = row_group_size
+        types = {
+            "start": pa.timestamp("us", tz="UTC"),
+            "end": pa.timestamp("us", tz="UTC"),
+            "duration": pa.float64(),
+            "project": pa.string(),
+            "day": pa.date32(),
+            "app": pa.string(),
+            "title": pa.string(),
+        }
+        self.schema = pa.schema([(column, types[column]) for column in columns])
+        self._writer = pq.ParquetWriter(str(path), self.schema)
+        self._rows: List[ExportRow] = []
+
+    def write(self, rows: Sequence[ExportRow]):
+        self._rows.extend(rows)
+        while len(self._rows) >= self.row_group_size:
+            self._flush(self._rows[:self.row_group_size])
+            del self._rows[:self.row_group_size]
+
+    def _flush(self, rows: Sequence[ExportRow]):
+        arrays = [
+            self._pa.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(self.schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self._rows:
+            self._flush(self._rows)
+            self._rows = []
+        self._writer.close()
+
+
+def export_format(path: Union[str, Path]) -> str:
+    """
+    Format of an output file from its suffix
+    """
+    suffix = Path(path).suffix.lower()
+    try:
+        return SUFFIX_FORMATS[suffix]
+    except KeyError:
+        raise ExportException(
+            f"cannot tell the format of {path}, use one of {', '.join(FORMATS)}"
+        )
+
+
+def export_events(
+    output: Union[str, Path, IO[str]],
+    format: Optional[str] = None,
+    begin: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    flood_time: Optional[float] = None,
+    chunk: str = "week",
+    windows: bool = False,
+    use_cache: bool = True,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> int:
+    """
+    Writes not-AFK project events to a file, one chunk of events at a time,
+    returning the number of rows
+
+    :param output: Path, ``-`` for standard output, or an open text file.
+        Parquet needs a path
+    :param format: ``csv``, ``ndjson`` or ``parquet``, by default from the
+        suffix of ``output``
+    :param windows: Split events at the window events they overlap and add
+        the ``app`` and ``title`` of each
+    :param row_group_size: Rows per Parquet row group, which are buffered
+    """
+    is_path = isinstance(output, (str, Path)) and str(output) != "-"
+    if format is None:
+        format = export_format(output) if is_path else "csv"  # type: ignore
+    if format not in FORMATS:
+        raise ExportException(f"unknown format {format}, use one of {', '.join(FORMATS)}")
+    columns = COLUMNS + WINDOW_COLUMNS if windows else COLUMNS
+
+    opened: Optional[IO[str]] = None
+    if format == "parquet":
+        if not is_path:
+            raise ExportException("Parquet can only be written to a file")
+        writer: Any = _ParquetWriter(Path(output), columns, row_group_size)  # type: ignore
+    else:
+        if is_path:
+            file = opened = open(output, "w", newline="")  # type: ignore
+        elif isinstance(output, (str, Path)):
+            file = sys.stdout
+        else:
+            file = output
+        writer = (_CsvWriter if format == "csv" else _NdjsonWriter)(file, columns)
+
+    client = get_client() if windows else None
+    cache = get_default_cache() if use_cache and windows else None
+    rows = 0
+    try:
+        batches = iter_events(begin, end, flood_time=flood_time, use_cache=use_cache, chunk=chunk)
+        for batch in batches:
+            if not len(batch):
+                continue
+            if windows:
+                batch_begin, batch_end = _batch_range(batch)
+                window_events = query_bucket(
+                    client, WINDOW_BUCKET_PREFIX, batch_begin, batch_end, cache
+                )
+                batch_rows = window_rows(batch, window_events)
+            else:
+                batch_rows = event_rows(batch)
+            writer.write(batch_rows)
+            rows += len(batch_rows)
+    finally:
+        writer.close()
+        if opened is not None:
+            opened.close()
+    return rows
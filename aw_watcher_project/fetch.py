@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Sequence
+
+from aw_client import ActivityWatchClient
+
+from aw_watcher_project.logger import logger
+from aw_watcher_project.periods import TimePeriod
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _shards(periods: Sequence[TimePeriod], n: int) -> List[List[TimePeriod]]:
+    """
+    Splits periods into at most n contiguous, evenly sized groups
+    """
+    size, extra = divmod(len(periods), n)
+    shards: List[List[TimePeriod]] = []
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            shards.append(list(periods[start:end]))
+        start = end
+    return shards
+
+
+def query_periods(
+    client: ActivityWatchClient,
+    query: str,
+    periods: Sequence[TimePeriod],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[Any]:
+    """
+    Runs a query over many time periods, returning one result per period in order
+
+    The periods are split into up to ``max_workers`` contiguous shards. Each
+    shard is sent as a single multi-period query and the shards run
+    concurrently on a thread pool. With ``max_workers=1`` this is one request.
+    """
+    if not periods:
+        return []
+    shards = _shards(periods, max(1, max_workers))
+    if len(shards) == 1:
+        return client.query(query, shards[0])
+
+    logger.debug(f"Querying {len(periods)} periods in {len(shards)} shards")
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        shard_results = pool.map(lambda shard: client.query(query, shard), shards)
+        return [result for results in shard_results for result in results]
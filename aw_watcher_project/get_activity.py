@@ -1,59 +1,117 @@
 import datetime
-from typing import Optional, Sequence, List
+from typing import Dict, List, Optional, Sequence
 
-from aw_client import ActivityWatchClient
+import numpy as np
 
-from aw_watcher_project.aw_time import get_begin_time, get_default_end_time
-from aw_watcher_project.events.activity import Activity, ActivityData
+from aw_watcher_project.aw_time import get_time_range
+from aw_watcher_project.buckets import (
+    AFK_BUCKET_PREFIX,
+    PROJECT_BUCKET_PREFIX,
+    WINDOW_BUCKET_PREFIX,
+    not_afk_intervals,
+    query_buckets,
+)
+from aw_watcher_project.cache import get_default_cache
+from aw_watcher_project.client import get_client
+from aw_watcher_project.events.activity import Activity
+from aw_watcher_project.intervals import Intervals
 
-DEFAULT_ACTIVITY_BUCKETS = ('aw-watcher-window_',)
+DEFAULT_ACTIVITY_BUCKETS = (WINDOW_BUCKET_PREFIX,)
 
 
 def _bucket_name_to_event_name(name: str) -> str:
     return name.replace('-', '_') + 'events'
 
 
-def _bucket_query(name: str, project_name: str) -> str:
-    event_name = _bucket_name_to_event_name(name)
-    query = f"""
-{event_name} = query_bucket(find_bucket("{name}"));
-{event_name} = filter_period_intersect({event_name}, filter_keyvals(project_events, "project", ["{project_name}"]));
-""".strip()
-    return query
+def _projects(events: Sequence[dict], intervals: Intervals) -> List[str]:
+    return [events[i]['data']['project'] for i in intervals.index.tolist()]
 
 
-def _get_query_return_value(activity_buckets: Sequence[str]) -> str:
-    event_names = [_bucket_name_to_event_name(name) for name in activity_buckets]
-    key_value_pairs = [f'"{name}": {name}' for name in event_names]
-    return 'RETURN = {' + ', '.join(key_value_pairs) + '};'
+def get_project_names(
+    begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+    use_cache: bool = True,
+) -> List[str]:
+    """
+    Projects which have not-AFK time in the range
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    cache = get_default_cache() if use_cache else None
+    project_events, afk_events = query_buckets(
+        client, (PROJECT_BUCKET_PREFIX, AFK_BUCKET_PREFIX), begin, end, cache
+    )
+    not_afk = not_afk_intervals(project_events, afk_events)
+    return list(dict.fromkeys(_projects(project_events, not_afk)))
 
 
-def _get_activity_query(project: str, activity_buckets: Sequence[str] = DEFAULT_ACTIVITY_BUCKETS) -> str:
-    bucket_queries = '\n'.join([_bucket_query(bucket, project) for bucket in activity_buckets])
-    query = f"""
-afk_events = query_bucket(find_bucket("aw-watcher-afk_"));
-project_events = query_bucket(find_bucket("aw-watcher-project-selected_"));
-project_events = filter_keyvals(project_events, "project", ["{project}"]);
-project_events = filter_period_intersect(project_events, filter_keyvals(afk_events, "status", ["not-afk"]));
-{bucket_queries}
-{_get_query_return_value(activity_buckets)}
-       """.strip()
-    return query
+def get_activity_for_projects(
+    projects: Optional[Sequence[str]] = None, begin: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    activity_buckets: Sequence[str] = DEFAULT_ACTIVITY_BUCKETS, use_cache: bool = True,
+) -> Dict[str, Activity]:
+    """
+    Activity in each project, computed locally from the raw buckets
+
+    Each bucket is fetched once for all projects. The activity events are
+    intersected with the not-AFK project events in one sweep, as aw-server's
+    ``filter_period_intersect`` would, and the parts are then grouped by project.
+
+    :param projects: Projects to get activity for, defaults to all projects with
+        not-AFK time in the range
+    :return: Activity by project, with events from every one of ``activity_buckets``
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    cache = get_default_cache() if use_cache else None
+    project_events, afk_events, *activity_events = query_buckets(
+        client,
+        (PROJECT_BUCKET_PREFIX, AFK_BUCKET_PREFIX, *activity_buckets),
+        begin,
+        end,
+        cache,
+    )
+    not_afk = not_afk_intervals(project_events, afk_events)
+    names = np.array([event["data"]["project"] for event in project_events], dtype=object)
+    if projects is None:
+        projects = list(dict.fromkeys(_projects(project_events, not_afk)))
+    by_bucket = []
+    for events in activity_events:
+        joined, project_index = Intervals.from_event_data(events).join(not_afk)
+        by_bucket.append(_group_by_project(joined, names[project_index]))
+    return {
+        project: Activity.from_activity_data(
+            {
+                _bucket_name_to_event_name(bucket): (
+                    grouped[project].to_event_data(events) if project in grouped else []
+                )
+                for bucket, grouped, events in zip(activity_buckets, by_bucket, activity_events)
+            }
+        )
+        for project in projects
+    }
+
+
+def _group_by_project(intervals: Intervals, projects: np.ndarray) -> Dict[str, Intervals]:
+    # One stable sort splits the intervals by project, keeping their order
+    # within each project
+    if not len(intervals):
+        return {}
+    names, codes = np.unique(projects, return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(codes))[:-1])
+    return {
+        name: Intervals(intervals.starts[group], intervals.ends[group], intervals.index[group])
+        for name, group in zip(names.tolist(), groups)
+    }
 
 
 def get_activity(
     project: str, begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
-    activity_buckets: Sequence[str] = DEFAULT_ACTIVITY_BUCKETS
+    activity_buckets: Sequence[str] = DEFAULT_ACTIVITY_BUCKETS, use_cache: bool = True,
 ) -> Activity:
-    if begin is None:
-        begin = get_begin_time()
-    if end is None:
-        end = get_default_end_time()
-    time_periods = [(begin, end)]
-    client = ActivityWatchClient()
-    query = _get_activity_query(project, activity_buckets)
-    events: List[ActivityData] = client.query(query, time_periods)
-    return Activity(events[0]['aw_watcher_window_events'])
+    return get_activity_for_projects(
+        [project], begin, end, activity_buckets=activity_buckets, use_cache=use_cache
+    )[project]
 
 
 if __name__ == '__main__':
@@ -1,40 +1,164 @@
 import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
-from aw_core import Event as AWEvent
-from aw_transform import flood
-from tzlocal import get_localzone
-
-from aw_client import ActivityWatchClient
-
-from aw_watcher_project.aw_time import get_begin_time, get_default_end_time
-from aw_watcher_project.events.project import ProjectEventData, ProjectEvents
+from aw_watcher_project.aw_time import get_time_range
+from aw_watcher_project.buckets import get_not_afk_project_event_data
+from aw_watcher_project.cache import cached_day_results, get_default_cache
+from aw_watcher_project.client import SharedActivityWatchClient, get_client
+from aw_watcher_project.events.flood import flood
+from aw_watcher_project.events.project import (
+    ProjectEvent,
+    ProjectEventData,
+    ProjectEvents,
+)
+from aw_watcher_project.periods import (
+    UNBOUNDED_END,
+    UNBOUNDED_START,
+    TimePeriod,
+    clip_event_data,
+    day_periods,
+    split_time_range,
+    stitch_event_data,
+)
 
 
 def get_events(
     begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
-    flood_time: Optional[float] = None,
+    flood_time: Optional[float] = None, use_cache: bool = True,
 ) -> ProjectEvents:
-    if begin is None:
-        begin = get_begin_time()
-    if end is None:
-        end = get_default_end_time()
-    time_periods = [(begin, end)]
-    client = ActivityWatchClient()
-    events: List[List[ProjectEventData]] = client.query(
-        """
-afk_events = query_bucket(find_bucket("aw-watcher-afk_"));
-project_events = query_bucket(find_bucket("aw-watcher-project-selected_"));
-project_events = filter_period_intersect(project_events, filter_keyvals(afk_events, "status", ["not-afk"]));
-RETURN = project_events;
-       """,
-        time_periods,
-    )
+    """
+    Not-AFK project events, intersected locally from the raw project and AFK
+    buckets so that the cached buckets are shared with other reports
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    cache = get_default_cache() if use_cache else None
+    events = get_not_afk_project_event_data(client, begin, end, cache)
+    project_events = ProjectEvents(events)
+    if flood_time:
+        project_events.events = flood(project_events.events, pulsetime=flood_time)
+    return project_events
+
+
+def iter_events(
+    begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+    flood_time: Optional[float] = None, use_cache: bool = True, chunk: str = "week",
+) -> Iterator[ProjectEvents]:
+    """
+    Streams project events as one batch per day, week or month
+
+    Only one chunk is held in memory at a time. Events split at a chunk
+    boundary are stitched back together and flooding carries over between
+    chunks, so aggregating the batches gives the same totals as
+    :func:`get_events`, see :func:`~aw_watcher_project.events.project.duration_by_project_from_batches`.
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    periods = split_time_range(begin, end, chunk)
+    batches = _iter_event_data_batches(client, periods, use_cache)
+    if flood_time:
+        yield from _flood_batches(batches, flood_time)
+        return
+    for batch in batches:
+        yield ProjectEvents(batch)
+
+
+def _iter_event_data_batches(
+    client: SharedActivityWatchClient, periods: Sequence[TimePeriod], use_cache: bool
+) -> Iterator[List[ProjectEventData]]:
+    previous: Optional[List[ProjectEventData]] = None
+    cache = get_default_cache() if use_cache else None
+    for i, (start, end) in enumerate(periods):
+        events = get_not_afk_project_event_data(client, start, end, cache)
+        if not use_cache:
+            # Only clip at chunk boundaries, the outer edges are left as a
+            # single query over the whole range would return them
+            clip_start = start if i > 0 else UNBOUNDED_START
+            clip_end = end if i < len(periods) - 1 else UNBOUNDED_END
+            events = clip_event_data(events, (clip_start, clip_end))  # type: ignore
+        if previous is not None:
+            previous, events = stitch_event_data(previous, events, start)  # type: ignore
+            yield previous
+        previous = events
+    if previous is not None:
+        yield previous
+
+
+def _flood_batches(
+    batches: Iterable[List[ProjectEventData]], pulsetime: float
+) -> Iterator[ProjectEvents]:
+    # The last flooded event is held back so it can be flooded against the
+    # first event of the next chunk
+    carry: List[ProjectEvent] = []
+    for batch in batches:
+        flooded = flood(carry + ProjectEvents(batch).events, pulsetime=pulsetime)
+        carry = flooded[-1:]
+        yield ProjectEvents.from_events(flooded[:-1])
+    if carry:
+        yield ProjectEvents.from_events(carry)
+
+
+def _summary_query(flood_time: Optional[float] = None) -> str:
+    lines = [
+        'afk_events = query_bucket(find_bucket("aw-watcher-afk_"));',
+        'project_events = query_bucket(find_bucket("aw-watcher-project-selected_"));',
+        'project_events = filter_period_intersect(project_events, filter_keyvals(afk_events, "status", ["not-afk"]));',
+    ]
     if flood_time:
-        events_e: List[AWEvent] = [AWEvent(**e) for e in events[0]]
-        events_e = flood(events_e, pulsetime=flood_time)
-        return ProjectEvents.from_aw_events(events_e)
-    return ProjectEvents(events[0])
+        # aw-server-python only parses integer literals
+        if flood_time != int(flood_time):
+            raise ValueError(f"flood_time must be whole seconds for the server, got {flood_time}")
+        lines.append(f"project_events = flood(project_events, {int(flood_time)});")
+    lines.append('RETURN = merge_events_by_keys(project_events, ["project"]);')
+    return "\n".join(lines)
+
+
+def _summary_durations(events: List[ProjectEventData]) -> Dict[str, float]:
+    return {event["data"]["project"]: event["duration"] for event in events}
+
+
+def get_duration_by_project(
+    begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+    flood_time: Optional[float] = None,
+) -> Dict[str, float]:
+    """
+    Total not-AFK duration by project, summed by aw-server
+
+    Gives the same result as ``get_events(...).duration_by_project()`` while
+    only transferring one event per project.
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    events = client.query(_summary_query(flood_time), [(begin, end)])[0]
+    return _summary_durations(events)
+
+
+def get_duration_by_day_by_project(
+    begin: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+    flood_time: Optional[float] = None, use_cache: bool = True,
+) -> Dict[datetime.date, Dict[str, float]]:
+    """
+    Total not-AFK duration by day and project, summed by aw-server
+
+    Each day of the range (in the time zone of ``begin``) is a separate period
+    of one multi-period query, and elapsed days are cached. Matches
+    ``get_events(...).duration_by_day_by_project()`` when ``begin`` is in the
+    time zone of the event timestamps, except for events crossing midnight,
+    which aw-server counts towards each day they overlap.
+    """
+    begin, end = get_time_range(begin, end)
+    client = get_client()
+    query = _summary_query(flood_time)
+    periods = day_periods(begin, end)
+    if use_cache:
+        results = cached_day_results(client, query, periods, get_default_cache())
+    else:
+        results = client.query(query, periods)
+    return {
+        start.date(): _summary_durations(events)
+        for (start, _), events in zip(periods, results)
+        if events
+    }
 
 
 if __name__ == "__main__":
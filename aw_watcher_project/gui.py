@@ -1,20 +1,22 @@
-from copy import deepcopy
-from datetime import datetime, timezone
+import signal
+import socket
+import time
 from functools import partial
-from pathlib import Path
-from tempfile import TemporaryDirectory
-from time import sleep
-from typing import Sequence, Optional, List
-from threading import Thread
+from typing import Dict, Sequence, Optional, List, Set
 
-from PIL import Image, ImageDraw
+from PySide6 import QtCore as c
 from PySide6 import QtGui as g
 from PySide6 import QtWidgets as w
-from aw_core.models import Event
-from aw_client import ActivityWatchClient
 
-from aw_watcher_project.config import ProjectWatcherConfig, BUCKET_NAME
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.heartbeat import create_heartbeat_worker
+from aw_watcher_project.icons import IconCache, current_theme, icon_label
 from aw_watcher_project.logger import logger
+from aw_watcher_project.project_tree import ProjectFilter, ProjectTree
+
+# Entries shown per menu level, the rest are reached through quick switch
+MAX_MENU_ITEMS = 50
+MAX_QUICK_SWITCH_RESULTS = 200
 
 
 class AddProjectWindow(w.QWidget):
@@ -41,11 +43,15 @@ class RemoveProjectWindow(w.QWidget):
     def __init__(self, gui: "ProjectWatcherGUI", parent: Optional[w.QWidget] = None):
         super().__init__(parent)
         self.gui = gui
-        self._current_projects: Optional[List[str]] = None
         layout = w.QFormLayout()
         self.ok = w.QPushButton("OK")
         self.ok.clicked.connect(self.remove_project)
         self.cb = w.QComboBox()
+        # Typing filters the dropdown, which may hold thousands of projects
+        self.cb.setEditable(True)
+        self.cb.setInsertPolicy(w.QComboBox.NoInsert)
+        self.cb.completer().setFilterMode(c.Qt.MatchContains)
+        self.cb.completer().setCompletionMode(w.QCompleter.PopupCompletion)
         self.set_projects()
 
         layout.addRow(self.cb, self.ok)
@@ -55,36 +61,161 @@ class RemoveProjectWindow(w.QWidget):
     def remove_project(self):
         project = self.cb.currentText()
         logger.debug(f"Got project {project} from remove project input")
+        if project not in self.gui.projects:
+            return
         self.gui.remove_project(project)
-        self._remove_project_from_dropdown(project)
+        self.cb.removeItem(self.cb.findText(project))
 
     def set_projects(self):
-        if self._current_projects is not None:
-            for project in self._current_projects:
-                self.cb.removeItem(0)
-        self.cb.addItems(self.gui.config.projects)
-        self._current_projects = deepcopy(self.gui.config.projects)
-
-    def _remove_project_from_dropdown(self, project: str):
-        if self._current_projects is None:
-            raise ValueError("cannot remove projects as not yet set")
-        idx = self._current_projects.index(project)
-        self.cb.removeItem(idx)
-        self._current_projects.remove(project)
-
-
-def make_text_icon(text: str) -> g.QIcon:
-    temp_img = Image.new("RGBA", (200, 100), (255, 0, 0, 0))
-    d = ImageDraw.Draw(temp_img)
-    text_width, text_height = d.textsize(text)
-    img = Image.new("RGBA", (text_width, text_height), (0, 0, 0, 0))
-    d = ImageDraw.Draw(img)
-    d.text((0, 0), text, fill=(255, 255, 255))
-    with TemporaryDirectory() as tmp_dir:
-        out_path = str(Path(tmp_dir) / "temp.png")
-        img.save(out_path)
-        icon = g.QIcon(out_path)
-    return icon
+        self.cb.clear()
+        self.cb.addItems(list(self.gui.projects))
+
+
+class QuickSwitchWindow(w.QWidget):
+    """
+    Search box for switching project, filtering as the user types
+    """
+
+    def __init__(self, gui: "ProjectWatcherGUI", parent: Optional[w.QWidget] = None):
+        super().__init__(parent)
+        self.gui = gui
+        self.filter = ProjectFilter(gui.projects)
+        layout = w.QVBoxLayout()
+        self.search = w.QLineEdit()
+        self.search.setPlaceholderText("Search projects")
+        self.search.textChanged.connect(self.update_results)
+        self.search.returnPressed.connect(self.select_project)
+        self.results = w.QListWidget()
+        self.results.itemActivated.connect(self.select_project)
+        layout.addWidget(self.search)
+        layout.addWidget(self.results)
+        self.setLayout(layout)
+        self.setWindowTitle("Switch Project")
+
+    def show_search(self, text: str = ""):
+        self.filter.reset()
+        self.search.setText(text)
+        self.update_results(text)
+        self.show()
+        self.activateWindow()
+        self.search.setFocus()
+
+    def update_results(self, text: str):
+        matches = self.filter.matches(text)
+        self.results.clear()
+        self.results.addItems(matches[:MAX_QUICK_SWITCH_RESULTS])
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    def select_project(self):
+        item = self.results.currentItem()
+        if item is None:
+            return
+        self.gui._select_project(item.text())
+        self.hide()
+
+
+class ProjectMenu:
+    """
+    Project entries of the tray menu, nested by prefix
+
+    Each level is built when its menu is about to be shown, so opening the
+    tray only creates the entries on screen. Actions are indexed by project
+    so selecting one does not scan the menu.
+    """
+
+    def __init__(self, gui: "ProjectWatcherGUI", menu: w.QMenu, before: g.QAction):
+        self.gui = gui
+        self.tree = gui.projects
+        self.menu = menu
+        self.before = before
+        self.selected: Optional[str] = None
+        self.action_group = g.QActionGroup(menu)
+        self.action_group.setExclusive(True)
+        self._actions: Dict[str, g.QAction] = {}
+        self._menus: Dict[str, w.QMenu] = {}
+        self._items: Dict[str, List[g.QAction]] = {}
+        self._dirty: Set[str] = {""}
+        menu.aboutToShow.connect(partial(self._populate, ""))
+
+    def select(self, project: Optional[str]):
+        previous = self._actions.get(self.selected) if self.selected else None
+        if previous is not None:
+            previous.setChecked(False)
+        self.selected = project
+        action = self._actions.get(project) if project else None
+        if action is not None:
+            action.setChecked(True)
+
+    def project_changed(self, project: str):
+        """
+        Rebuilds the levels leading to an added or removed project when next shown
+        """
+        prefix = self.tree.parent_path(project)
+        while True:
+            self._dirty.add(prefix)
+            if not prefix:
+                break
+            prefix = self.tree.parent_path(prefix)
+
+    def _populate(self, prefix: str):
+        if prefix not in self._dirty:
+            return
+        self._dirty.discard(prefix)
+        menu = self.menu if not prefix else self._menus[prefix]
+        self._clear(prefix, menu)
+        node = self.tree.node(prefix)
+        if node is None:
+            return
+
+        items: List[g.QAction] = []
+        if prefix and node.is_project:
+            items.append(self._project_action(node.project, node.name, menu))
+            items.append(menu.addSeparator())
+        children = list(node.children.values())
+        for child in children[:MAX_MENU_ITEMS]:
+            if child.is_group:
+                submenu = w.QMenu(child.name, menu)
+                submenu.aboutToShow.connect(partial(self._populate, child.path))
+                self._menus[child.path] = submenu
+                self._dirty.add(child.path)
+                items.append(submenu.menuAction())
+            else:
+                items.append(self._project_action(child.project, child.name, menu))
+        if len(children) > MAX_MENU_ITEMS:
+            more = g.QAction(f"More ({len(children) - MAX_MENU_ITEMS})...", menu)
+            search = prefix + self.tree.separator if prefix else ""
+            more.triggered.connect(partial(self.gui.show_quick_switch, search))
+            items.append(more)
+
+        for item in items:
+            if prefix:
+                menu.addAction(item)
+            else:
+                menu.insertAction(self.before, item)
+        self._items[prefix] = items
+
+    def _project_action(self, project: str, label: str, menu: w.QMenu) -> g.QAction:
+        action = g.QAction(label, menu)
+        action.setCheckable(True)
+        action.setChecked(project == self.selected)
+        action.triggered.connect(partial(self.gui._select_project, project))
+        self.action_group.addAction(action)
+        self._actions[project] = action
+        return action
+
+    def _clear(self, prefix: str, menu: w.QMenu):
+        for item in self._items.pop(prefix, []):
+            menu.removeAction(item)
+            item.deleteLater()
+        # Entries below this level are recreated with it
+        below = prefix + self.tree.separator if prefix else ""
+        for project in [p for p in self._actions if p == prefix or p.startswith(below)]:
+            self.action_group.removeAction(self._actions.pop(project))
+        for path in [p for p in self._menus if p.startswith(below) and p != prefix]:
+            self._menus.pop(path).deleteLater()
+            self._items.pop(path, None)
+            self._dirty.discard(path)
 
 
 class ProjectWatcherGUI:
@@ -95,19 +226,27 @@ class ProjectWatcherGUI:
         aw_testing: bool = False,
     ):
         logger.info("Initializing Project Watcher")
+        self.started_at = time.monotonic()
         self.config = config
         self.interval = interval
-        self.client = ActivityWatchClient("project-watcher-client", testing=aw_testing)
-        self.bucket_id = "{}_{}".format(BUCKET_NAME, self.client.client_hostname)
-        self.client.create_bucket(self.bucket_id, event_type="project-selection")
         self.selected_project: Optional[str] = None
-        self._hb_thread: Optional[Thread] = None
-        self._is_quitting = False
-        self._project_actions: List[g.QAction] = []
+        # Creates the bucket in the background, so the tray does not wait for
+        # the server. Selections are spooled until it is reachable
+        self.heartbeats = create_heartbeat_worker(interval, aw_testing=aw_testing)
+        self.client = self.heartbeats.client
+        self.bucket_id = self.heartbeats.bucket_id
+        self.projects = ProjectTree(self.config.projects)
 
         self.app = w.QApplication([])
         self.app.setQuitOnLastWindowClosed(False)
 
+        # Render icons up front so selecting a project only looks one up
+        self.icons = IconCache()
+        labels = list(dict.fromkeys(icon_label(project) for project in self.projects))
+        self.icons.prerender(
+            ["N/A"] + labels[:self.icons.max_icons - 1], theme=current_theme()
+        )
+
         # Adding an icon
 
         # Adding item on the menu bar
@@ -120,6 +259,12 @@ class ProjectWatcherGUI:
         self.na.triggered.connect(self._set_no_project)
         self.menu.addAction(self.na)
 
+        # Search projects
+        self._quick_switch_window = QuickSwitchWindow(self)
+        self.quick_switch = g.QAction("Switch Project...")
+        self.quick_switch.triggered.connect(partial(self.show_quick_switch, ""))
+        self.menu.addAction(self.quick_switch)
+
         # Add projects
         self._add_project_window = AddProjectWindow(self)
         self.add = g.QAction("Add Project")
@@ -138,108 +283,104 @@ class ProjectWatcherGUI:
         self.menu.addAction(quit)
         self.tray.setContextMenu(self.menu)
 
-        self.action_group = g.QActionGroup(self.tray, exclusive=True)  # type: ignore
-        for project in self.config.projects:
-            self._add_project(project)
+        self.project_menu = ProjectMenu(self, self.menu, before=self.na)
+
+        # Pick up projects changed by other processes. The directory is watched
+        # as saves replace the file, which drops it from the watcher
+        self._config_watcher = c.QFileSystemWatcher(self.app)
+        self._config_watcher.addPath(str(self.config.config_path.parent))
+        if self.config.config_path.exists():
+            self._config_watcher.addPath(str(self.config.config_path))
+        self._config_watcher.fileChanged.connect(self._config_changed)
+        self._config_watcher.directoryChanged.connect(self._config_changed)
+
+        self._wake_on_signals()
 
         self._set_no_project()
         self.tray.setVisible(True)
+        logger.info(f"Tray visible {time.monotonic() - self.started_at:.3f}s after start")
         logger.info("Starting GUI")
         self.app.exec_()
 
     def add_project(self, project: str):
         logger.debug(f"add_project called with {project} in GUI")
         self.config.add_project(project)
-        self._add_project(project)
-
-    def _add_project(self, project: str):
-        option = g.QAction(project, checkable=True)  # type: ignore
-        logger.debug(f"Adding project {project} in GUI")
-        select_project_func = partial(self._select_project, project)
-        option.triggered.connect(select_project_func)
-        act = self.action_group.addAction(option)
-        self.menu.insertAction(self.na, act)
-        self._project_actions.append(act)
+        self._sync_projects()
 
     def _show_remove_projects(self):
         self._remove_project_window.set_projects()
         self._remove_project_window.show()
 
+    def show_quick_switch(self, text: str = ""):
+        self._quick_switch_window.show_search(text)
+
     def remove_project(self, project: str):
         logger.debug(f"remove_project called with {project} in GUI")
-        idx = self.config.projects.index(project)
         self.config.remove_project(project)
-        self.menu.removeAction(self._project_actions[idx])
+        self._sync_projects()
+
+    def _config_changed(self, path: str):
+        config_path = str(self.config.config_path)
+        if config_path not in self._config_watcher.files() and self.config.config_path.exists():
+            self._config_watcher.addPath(config_path)
+        if self.config.reload_if_changed():
+            self._sync_projects()
+
+    def _sync_projects(self):
+        """
+        Updates the menu and search to the projects in the config, which may
+        have been reloaded
+        """
+        removed = [project for project in self.projects if project not in self.config]
+        added = [project for project in self.config if project not in self.projects]
+        for project in removed:
+            self.projects.remove(project)
+            self.project_menu.project_changed(project)
+        for project in added:
+            self.projects.add(project)
+            self.project_menu.project_changed(project)
+        if removed or added:
+            self._quick_switch_window.filter.reset()
+
+    def _wake_on_signals(self):
+        # Python runs signal handlers, such as the SIGUSR1 stack dump, only
+        # between bytecodes, which the idle event loop does not run. Signals
+        # are also written to this socket, waking the loop to run them
+        self._signal_socket, write_socket = socket.socketpair()
+        self._signal_socket.setblocking(False)
+        write_socket.setblocking(False)
+        self._signal_write_socket = write_socket
+        signal.set_wakeup_fd(write_socket.fileno())
+        self._signal_notifier = c.QSocketNotifier(
+            self._signal_socket.fileno(), c.QSocketNotifier.Read, self.app
+        )
+        self._signal_notifier.activated.connect(self._drain_signal_socket)
+
+    def _drain_signal_socket(self):
+        try:
+            self._signal_socket.recv(64)
+        except BlockingIOError:
+            pass
 
     def quit(self):
         logger.info("Exiting")
+        # Does not wait, the heartbeat thread sends its last heartbeat on its own
+        self.heartbeats.stop()
         self.app.quit()
-        self._stop_heartbeats()
-
-    def _stop_heartbeats(self):
-        logger.debug("Stopping heartbeats")
-        self._is_quitting = True
-        if self._hb_thread is not None:
-            self._hb_thread.join(timeout=self._pulse_time)
-        self._is_quitting = False
-        self._hb_thread = None
-        logger.debug("Heartbeats stopped")
-
-    @property
-    def _pulse_time(self) -> float:
-        return self.interval + 1
-
-    @property
-    def _commit_interval(self) -> float:
-        return max(0.1, self.interval - 1)
-
-    def _send_heartbeats(self):
-        with self.client:
-            while True:
-                heartbeat_data = {"project": self.selected_project}
-                now = datetime.now(timezone.utc)
-                heartbeat_event = Event(timestamp=now, data=heartbeat_data)
-
-                # Now we can send some events via heartbeats
-                # The duration between the heartbeats will be less than pulsetime, so they will get merged.
-                logger.debug(f"Sending data: {heartbeat_data}")
-                self.client.heartbeat(
-                    self.bucket_id,
-                    heartbeat_event,
-                    pulsetime=self._pulse_time,
-                    queued=True,
-                    commit_interval=self._commit_interval,
-                )
-
-                # Sleep a second until next heartbeat
-                sleep(self.interval)
-
-                if self._is_quitting:
-                    break
-
-    def _start_heartbeats(self):
-        logger.debug("Starting heartbeats")
-        self._hb_thread = Thread(target=self._send_heartbeats)
-        self._hb_thread.start()
 
     def _select_project(self, project: str):
         self.selected_project = project
         self._show_selected(project)
-        if self._hb_thread is None:
-            self._start_heartbeats()
+        self.heartbeats.select(project)
         logger.debug(f"selected project {project}")
 
-    def _show_selected(self, project: str):
-        self.tray.setIcon(make_text_icon(project[:3]))
-        action: g.QAction
-        for action in self.menu.actions():
-            if action.text() == project:
-                action.setChecked(True)
-            else:
-                action.setChecked(False)
+    def _show_selected(self, project: Optional[str]):
+        label = "N/A" if project is None else icon_label(project)
+        self.tray.setIcon(self.icons.get(label, theme=current_theme()))
+        self.project_menu.select(project)
 
     def _set_no_project(self):
         logger.debug("Set no project")
         self.selected_project = None
-        self._show_selected("N/A")
-        self._stop_heartbeats()
+        self._show_selected(None)
+        self.heartbeats.select(None)
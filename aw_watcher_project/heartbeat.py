@@ -0,0 +1,256 @@
+import datetime
+import threading
+import time
+from typing import Optional
+
+import requests
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+
+from aw_watcher_project.config import BUCKET_NAME
+from aw_watcher_project.logger import logger
+from aw_watcher_project.metrics import REGISTRY
+from aw_watcher_project.spool import HeartbeatSpool
+
+CLIENT_NAME = "project-watcher-client"
+EVENT_TYPE = "project-selection"
+
+SEND_SECONDS = REGISTRY.histogram(
+    "aw_watcher_project_heartbeat_send_seconds",
+    "Time to send a heartbeat, or to spool and replay it with a spool",
+)
+HEARTBEATS = REGISTRY.counter(
+    "aw_watcher_project_heartbeats_total",
+    "Heartbeats by whether the server accepted them, they failed, were dropped or spooled",
+    ("result",),
+)
+SPOOL_PENDING = REGISTRY.gauge(
+    "aw_watcher_project_spool_pending",
+    "Heartbeats waiting in the spool after the last replay",
+)
+
+
+class HeartbeatWorker:
+    """
+    Sends heartbeats for the selected project from a background thread
+
+    The thread sleeps on an event which :meth:`select` and :meth:`stop` set, so
+    a project switch is sent straight away instead of on the next interval.
+    On a switch the previous project gets a closing heartbeat at the switch
+    time before the new project's first one. Neither method waits for the
+    server, so both are safe to call from the UI thread.
+
+    With a ``spool`` every heartbeat is written to it first and the spool is
+    replayed after each one, so heartbeats made while the server is down are
+    sent once it is back, also after a restart.
+
+    With ``event_type`` the thread first creates the bucket, retrying with
+    exponential backoff from ``retry_delay`` up to ``max_retry_delay`` seconds
+    while the server is unreachable. Heartbeats wait in the spool meanwhile.
+    """
+
+    def __init__(
+        self,
+        client: ActivityWatchClient,
+        bucket_id: str,
+        interval: float = 5,
+        spool: Optional[HeartbeatSpool] = None,
+        event_type: Optional[str] = None,
+        retry_delay: float = 1,
+        max_retry_delay: float = 60,
+    ):
+        self.client = client
+        self.bucket_id = bucket_id
+        self.interval = interval
+        self.spool = spool
+        self.event_type = event_type
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # Monotonic times for startup measurements
+        self.created_at = time.monotonic()
+        self.first_accepted_at: Optional[float] = None
+        self._bucket_ready = event_type is None
+        self._next_attempt = 0.0
+        self._next_retry_delay = retry_delay
+        self._spool_pending = spool is not None and len(spool) > 0
+        self._project: Optional[str] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pulse_time(self) -> float:
+        return self.interval + 1
+
+    @property
+    def project(self) -> Optional[str]:
+        return self._project
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def bucket_ready(self) -> bool:
+        return self._bucket_ready
+
+    def select(self, project: Optional[str]):
+        """
+        Switches heartbeats to ``project``, or stops sending them for ``None``
+        """
+        with self._lock:
+            self._project = project
+        self._wake.set()
+        self.start()
+
+    def start(self):
+        with self._lock:
+            # A thread which has not yet seen a stop simply carries on
+            self._stopping = False
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="heartbeats")
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 0):
+        """
+        Sends a closing heartbeat for the selected project and ends the thread
+
+        :param timeout: Seconds to wait for the thread, ``0`` to return at once
+            or ``None`` to wait until it has finished
+        """
+        logger.debug("Stopping heartbeats")
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+            self._wake.set()
+        if thread is not None and timeout != 0:
+            thread.join(timeout)
+
+    def _run(self):
+        sent_project: Optional[str] = None
+        if self._spool_pending or not self._bucket_ready:
+            self._replay()
+        while True:
+            self._wake.clear()
+            with self._lock:
+                stopping = self._stopping
+                project = None if stopping else self._project
+                if stopping:
+                    self._thread = None
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if sent_project is not None and sent_project != project:
+                self._send(sent_project, now)
+            if project is not None:
+                self._send(project, now)
+            elif self._spool_pending or not self._bucket_ready:
+                self._replay()
+            sent_project = project
+            if stopping:
+                break
+            self._wake.wait(self._wait_timeout(project))
+        logger.debug("Heartbeats stopped")
+
+    def _send(self, project: str, timestamp: datetime.datetime):
+        data = {"project": project}
+        logger.debug(f"Sending data: {data}")
+        with SEND_SECONDS.time():
+            if self.spool is not None:
+                self.spool.append(self.bucket_id, timestamp, data, self.pulse_time)
+                HEARTBEATS.labels("spooled").inc()
+                self._replay()
+                return
+            if not self._ensure_bucket():
+                logger.warning(f"Dropping heartbeat for {project}, bucket not created yet")
+                HEARTBEATS.labels("dropped").inc()
+                return
+            try:
+                self.client.heartbeat(
+                    self.bucket_id,
+                    Event(timestamp=timestamp, data=data),
+                    pulsetime=self.pulse_time,
+                )
+                HEARTBEATS.labels("sent").inc()
+                self._accepted()
+            except requests.RequestException as e:
+                logger.warning(f"Failed to send heartbeat for {project}: {e}")
+                HEARTBEATS.labels("failed").inc()
+
+    def _replay(self):
+        if not self._ensure_bucket():
+            self._spool_pending = self.spool is not None
+            return
+        if self.spool is None:
+            return
+        try:
+            if self.spool.replay(self.client):
+                self._accepted()
+            self._spool_pending = False
+            SPOOL_PENDING.set(0)
+        except requests.RequestException as e:
+            if not self._spool_pending:
+                logger.warning(f"Failed to send heartbeats, keeping them in spool: {e}")
+            self._spool_pending = True
+            SPOOL_PENDING.set(len(self.spool))
+
+    def _ensure_bucket(self) -> bool:
+        if self._bucket_ready:
+            return True
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        try:
+            self.client.create_bucket(self.bucket_id, event_type=self.event_type)
+        except requests.RequestException as e:
+            logger.debug(
+                f"Server not reachable, retrying in {self._next_retry_delay:g}s: {e}"
+            )
+            self._next_attempt = now + self._next_retry_delay
+            self._next_retry_delay = min(
+                self._next_retry_delay * 2, self.max_retry_delay
+            )
+            return False
+        logger.debug(
+            f"Created bucket {self.bucket_id} after {now - self.created_at:.3f}s"
+        )
+        self._bucket_ready = True
+        return True
+
+    def _accepted(self):
+        if self.first_accepted_at is None:
+            self.first_accepted_at = time.monotonic()
+            logger.info(
+                f"First heartbeat accepted "
+                f"{self.first_accepted_at - self.created_at:.3f}s after start"
+            )
+
+    def _wait_timeout(self, project: Optional[str]) -> Optional[float]:
+        timeouts = []
+        if project is not None:
+            timeouts.append(self.interval)
+        if self._spool_pending or not self._bucket_ready:
+            if self._bucket_ready:
+                timeouts.append(self.interval)
+            else:
+                timeouts.append(max(0.0, self._next_attempt - time.monotonic()))
+        return min(timeouts) if timeouts else None
+
+
+def create_heartbeat_worker(interval: float = 5, aw_testing: bool = False) -> HeartbeatWorker:
+    """
+    Worker for this host's project bucket, spooling heartbeats on disk
+
+    The client holds a lock per client name, so only one tray or daemon can
+    send heartbeats at a time. The bucket is created in the background, so
+    this does not wait for the server.
+    """
+    client = ActivityWatchClient(CLIENT_NAME, testing=aw_testing)
+    bucket_id = f"{BUCKET_NAME}_{client.client_hostname}"
+    return HeartbeatWorker(
+        client,
+        bucket_id,
+        interval=interval,
+        spool=HeartbeatSpool(),
+        event_type=EVENT_TYPE,
+    )
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Tuple
+
+from PySide6 import QtCore as c
+from PySide6 import QtGui as g
+
+DEFAULT_ICON_SIZE = 64
+DEFAULT_MAX_ICONS = 128
+LABEL_LENGTH = 3
+
+THEME_TEXT_COLORS: Dict[str, Tuple[int, int, int]] = {
+    "dark": (255, 255, 255),
+    "light": (0, 0, 0),
+}
+
+IconKey = Tuple[str, int, str]
+
+
+def icon_label(project: str) -> str:
+    return project[:LABEL_LENGTH]
+
+
+def current_theme() -> str:
+    """
+    ``"dark"`` or ``"light"`` depending on the application palette
+    """
+    window = g.QGuiApplication.palette().color(g.QPalette.Window)
+    return "dark" if window.lightness() < 128 else "light"
+
+
+def render_text_icon(
+    label: str, size: int = DEFAULT_ICON_SIZE, theme: str = "dark"
+) -> g.QIcon:
+    """
+    Draws ``label`` centered on a transparent square image in memory
+    """
+    image = g.QImage(size, size, g.QImage.Format_ARGB32_Premultiplied)
+    image.fill(c.Qt.transparent)
+    painter = g.QPainter(image)
+    try:
+        painter.setRenderHint(g.QPainter.TextAntialiasing)
+        painter.setPen(g.QColor(*THEME_TEXT_COLORS[theme]))
+        font = painter.font()
+        font.setPixelSize(size // 2)
+        width = g.QFontMetrics(font).horizontalAdvance(label)
+        if width > size:
+            font.setPixelSize(max(1, size // 2 * size // width))
+        painter.setFont(font)
+        painter.drawText(image.rect(), c.Qt.AlignCenter, label)
+    finally:
+        painter.end()
+    return g.QIcon(g.QPixmap.fromImage(image))
+
+
+class IconCache:
+    """
+    Least recently used cache of rendered label icons, keyed by label, size
+    and theme
+    """
+
+    def __init__(
+        self,
+        max_icons: int = DEFAULT_MAX_ICONS,
+        size: int = DEFAULT_ICON_SIZE,
+        render: Callable[[str, int, str], g.QIcon] = render_text_icon,
+    ):
+        self.max_icons = max_icons
+        self.size = size
+        self.render = render
+        self.hits = 0
+        self.misses = 0
+        self._icons: "OrderedDict[IconKey, g.QIcon]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._icons)
+
+    def get(self, label: str, theme: str = "dark") -> g.QIcon:
+        key = (label, self.size, theme)
+        icon = self._icons.get(key)
+        if icon is not None:
+            self.hits += 1
+            self._icons.move_to_end(key)
+            return icon
+        self.misses += 1
+        icon = self._icons[key] = self.render(label, self.size, theme)
+        if len(self._icons) > self.max_icons:
+            self._icons.popitem(last=False)
+        return icon
+
+    def prerender(self, labels: Iterable[str], theme: str = "dark"):
+        for label in labels:
+            self.get(label, theme)
+
+    def clear(self):
+        self._icons.clear()
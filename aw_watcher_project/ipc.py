@@ -0,0 +1,79 @@
+"""
+Client side of the daemon's control socket
+
+Kept free of the heartbeat and ActivityWatch imports so that the CLI client
+starts quickly. Requests and responses are single lines of JSON.
+"""
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from aw_watcher_project.config import DEFAULT_CONFIG_DIR
+from aw_watcher_project.exc import DaemonCommandException, DaemonNotRunningException
+
+DEFAULT_SOCKET_PATH = DEFAULT_CONFIG_DIR / "daemon.sock"
+DEFAULT_TIMEOUT = 5
+
+Response = Dict[str, Any]
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message).encode("utf8") + b"\n"
+
+
+def send_command(
+    command: str,
+    socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH,
+    timeout: float = DEFAULT_TIMEOUT,
+    **params: Any,
+) -> Response:
+    """
+    Sends one command to the daemon and returns its response
+
+    :raises DaemonNotRunningException: if nothing is listening on the socket
+    :raises DaemonCommandException: if the daemon could not run the command
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonNotRunningException(
+                f"no daemon listening at {socket_path}, start it with "
+                f"aw-watcher-project daemon"
+            ) from e
+        sock.sendall(encode({"command": command, **params}))
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise DaemonCommandException(f"daemon closed the connection on {command}")
+    response: Response = json.loads(line)
+    if not response.get("ok"):
+        raise DaemonCommandException(response.get("error", f"{command} failed"))
+    return response
+
+
+def select(
+    project: Optional[str],
+    add: bool = False,
+    socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH,
+) -> Response:
+    if project is None:
+        return send_command("clear", socket_path)
+    return send_command("select", socket_path, project=project, add=add)
+
+
+def status(socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH) -> Response:
+    return send_command("status", socket_path)
+
+
+def list_projects(socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH) -> Response:
+    return send_command("list", socket_path)
+
+
+def metrics(socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH) -> Response:
+    return send_command("metrics", socket_path)
@@ -0,0 +1,339 @@
+"""
+Process-wide counters, gauges and latency histograms
+
+Updating a metric takes an uncontended lock and a few additions, so they are
+left on in the heartbeat and report paths. :data:`REGISTRY` holds the metrics
+of this package, exported as a JSON snapshot with :meth:`Registry.snapshot`
+or in the Prometheus text format with :func:`prometheus_text`, for example
+through node_exporter's textfile collector with :class:`TextfileWriter`.
+"""
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from aw_watcher_project.logger import logger
+
+# Seconds, from a sub-millisecond parse up to a query over years
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+
+Snapshot = Dict[str, Dict[str, Any]]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def sample(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # The last count is for observations above every bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def sample(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        buckets: List[Tuple[float, int]] = []
+        for bound, n in zip(self.bounds, counts):
+            cumulative += n
+            buckets.append((bound, cumulative))
+        return {"count": count, "sum": total, "buckets": buckets}
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        # Metrics without labels are updated directly
+        self._value = None if self.labelnames else self.labels()
+
+    def labels(self, *values: Any) -> Any:
+        """
+        The value for one combination of label values, created on first use
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_value())
+        return child
+
+    def _new_value(self) -> Any:
+        raise NotImplementedError
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [
+            {"labels": dict(zip(self.labelnames, key)), **child.sample()}
+            for key, child in children
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1):
+        self._value.inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def set(self, value: float):
+        self._value.set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._value.observe(value)
+
+    def time(self):
+        return self._value.time()
+
+
+class Registry:
+    """
+    Metrics by name, each registered once per process
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules reloaded in tests register their metrics again
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore
+
+    def snapshot(self) -> Snapshot:
+        """
+        Current values of all metrics as JSON-serializable data
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.type, "help": metric.help, "samples": metric.samples()}
+            for metric in metrics
+        }
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram: Histogram, *labels: Any) -> Callable[[F], F]:
+    """
+    Decorator observing the duration of every call in ``histogram``
+    """
+    value = histogram.labels(*labels)
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                value.observe(time.perf_counter() - start)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items())
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in items
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def prometheus_text(snapshot: Snapshot) -> str:
+    """
+    A snapshot in the Prometheus text exposition format
+    """
+    lines: List[str] = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric["samples"]:
+            labels = sample["labels"]
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(sample['value'])}")
+                continue
+            for bound, count in sample["buckets"]:
+                le = _format_labels(labels, ("le", _format_value(bound)))
+                lines.append(f"{name}_bucket{le} {count}")
+            le = _format_labels(labels, ("le", "+Inf"))
+            lines.append(f"{name}_bucket{le} {sample['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Union[str, Path], registry: Registry = REGISTRY):
+    """
+    Writes the metrics in the Prometheus text format, replacing the file
+    atomically so that a collector never reads half of it
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_text(registry.snapshot()))
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class TextfileWriter:
+    """
+    Writes the metrics to a textfile every ``interval`` seconds from a
+    background thread, and once more when stopped
+    """
+
+    def __init__(
+        self, path: Union[str, Path], interval: float = 15, registry: Registry = REGISTRY
+    ):
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            write_textfile(self.path, self.registry)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics to {self.path}: {e}")
@@ -0,0 +1,170 @@
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aw_watcher_project.events.base import AllEventData
+
+TimePeriod = Tuple[datetime.datetime, datetime.datetime]
+
+# Period edges to clip against when one side of a period should be left open
+UNBOUNDED_START = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+UNBOUNDED_END = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+
+
+def start_of_day(time: datetime.datetime) -> datetime.datetime:
+    return time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+CHUNK_SIZES = ("day", "week", "month")
+
+
+def next_chunk_start(time: datetime.datetime, chunk: str = "day") -> datetime.datetime:
+    """
+    Start of the day, week (Monday) or month following ``time``
+    """
+    day = start_of_day(time)
+    if chunk == "day":
+        return start_of_day(day + datetime.timedelta(days=1))
+    if chunk == "week":
+        return start_of_day(day + datetime.timedelta(days=7 - day.weekday()))
+    if chunk == "month":
+        if day.month == 12:
+            return day.replace(year=day.year + 1, month=1, day=1)
+        return day.replace(month=day.month + 1, day=1)
+    raise ValueError(f"chunk must be one of {CHUNK_SIZES}, got {chunk}")
+
+
+def split_time_range(
+    begin: datetime.datetime, end: datetime.datetime, chunk: str = "day"
+) -> List[TimePeriod]:
+    """
+    Splits a time range at each day, week or month boundary (in the time zone
+    of ``begin``) into contiguous periods
+    """
+    periods: List[TimePeriod] = []
+    start = begin
+    while start < end:
+        next_start = min(next_chunk_start(start, chunk), end)
+        periods.append((start, next_start))
+        start = next_start
+    return periods
+
+
+def day_periods(begin: datetime.datetime, end: datetime.datetime) -> List[TimePeriod]:
+    return split_time_range(begin, end, "day")
+
+
+def is_whole_day(period: TimePeriod) -> bool:
+    start, end = period
+    return start == start_of_day(start) and end == start_of_day(
+        start + datetime.timedelta(days=1)
+    )
+
+
+def _event_bounds(event: AllEventData) -> TimePeriod:
+    start = datetime.datetime.fromisoformat(event["timestamp"])
+    return start, start + datetime.timedelta(seconds=event["duration"])
+
+
+def clip_event_data(
+    events: Sequence[AllEventData], period: TimePeriod
+) -> List[AllEventData]:
+    """
+    Clips raw event dicts to a time period, dropping those outside of it
+
+    Some aw-server implementations trim events at the edges of query periods
+    and some do not, so this makes results of adjacent periods partition time
+    either way. Zero-duration events are kept only in the period they start in.
+    """
+    period_start, period_end = period
+    out: List[AllEventData] = []
+    for event in events:
+        start, end = _event_bounds(event)
+        if start == end:
+            if period_start <= start < period_end:
+                out.append(event)
+            continue
+        if start >= period_start and end <= period_end:
+            out.append(event)
+            continue
+        clipped_start = max(start, period_start)
+        clipped_end = min(end, period_end)
+        if clipped_end <= clipped_start:
+            continue
+        clipped = dict(event)
+        clipped["timestamp"] = clipped_start.astimezone(start.tzinfo).isoformat()
+        clipped["duration"] = (clipped_end - clipped_start).total_seconds()
+        out.append(clipped)  # type: ignore
+    return out
+
+
+def stitch_event_data(
+    before: List[AllEventData], after: List[AllEventData], boundary: datetime.datetime
+) -> Tuple[List[AllEventData], List[AllEventData]]:
+    """
+    Rejoins events which were split at ``boundary`` between two adjacent periods
+
+    An event in ``before`` which ends exactly at the boundary absorbs an event
+    in ``after`` with the same data which starts exactly at it. The joined event
+    is moved to the front of ``after`` so that it can be stitched again at the
+    next boundary.
+    """
+    ending: Dict[str, int] = {}
+    for i, event in enumerate(before):
+        start, end = _event_bounds(event)
+        if end == boundary and start != end:
+            ending[_data_key(event)] = i
+    if not ending:
+        return before, after
+
+    joined: Dict[int, AllEventData] = {}
+    remaining: List[AllEventData] = []
+    for event in after:
+        start, end = _event_bounds(event)
+        i = ending.pop(_data_key(event), None) if start == boundary else None
+        if i is None or start == end:
+            remaining.append(event)
+            continue
+        joined_event = dict(before[i])
+        joined_event["duration"] = before[i]["duration"] + event["duration"]
+        joined[i] = joined_event  # type: ignore
+    if not joined:
+        return before, after
+    before = [event for i, event in enumerate(before) if i not in joined]
+    return before, list(joined.values()) + remaining
+
+
+def _data_key(event: AllEventData) -> str:
+    return json.dumps(event.get("data"), sort_keys=True)
+
+
+def combine_period_results(
+    results: Sequence[Any], periods: Sequence[TimePeriod]
+) -> Any:
+    """
+    Combines the per-period results of an ActivityWatch query into the result a
+    single query over the whole range would give. Results may be event lists
+    or dicts of event lists, as produced by ``RETURN = {...}``.
+    """
+    if not results:
+        return []
+    if isinstance(results[0], dict):
+        return {
+            key: combine_period_results([result[key] for result in results], periods)
+            for key in results[0]
+        }
+
+    combined: List[AllEventData] = []
+    previous: Optional[List[AllEventData]] = None
+    for events, (start, end) in zip(results, periods):
+        events = clip_event_data(events, (start, end))
+        if previous is not None:
+            previous, events = stitch_event_data(previous, events, start)
+            combined.extend(previous)
+        previous = events
+    if previous is not None:
+        combined.extend(previous)
+    if len(periods) > 1:
+        # Stitched events may be out of order relative to their neighbors
+        combined.sort(key=lambda event: _event_bounds(event)[0])
+    return combined
@@ -0,0 +1,229 @@
+"""
+Profiling of commands and of the running tray or daemon, without external tools
+
+:class:`Profiler` runs cProfile in every thread started while it is on, such as
+the heartbeat thread, and writes one pstats file per thread plus a merged one.
+:class:`StackSampler` samples the stacks of all threads and writes them in the
+collapsed format read by flamegraph.pl and speedscope. With
+:func:`install_dump_handler`, sending ``SIGUSR1`` to a running process samples
+it for a while and writes the stacks, to catch a hot loop as it happens.
+"""
+import cProfile
+import datetime
+import os
+import pstats
+import signal
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Dict, List, Optional, Tuple, Union
+
+from aw_watcher_project.config import DEFAULT_CONFIG_DIR
+from aw_watcher_project.logger import logger
+
+DEFAULT_PROFILE_DIR = DEFAULT_CONFIG_DIR / "profiles"
+PROFILE_ENV_VAR = "AW_WATCHER_PROJECT_PROFILE"
+DEFAULT_SAMPLE_INTERVAL = 0.005
+DEFAULT_DUMP_SECONDS = 10
+
+
+def _output_path(directory: Union[str, Path], name: str, suffix: str) -> Path:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return directory / f"{name}-{stamp}-{os.getpid()}{suffix}"
+
+
+class Profiler:
+    """
+    cProfile of the calling thread and of every thread started until
+    :meth:`stop`
+
+    Threads already running when started are not profiled.
+    """
+
+    def __init__(self, directory: Union[str, Path] = DEFAULT_PROFILE_DIR, name: str = "profile"):
+        self.directory = Path(directory)
+        self.name = name
+        self._main: Optional[cProfile.Profile] = None
+        self._threads: List[Tuple[str, cProfile.Profile]] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._main = cProfile.Profile()
+        threading.setprofile(self._start_thread)
+        self._main.enable()
+
+    def _start_thread(self, frame: FrameType, event: str, arg):
+        # Called once as the first profile event of each new thread, then
+        # replaced by the thread's own profiler
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # From Python 3.12 one profiler already sees all threads
+            return
+        with self._lock:
+            self._threads.append((threading.current_thread().name, profile))
+
+    def stop(self) -> List[Path]:
+        """
+        Stops profiling and writes the stats, returning the written paths
+        """
+        threading.setprofile(None)
+        if self._main is None:
+            return []
+        self._main.disable()
+        with self._lock:
+            profiles = [("main", self._main)] + self._threads
+            self._threads = []
+        self._main = None
+        paths = []
+        merged = _output_path(self.directory, self.name, ".pstats")
+        pstats.Stats(*(profile for _, profile in profiles)).dump_stats(merged)
+        paths.append(merged)
+        for i, (thread_name, profile) in enumerate(profiles[1:]):
+            path = merged.with_name(f"{merged.stem}-{thread_name}-{i}.pstats")
+            # A thread still running is profiled up to here
+            pstats.Stats(profile).dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads every ``interval`` seconds from a
+    background thread, counting identical stacks
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_id)
+
+    def sample(self, exclude: Optional[int] = None):
+        names: Dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude:
+                continue
+            stack: List[str] = []
+            current: Optional[FrameType] = frame
+            while current is not None:
+                stack.append(_frame_label(current))
+                current = current.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            # Root first, as the collapsed format has it
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.collapsed())
+        return path
+
+
+class ProfileSession:
+    """
+    :class:`Profiler` and :class:`StackSampler` together, for ``--profile``
+    """
+
+    def __init__(self, directory: Union[str, Path] = DEFAULT_PROFILE_DIR, name: str = "profile"):
+        self.directory = Path(directory)
+        self.name = name
+        self.profiler = Profiler(directory, name)
+        self.sampler = StackSampler()
+
+    def start(self):
+        self.sampler.start()
+        self.profiler.start()
+
+    def stop(self) -> List[Path]:
+        paths = self.profiler.stop()
+        self.sampler.stop()
+        paths.append(
+            self.sampler.write(_output_path(self.directory, self.name, ".collapsed"))
+        )
+        logger.info(f"Wrote profile to {', '.join(str(path) for path in paths)}")
+        return paths
+
+
+def dump_stacks(
+    seconds: float = DEFAULT_DUMP_SECONDS,
+    directory: Union[str, Path] = DEFAULT_PROFILE_DIR,
+    name: str = "dump",
+    interval: float = DEFAULT_SAMPLE_INTERVAL,
+) -> Path:
+    """
+    Samples all threads for ``seconds`` and writes the collapsed stacks
+    """
+    sampler = StackSampler(interval)
+    sampler.start()
+    threading.Event().wait(seconds)
+    sampler.stop()
+    path = sampler.write(_output_path(directory, name, ".collapsed"))
+    logger.info(f"Wrote {sampler.samples} stack samples to {path}")
+    return path
+
+
+def install_dump_handler(
+    seconds: float = DEFAULT_DUMP_SECONDS,
+    directory: Union[str, Path] = DEFAULT_PROFILE_DIR,
+    name: str = "dump",
+) -> bool:
+    """
+    Samples the process for ``seconds`` on ``SIGUSR1``, returning whether the
+    platform has the signal
+
+    The handler only starts a thread, so the sampled threads carry on. The
+    handler runs when the main thread next runs Python code, so a Qt event
+    loop needs to wake for signals, see
+    :meth:`~aw_watcher_project.gui.ProjectWatcherGUI._wake_on_signals`.
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    running = threading.Lock()
+
+    def dump():
+        try:
+            dump_stacks(seconds, directory, name)
+        finally:
+            running.release()
+
+    def handler(signum, frame):
+        if not running.acquire(blocking=False):
+            logger.info("Already sampling stacks")
+            return
+        logger.info(f"Sampling stacks for {seconds:g}s")
+        threading.Thread(target=dump, name="stack-dump", daemon=True).start()
+
+    signal.signal(signal.SIGUSR1, handler)
+    return True
@@ -0,0 +1,144 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+SEPARATOR = "/"
+
+
+class ProjectNode:
+    """
+    A prefix in the project tree. ``path`` is the full prefix, and
+    ``project`` is the project at this prefix if there is one. It may differ
+    from ``path`` for names with empty parts, such as ``a//b`` or ``/a``.
+    """
+
+    __slots__ = ("name", "path", "children", "project")
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.children: Dict[str, "ProjectNode"] = {}
+        self.project: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"<ProjectNode(path={self.path!r}, children={len(self.children)})>"
+
+    @property
+    def is_project(self) -> bool:
+        return self.project is not None
+
+    @property
+    def is_group(self) -> bool:
+        return bool(self.children)
+
+
+class ProjectTree:
+    """
+    Projects nested by prefix, e.g. ``client/project`` under ``client``, for
+    building menus one level at a time
+
+    Membership and node lookups are dict based, so they do not depend on the
+    number of projects. Iterating gives projects in the order they were added.
+    """
+
+    def __init__(self, projects: Iterable[str] = (), separator: str = SEPARATOR):
+        self.separator = separator
+        self.root = ProjectNode("", "")
+        self._projects: Dict[str, ProjectNode] = {}
+        for project in projects:
+            self.add(project)
+
+    def __len__(self) -> int:
+        return len(self._projects)
+
+    def __contains__(self, project: object) -> bool:
+        return project in self._projects
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._projects)
+
+    def add(self, project: str) -> ProjectNode:
+        if project in self._projects:
+            return self._projects[project]
+        node = self.root
+        for part in self._parts(project):
+            child = node.children.get(part)
+            if child is None:
+                path = part if node is self.root else node.path + self.separator + part
+                child = node.children[part] = ProjectNode(part, path)
+            node = child
+        if node.project is None:
+            node.project = project
+        self._projects[project] = node
+        return node
+
+    def remove(self, project: str):
+        node = self._projects.pop(project)
+        if node.project == project:
+            # Another name with empty parts may lead to the same node
+            node.project = next(
+                (other for other, other_node in self._projects.items() if other_node is node),
+                None,
+            )
+        # Drop prefixes which no longer lead to a project
+        parents = [self.root]
+        for part in self._parts(project)[:-1]:
+            parents.append(parents[-1].children[part])
+        while parents and not node.is_project and not node.children:
+            parent = parents.pop()
+            del parent.children[node.name]
+            node = parent
+
+    def node(self, path: str = "") -> Optional[ProjectNode]:
+        """
+        Node for a project or prefix, the root for ``""``
+        """
+        if not path:
+            return self.root
+        project = self._projects.get(path)
+        if project is not None:
+            return project
+        node: Optional[ProjectNode] = self.root
+        for part in self._parts(path):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def parent_path(self, path: str) -> str:
+        parts = self._parts(path)
+        return self.separator.join(parts[:-1])
+
+    def _parts(self, project: str) -> List[str]:
+        parts = [part for part in project.split(self.separator) if part]
+        # Projects made only of separators still need a node of their own
+        return parts or [project]
+
+
+class ProjectFilter:
+    """
+    Case-insensitive substring search over projects for a search box
+
+    Each call with text extending the previous text only searches the
+    previous matches, so typing narrows the results without rescanning every
+    project. Call :meth:`reset` when the projects change.
+    """
+
+    def __init__(self, tree: ProjectTree):
+        self.tree = tree
+        self._text: Optional[str] = None
+        self._matches: List[str] = []
+
+    def reset(self):
+        self._text = None
+        self._matches = []
+
+    def matches(self, text: str) -> List[str]:
+        text = text.casefold()
+        if self._text is not None and text.startswith(self._text):
+            candidates: Iterable[str] = self._matches
+        else:
+            candidates = self.tree
+        self._matches = [
+            project for project in candidates if text in project.casefold()
+        ]
+        self._text = text
+        return self._matches
@@ -0,0 +1,414 @@
+"""
+Reports of time spent by project, day and week, backed by per-day aggregates
+
+Each day of a report is summed once from the raw project, AFK and window
+buckets into durations by project and by app and title. Elapsed days are
+stored in the :class:`~aw_watcher_project.cache.QueryCache` next to the cached
+query results and invalidated with them when buckets change, so a report over
+past periods reads one row per day instead of querying aw-server.
+"""
+import datetime
+import time
+from collections import defaultdict
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from aw_watcher_project.aw_time import MICROSECONDS_PER_SECOND, to_epoch_us
+from aw_watcher_project.buckets import (
+    AFK_BUCKET_PREFIX,
+    PROJECT_BUCKET_PREFIX,
+    WINDOW_BUCKET_PREFIX,
+    EventData,
+    find_bucket,
+    not_afk_intervals,
+    query_buckets,
+)
+from aw_watcher_project.cache import QueryCache, get_default_cache
+from aw_watcher_project.client import SharedActivityWatchClient, get_client
+from aw_watcher_project.intervals import Intervals
+from aw_watcher_project.metrics import REGISTRY
+from aw_watcher_project.periods import TimePeriod, is_whole_day
+
+# Stored under this key in the query cache, bump it when the aggregates change
+AGGREGATES_KEY = "report-aggregates-v1"
+GROUPS = ("project", "day", "week")
+DEFAULT_DAYS = 7
+DEFAULT_TOP = 5
+# Days of raw events read at once for days which are not stored
+QUERY_DAYS = 7
+TITLE_WIDTH = 60
+
+REPORT_DAYS = REGISTRY.counter(
+    "aw_watcher_project_report_days_total",
+    "Days of reports read from stored aggregates or computed from the buckets",
+    ("source",),
+)
+
+# {"projects": {project: seconds}, "titles": {project: [[app, title, seconds], ...]}}
+DayAggregate = Dict[str, Any]
+
+
+def report_periods(
+    begin: datetime.date, end: datetime.date, tz: Optional[datetime.tzinfo] = None
+) -> List[TimePeriod]:
+    """
+    One period per day from ``begin`` to ``end`` inclusive, from midnight to
+    midnight in ``tz``, by default in the local time zone with the UTC offset
+    it has on each day
+    """
+    starts = []
+    day = begin
+    while day <= end + datetime.timedelta(days=1):
+        midnight = datetime.datetime.combine(day, datetime.time())
+        starts.append(midnight.astimezone() if tz is None else midnight.replace(tzinfo=tz))
+        day += datetime.timedelta(days=1)
+    return list(zip(starts, starts[1:]))
+
+
+def compute_day_aggregates(
+    project_events: Sequence[EventData],
+    afk_events: Sequence[EventData],
+    window_events: Optional[Sequence[EventData]],
+    periods: Sequence[TimePeriod],
+) -> List[DayAggregate]:
+    """
+    Not-AFK durations by project in each of the contiguous ``periods``, and by
+    app and title of the overlapping window events if given
+
+    Events crossing a period boundary count towards each period they overlap.
+    """
+    bounds = np.array(
+        [to_epoch_us(start) for start, _ in periods] + [to_epoch_us(periods[-1][1])],
+        dtype=np.int64,
+    )
+    not_afk = not_afk_intervals(project_events, afk_events).split(bounds)
+    names = [event["data"]["project"] for event in project_events]
+
+    projects: List[Dict[str, int]] = [defaultdict(int) for _ in periods]
+    for _, day, start, end, i in _by_period(not_afk, bounds):
+        projects[day][names[i]] += end - start
+
+    titles: List[Dict[Tuple[str, str, str], int]] = [defaultdict(int) for _ in periods]
+    if window_events is not None:
+        joined, window_index = not_afk.join(Intervals.from_event_data(window_events))
+        windows = window_index.tolist()
+        for k, day, start, end, i in _by_period(joined, bounds):
+            data = window_events[windows[k]]["data"]
+            titles[day][(names[i], data.get("app", ""), data.get("title", ""))] += end - start
+
+    aggregates = []
+    for day_projects, day_titles in zip(projects, titles):
+        by_project: Dict[str, List[list]] = defaultdict(list)
+        for (project, app, title), us in day_titles.items():
+            by_project[project].append([app, title, us / MICROSECONDS_PER_SECOND])
+        aggregates.append({
+            "projects": {
+                project: us / MICROSECONDS_PER_SECOND for project, us in day_projects.items()
+            },
+            "titles": dict(by_project),
+        })
+    return aggregates
+
+
+def _by_period(
+    intervals: Intervals, bounds: np.ndarray
+) -> Iterator[Tuple[int, int, int, int, int]]:
+    # Position, period, start, end and index of the non-empty intervals
+    # inside one of the periods
+    periods = (np.searchsorted(bounds, intervals.starts, side="right") - 1).tolist()
+    n = len(bounds) - 1
+    rows = zip(
+        periods, intervals.starts.tolist(), intervals.ends.tolist(), intervals.index.tolist()
+    )
+    for k, (period, start, end, i) in enumerate(rows):
+        if 0 <= period < n and end > start:
+            yield k, period, start, end, i
+
+
+def _stored(period: TimePeriod, now: datetime.datetime) -> bool:
+    return is_whole_day(period) and period[1] <= now
+
+
+def _runs(indices: Sequence[int], max_length: int) -> Iterator[List[int]]:
+    # Consecutive indices, at most ``max_length`` at a time
+    run: List[int] = []
+    for i in indices:
+        if run and (i != run[-1] + 1 or len(run) == max_length):
+            yield run
+            run = []
+        run.append(i)
+    if run:
+        yield run
+
+
+def day_aggregates(
+    client: SharedActivityWatchClient,
+    periods: Sequence[TimePeriod],
+    cache: Optional[QueryCache] = None,
+    windows: bool = True,
+    now: Optional[datetime.datetime] = None,
+) -> List[DayAggregate]:
+    """
+    The aggregates of each of ``periods``, elapsed whole days read from
+    ``cache`` if given and the others computed from the raw buckets
+
+    Periods which are not stored are read a few days at a time, one query per
+    bucket. ``windows`` adds the apps and titles, if there is a window bucket.
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    buckets = client.get_buckets()
+    windows = windows and find_bucket(buckets, WINDOW_BUCKET_PREFIX) is not None
+    key = f"{AGGREGATES_KEY} windows={windows}"
+
+    aggregates: List[Optional[DayAggregate]] = [None] * len(periods)
+    if cache is not None:
+        cache.sync_buckets(buckets)
+        stored = [i for i, period in enumerate(periods) if _stored(period, now)]
+        for i, aggregate in zip(stored, cache.get_many(key, [periods[i] for i in stored])):
+            aggregates[i] = aggregate
+    missing = [i for i, aggregate in enumerate(aggregates) if aggregate is None]
+    REPORT_DAYS.labels("stored").inc(len(periods) - len(missing))
+    REPORT_DAYS.labels("computed").inc(len(missing))
+
+    prefixes = [PROJECT_BUCKET_PREFIX, AFK_BUCKET_PREFIX]
+    if windows:
+        prefixes.append(WINDOW_BUCKET_PREFIX)
+    for run in _runs(missing, QUERY_DAYS):
+        run_periods = [periods[i] for i in run]
+        events = query_buckets(client, prefixes, run_periods[0][0], run_periods[-1][1])
+        computed = compute_day_aggregates(
+            events[0], events[1], events[2] if windows else None, run_periods
+        )
+        for i, aggregate in zip(run, computed):
+            aggregates[i] = aggregate
+            if cache is not None and _stored(periods[i], now):
+                cache.put(key, periods[i], aggregate)
+    return aggregates  # type: ignore
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+def _shorten(text: str, width: int = TITLE_WIDTH) -> str:
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+class Report:
+    """
+    Durations over a range of days by project, day and week, with the apps
+    and titles of each project, optionally only for some projects
+    """
+
+    def __init__(
+        self,
+        days: Sequence[datetime.date],
+        aggregates: Sequence[DayAggregate],
+        projects: Optional[Collection[str]] = None,
+    ):
+        self.days = list(days)
+        self.by_day: Dict[datetime.date, Dict[str, float]] = {}
+        self._titles: Dict[str, Dict[Tuple[str, str], float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        for day, aggregate in zip(self.days, aggregates):
+            durations = {
+                project: seconds
+                for project, seconds in aggregate["projects"].items()
+                if projects is None or project in projects
+            }
+            if durations:
+                self.by_day[day] = durations
+            for project, rows in aggregate["titles"].items():
+                if projects is not None and project not in projects:
+                    continue
+                titles = self._titles[project]
+                for app, title, seconds in rows:
+                    titles[(app, title)] += seconds
+
+    @property
+    def by_project(self) -> Dict[str, float]:
+        """
+        Total duration by project, longest first
+        """
+        totals: Dict[str, float] = defaultdict(float)
+        for durations in self.by_day.values():
+            for project, seconds in durations.items():
+                totals[project] += seconds
+        return dict(sorted(totals.items(), key=lambda item: (-item[1], item[0])))
+
+    @property
+    def by_week(self) -> Dict[datetime.date, Dict[str, float]]:
+        """
+        Durations by project in each week, keyed by its Monday
+        """
+        weeks: Dict[datetime.date, Dict[str, float]] = {}
+        for day, durations in self.by_day.items():
+            week = weeks.setdefault(day - datetime.timedelta(days=day.weekday()), defaultdict(float))
+            for project, seconds in durations.items():
+                week[project] += seconds
+        return {week: dict(durations) for week, durations in weeks.items()}
+
+    @property
+    def total(self) -> float:
+        return sum(self.by_project.values())
+
+    def top_apps(self, project: str, n: int = DEFAULT_TOP) -> List[Tuple[str, float]]:
+        apps: Dict[str, float] = defaultdict(float)
+        for (app, _), seconds in self._titles.get(project, {}).items():
+            apps[app] += seconds
+        return sorted(apps.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def top_titles(self, project: str, n: int = DEFAULT_TOP) -> List[Tuple[str, str, float]]:
+        titles = self._titles.get(project, {})
+        return sorted(
+            ((app, title, seconds) for (app, title), seconds in titles.items()),
+            key=lambda item: (-item[2], item[0], item[1]),
+        )[:n]
+
+    def to_dict(self, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+        """
+        The report as JSON-serializable data, durations in seconds
+        """
+        by_project = self.by_project
+        return {
+            "begin": self.days[0].isoformat() if self.days else None,
+            "end": self.days[-1].isoformat() if self.days else None,
+            "total": sum(by_project.values()),
+            "projects": by_project,
+            "days": {day.isoformat(): durations for day, durations in self.by_day.items()},
+            "weeks": {week.isoformat(): durations for week, durations in self.by_week.items()},
+            "top": {
+                project: {
+                    "apps": [
+                        {"app": app, "duration": seconds}
+                        for app, seconds in self.top_apps(project, top)
+                    ],
+                    "titles": [
+                        {"app": app, "title": title, "duration": seconds}
+                        for app, title, seconds in self.top_titles(project, top)
+                    ],
+                }
+                for project in by_project
+            } if top else {},
+        }
+
+    def format_table(self, by: str = "project", top: int = DEFAULT_TOP) -> str:
+        """
+        The report as a text table of totals by project, day or week, followed
+        by the top apps and titles of each project
+        """
+        if by not in GROUPS:
+            raise ValueError(f"by must be one of {GROUPS}, got {by}")
+        by_project = self.by_project
+        total = sum(by_project.values())
+        width = max([len("Project"), len("Total")] + [len(project) for project in by_project])
+        lines: List[str] = []
+        if by == "project":
+            lines.append(f"{'Project':<{width}}  {'Time':>10}  {'Share':>5}")
+            for project, seconds in by_project.items():
+                share = seconds / total if total else 0
+                lines.append(f"{project:<{width}}  {_format_duration(seconds):>10}  {share:>5.0%}")
+        else:
+            periods = self.by_day if by == "day" else self.by_week
+            label = "Day" if by == "day" else "Week"
+            lines.append(f"{label:<10}  {'Project':<{width}}  {'Time':>10}")
+            for period, durations in periods.items():
+                first = period.isoformat()
+                for project, seconds in sorted(durations.items(), key=lambda item: -item[1]):
+                    lines.append(f"{first:<10}  {project:<{width}}  {_format_duration(seconds):>10}")
+                    first = ""
+        lines.append(f"{'Total':<{width if by == 'project' else width + 12}}  {_format_duration(total):>10}")
+
+        for project in by_project if top else ():
+            apps = self.top_apps(project, top)
+            if not apps:
+                continue
+            lines.append("")
+            lines.append(f"{project}, top apps and titles")
+            for app, seconds in apps:
+                lines.append(f"  {_format_duration(seconds):>10}  {_shorten(app)}")
+            lines.append("")
+            for app, title, seconds in self.top_titles(project, top):
+                lines.append(f"  {_format_duration(seconds):>10}  {_shorten(f'{app}: {title}')}")
+        return "\n".join(lines)
+
+
+def _default_range(
+    begin: Optional[datetime.date], end: Optional[datetime.date]
+) -> Tuple[datetime.date, datetime.date]:
+    if end is None:
+        end = datetime.date.today()
+    if begin is None:
+        begin = end - datetime.timedelta(days=DEFAULT_DAYS - 1)
+    return begin, end
+
+
+def get_report(
+    begin: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    projects: Optional[Collection[str]] = None,
+    windows: bool = True,
+    use_cache: bool = True,
+    tz: Optional[datetime.tzinfo] = None,
+) -> Report:
+    """
+    Report of the days from ``begin`` to ``end`` inclusive, by default the
+    last week up to today
+    """
+    begin, end = _default_range(begin, end)
+    periods = report_periods(begin, end, tz)
+    cache = get_default_cache() if use_cache else None
+    aggregates = day_aggregates(get_client(), periods, cache, windows=windows)
+    return Report([start.date() for start, _ in periods], aggregates, projects)
+
+
+def follow_report(
+    begin: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    projects: Optional[Collection[str]] = None,
+    windows: bool = True,
+    use_cache: bool = True,
+    tz: Optional[datetime.tzinfo] = None,
+    interval: float = 60,
+) -> Iterator[Report]:
+    """
+    Yields a fresh report every ``interval`` seconds
+
+    Elapsed days are kept in memory after the first report, so each refresh
+    only reads the days still in progress. Without ``end`` the range grows to
+    the current day.
+    """
+    known: Dict[TimePeriod, DayAggregate] = {}
+    client = get_client()
+    cache = get_default_cache() if use_cache else None
+    while True:
+        begin, last = _default_range(begin, end)
+        periods = report_periods(begin, last, tz)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        missing = [period for period in periods if period not in known]
+        computed = dict(
+            zip(missing, day_aggregates(client, missing, cache, windows=windows, now=now))
+        )
+        for period, aggregate in computed.items():
+            if _stored(period, now):
+                known[period] = aggregate
+        yield Report(
+            [start.date() for start, _ in periods],
+            [known[period] if period in known else computed[period] for period in periods],
+            projects,
+        )
+        time.sleep(interval)
@@ -0,0 +1,150 @@
+import fnmatch
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Sequence
+
+from aw_watcher_project.config import ProjectWatcherConfig, RuleData
+from aw_watcher_project.events.window import WindowEvent
+from aw_watcher_project.exc import RuleException
+
+DEFAULT_CACHE_SIZE = 4096
+
+# Joins app and title into the one string the combined pattern matches. Title
+# patterns are searched in multiline mode, so ^ and $ match at the title's ends
+_SEPARATOR = "\n"
+_CONDITIONS = ("app", "title", "path")
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def _app_pattern(glob: str) -> str:
+    translated = fnmatch.translate(glob)
+    # Anchored by the separator instead of the end of the string
+    if translated.endswith(r"\Z"):
+        translated = translated[:-2]
+    return f"(?i:{translated})"
+
+
+def _title_pattern(pattern: str) -> str:
+    # Flags like (?i) are only allowed at the start of the combined pattern
+    flags = _GLOBAL_FLAGS.match(pattern)
+    if flags is None:
+        return f"(?:{pattern})"
+    return f"(?{flags.group(1)}:{pattern[flags.end():]})"
+
+
+def _rule_pattern(rule: RuleData) -> str:
+    parts = []
+    parts.append(_app_pattern(rule["app"]) if "app" in rule else "[^\n]*")
+    parts.append(_SEPARATOR)
+    if "title" in rule:
+        parts.append(f"(?=(?s:.*?){_title_pattern(rule['title'])})")
+    if "path" in rule:
+        parts.append(f"(?=(?s:.*?){re.escape(rule['path'])})")
+    return "".join(parts)
+
+
+def _validate(index: int, rule: RuleData):
+    if not rule.get("project"):
+        raise RuleException(f"rule {index} has no project")
+    if not any(condition in rule for condition in _CONDITIONS):
+        raise RuleException(
+            f"rule {index} for {rule['project']} needs one of {', '.join(_CONDITIONS)}"
+        )
+    if "title" in rule:
+        try:
+            title = re.compile(rule["title"])
+        except re.error as e:
+            raise RuleException(
+                f"invalid title pattern in rule {index} for {rule['project']}: {e}"
+            ) from e
+        # Groups would be renumbered or clash in the combined pattern
+        if title.groupindex or re.search(r"\\[1-9]", rule["title"]):
+            raise RuleException(
+                f"title pattern in rule {index} for {rule['project']} "
+                f"cannot use named groups or backreferences"
+            )
+
+
+class RuleSet:
+    """
+    Picks a project for a window from config rules, the first matching rule
+    winning
+
+    The rules that can apply to an app are compiled into one pattern with a
+    named group per rule, so a window is matched in a single regex call.
+    Rules naming another app without wildcards are left out of it. Patterns
+    are compiled on an app's first window, and results are memoized by app
+    and title, as windows are revisited often.
+    """
+
+    def __init__(self, rules: Sequence[RuleData], cache_size: int = DEFAULT_CACHE_SIZE):
+        for i, rule in enumerate(rules):
+            _validate(i, rule)
+        self.rules: List[RuleData] = list(rules)
+        self._projects = [rule["project"] for rule in self.rules]
+        # Rules for a literal app only need trying on that app's windows
+        self._app_rules: Dict[str, List[int]] = {}
+        self._any_app_rules: List[int] = []
+        for i, rule in enumerate(self.rules):
+            app = rule.get("app")
+            if app is not None and not _GLOB_CHARS.search(app):
+                self._app_rules.setdefault(app.lower(), []).append(i)
+            else:
+                self._any_app_rules.append(i)
+        self._patterns: Dict[str, Optional[Pattern[str]]] = {}
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    @classmethod
+    def from_config(
+        cls, config: ProjectWatcherConfig, cache_size: int = DEFAULT_CACHE_SIZE
+    ) -> "RuleSet":
+        return cls(config.rules, cache_size=cache_size)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _pattern(self, app: str) -> Optional[Pattern[str]]:
+        key = app.lower()
+        if key not in self._patterns:
+            indices = sorted(self._app_rules.get(key, []) + self._any_app_rules)
+            self._patterns[key] = (
+                re.compile(
+                    "|".join(f"(?P<r{i}>{_rule_pattern(self.rules[i])})" for i in indices),
+                    re.MULTILINE,
+                )
+                if indices
+                else None
+            )
+        return self._patterns[key]
+
+    def _match(self, app: str, title: str) -> Optional[str]:
+        """
+        Project of the first rule matching the window, if any
+        """
+        pattern = self._pattern(app)
+        if pattern is None:
+            return None
+        match = pattern.match(app + _SEPARATOR + title)
+        if match is None:
+            return None
+        return self._projects[int(match.lastgroup[1:])]
+
+    def match_event(self, event: WindowEvent) -> Optional[str]:
+        return self.match(event.app, event.title)
+
+
+def match_sequentially(rules: Sequence[RuleData], app: str, title: str) -> Optional[str]:
+    """
+    Reference implementation checking rule by rule, which :class:`RuleSet`
+    must agree with
+    """
+    for rule in rules:
+        if "app" in rule and not fnmatch.fnmatchcase(app.lower(), rule["app"].lower()):
+            continue
+        if "title" in rule and re.search(rule["title"], title, re.MULTILINE) is None:
+            continue
+        if "path" in rule and rule["path"] not in title:
+            continue
+        return rule["project"]
+    return None
@@ -0,0 +1,158 @@
+import datetime
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Union
+
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+
+from aw_watcher_project.aw_time import MICROSECONDS_PER_SECOND, from_epoch_us, to_epoch_us
+from aw_watcher_project.config import DEFAULT_CONFIG_DIR, ensure_parent_dir
+from aw_watcher_project.logger import logger
+
+DEFAULT_SPOOL_PATH = DEFAULT_CONFIG_DIR / "spool.sqlite"
+DEFAULT_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pulses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bucket_id TEXT NOT NULL,
+    timestamp_us INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    pulsetime REAL NOT NULL
+);
+"""
+
+class SpoolSegment(NamedTuple):
+    """
+    Consecutive heartbeats with the same data merged into one span
+    """
+
+    bucket_id: str
+    data: str
+    start_us: int
+    end_us: int
+    pulsetime: float
+    last_id: int
+
+    def to_event(self) -> Event:
+        return Event(
+            timestamp=from_epoch_us(self.start_us),
+            duration=(self.end_us - self.start_us) / MICROSECONDS_PER_SECOND,
+            data=json.loads(self.data),
+        )
+
+
+class HeartbeatSpool:
+    """
+    Append-only local log of heartbeats, which survives the server being down
+    and the watcher restarting
+
+    Heartbeats are appended before they are sent and removed once
+    :meth:`replay` has delivered them. Replay merges consecutive heartbeats
+    with the same data the way the server would, so a backlog costs one
+    request per batch of segments rather than one per heartbeat.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_SPOOL_PATH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.path = ensure_parent_dir(path)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pulses").fetchone()[0]
+
+    def append(
+        self, bucket_id: str, time: datetime.datetime, data: dict, pulsetime: float
+    ):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO pulses (bucket_id, timestamp_us, data, pulsetime) "
+                "VALUES (?, ?, ?, ?)",
+                (bucket_id, to_epoch_us(time), json.dumps(data, sort_keys=True), pulsetime),
+            )
+
+    def segments(self) -> Dict[str, List[SpoolSegment]]:
+        """
+        Pending heartbeats merged into segments, by bucket
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, bucket_id, timestamp_us, data, pulsetime "
+                "FROM pulses ORDER BY id"
+            ).fetchall()
+        segments: Dict[str, List[SpoolSegment]] = {}
+        for id_, bucket_id, time_us, data, pulsetime in rows:
+            bucket_segments = segments.setdefault(bucket_id, [])
+            if bucket_segments:
+                last = bucket_segments[-1]
+                if (
+                    last.data == data
+                    and last.start_us <= time_us
+                    and time_us - last.end_us <= pulsetime * MICROSECONDS_PER_SECOND
+                ):
+                    bucket_segments[-1] = last._replace(
+                        end_us=max(last.end_us, time_us), last_id=id_
+                    )
+                    continue
+            bucket_segments.append(
+                SpoolSegment(bucket_id, data, time_us, time_us, pulsetime, id_)
+            )
+        return segments
+
+    def replay(self, client: ActivityWatchClient) -> int:
+        """
+        Sends pending heartbeats to the server, returning the number of segments
+
+        Closed segments are inserted as events in batches and the last segment
+        of each bucket is sent as heartbeats, so that the next live heartbeat
+        merges with it. Delivered heartbeats are removed after every request,
+        and request errors are raised with the rest left in the spool.
+        """
+        sent = 0
+        for bucket_id, segments in self.segments().items():
+            closed, last = segments[:-1], segments[-1]
+            for i in range(0, len(closed), self.batch_size):
+                batch = closed[i:i + self.batch_size]
+                client.insert_events(bucket_id, [segment.to_event() for segment in batch])
+                self._remove(bucket_id, batch[-1].last_id)
+                sent += len(batch)
+            data = json.loads(last.data)
+            client.heartbeat(
+                bucket_id,
+                Event(timestamp=from_epoch_us(last.start_us), data=data),
+                pulsetime=last.pulsetime,
+            )
+            if last.end_us != last.start_us:
+                # Pulsetime spanning the segment merges this with the heartbeat above
+                client.heartbeat(
+                    bucket_id,
+                    Event(timestamp=from_epoch_us(last.end_us), data=data),
+                    pulsetime=last.pulsetime + (last.end_us - last.start_us) / MICROSECONDS_PER_SECOND,
+                )
+            self._remove(bucket_id, last.last_id)
+            sent += 1
+        if sent > 1:
+            logger.info(f"Replayed {sent} spooled heartbeat segments")
+        return sent
+
+    def _remove(self, bucket_id: str, last_id: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM pulses WHERE bucket_id = ? AND id <= ?",
+                (bucket_id, last_id),
+            )
@@ -0,0 +1,5 @@
+"""
+Benchmarks for aw-watcher-project. Run the suite with
+``python -m benchmarks.run``, writing JSON results to compare between
+commits, or a single module directly, e.g. ``python -m benchmarks.project_events``
+"""
@@ -0,0 +1,229 @@
+"""
+In-process stand-in for aw-server, for benchmarks and tests
+
+Serves the REST endpoints this package uses from aw-server's own
+:class:`~aw_server.api.ServerAPI` over an in-memory datastore, with optional
+artificial latency per request and per queried period.
+"""
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, unquote, urlparse
+
+import iso8601
+from aw_client import ActivityWatchClient
+from aw_core.models import Event
+from aw_datastore import Datastore
+from aw_datastore.storages import MemoryStorage
+from aw_server.api import ServerAPI
+from werkzeug.exceptions import HTTPException, NotFound
+
+from benchmarks.synthetic import Dataset
+
+# Not-AFK project events as aw-server computes them, to check and time the
+# local computation of buckets.not_afk_intervals against
+PROJECT_EVENTS_QUERY = """
+afk_events = query_bucket(find_bucket("aw-watcher-afk_"));
+project_events = query_bucket(find_bucket("aw-watcher-project-selected_"));
+project_events = filter_period_intersect(project_events, filter_keyvals(afk_events, "status", ["not-afk"]));
+RETURN = project_events;
+"""
+
+
+def _to_json(obj: Any) -> Any:
+    if isinstance(obj, Event):
+        return obj.to_json_dict()
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    raise TypeError(f"cannot serialize {obj!r}")
+
+
+class StandInServer:
+    """
+    Runs on a background thread. Can be stopped and started again on the same
+    port, keeping its data, to simulate the server going down.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0,
+        period_latency: float = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.period_latency = period_latency
+        self.api = ServerAPI(Datastore(MemoryStorage, testing=True), testing=True)
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            stand_in = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+
+    @property
+    def running(self) -> bool:
+        return self._httpd is not None
+
+    def client(self, name: str = "stand-in-client") -> ActivityWatchClient:
+        return ActivityWatchClient(name, host=self.host, port=self.port)
+
+    def create_bucket(
+        self,
+        bucket_id: str,
+        event_type: str,
+        hostname: str = "stand-in",
+        events: Sequence[dict] = (),
+        created: Optional[datetime.datetime] = None,
+    ):
+        self.api.create_bucket(
+            bucket_id, event_type, "stand-in", hostname, created=created
+        )
+        if events:
+            # The in-memory datastore treats events with an id as replacements
+            self.api.create_events(
+                bucket_id,
+                [Event(**{k: v for k, v in event.items() if k != "id"}) for event in events],
+            )
+
+    def load(self, dataset: Dataset, hostname: str = "stand-in"):
+        """
+        Creates the project, AFK and window buckets of a synthetic dataset
+        """
+        self.create_bucket(
+            f"aw-watcher-project-selected_{hostname}",
+            "project-selection",
+            hostname,
+            dataset.project_events,
+        )
+        self.create_bucket(f"aw-watcher-afk_{hostname}", "afkstatus", hostname, dataset.afk_events)
+        self.create_bucket(
+            f"aw-watcher-window_{hostname}", "currentwindow", hostname, dataset.window_events
+        )
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stand_in: StandInServer
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.stand_in._count_connection()
+
+    def log_message(self, format: str, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method: str):
+        self.stand_in._count_request()
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        parts = [unquote(part) for part in url.path.split("/") if part][2:]
+        if self.stand_in.latency:
+            time.sleep(self.stand_in.latency)
+        try:
+            status, result = 200, self._route(method, parts, params, body)
+        except HTTPException as e:
+            status, result = e.code or 500, {"message": e.description}
+        data = json.dumps(result, default=_to_json).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(
+        self, method: str, parts: List[str], params: Dict[str, str], body: Any
+    ) -> Any:
+        api = self.stand_in.api
+        if parts == ["info"]:
+            return api.get_info()
+        if parts == ["buckets"]:
+            return api.get_buckets()
+        if parts == ["query"]:
+            if self.stand_in.period_latency:
+                time.sleep(self.stand_in.period_latency * len(body["timeperiods"]))
+            return api.query2(
+                params.get("name"), body["query"], body["timeperiods"], False
+            )
+        bucket_id, rest = parts[1], parts[2:]
+        if not rest:
+            if method == "POST":
+                api.create_bucket(
+                    bucket_id, body["type"], body["client"], body["hostname"]
+                )
+                return None
+            if method == "DELETE":
+                return api.delete_bucket(bucket_id)
+            return api.get_bucket_metadata(bucket_id)
+        if rest == ["heartbeat"]:
+            return api.heartbeat(
+                bucket_id, Event(**body), float(params["pulsetime"])
+            )
+        if rest == ["events"]:
+            if method == "POST":
+                api.create_events(bucket_id, [Event(**event) for event in body])
+                return None
+            return api.get_events(
+                bucket_id,
+                int(params.get("limit", -1)),
+                _parse_time(params.get("start")),
+                _parse_time(params.get("end")),
+            )
+        raise NotFound(f"no route for {method} {self.path}")
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    return iso8601.parse_date(value)
@@ -0,0 +1,78 @@
+"""
+Window events classified per second by the backfill, by number of worker
+processes, and the peak memory of a whole backfill against a stand-in server
+
+The classification part feeds days of synthetic window events straight to
+the workers, so it shows the scaling with cores without the HTTP round
+trips. The stand-in server keeps its events in memory and sorts them on
+every request, so the end-to-end part uses a smaller range.
+"""
+import datetime
+import os
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from timeit import default_timer as timer
+
+from aw_watcher_project import backfill as bf
+from aw_watcher_project.client import SharedActivityWatchClient
+from aw_watcher_project.periods import start_of_day
+from benchmarks.aw_server import StandInServer
+from benchmarks.rules import make_rules
+from benchmarks.synthetic import window_event_data
+
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+DAY = datetime.timedelta(days=1)
+
+
+def _days(events):
+    for day, day_events in groupby(
+        events, key=lambda event: start_of_day(datetime.datetime.fromisoformat(event["timestamp"]))
+    ):
+        yield list(day_events), [], (day, day + DAY)
+
+
+def classify(n: int, workers: int, rules) -> float:
+    days = list(_days(window_event_data(n, titles_per_app=500, start=BEGIN)))
+    start = timer()
+    if workers == 1:
+        bf._init_worker(rules)
+        for args in days:
+            bf.classify_chunk(*args)
+    else:
+        with ProcessPoolExecutor(
+            workers, initializer=bf._init_worker, initargs=(rules,)
+        ) as pool:
+            for _ in pool.map(bf.classify_chunk, *zip(*days)):
+                pass
+    return n / (timer() - start)
+
+
+def end_to_end(n: int, rules):
+    events = window_event_data(n, start=BEGIN)
+    end = BEGIN + datetime.timedelta(seconds=sum(event["duration"] for event in events))
+    with StandInServer() as server:
+        server.create_bucket("aw-watcher-window_stand-in", "currentwindow", events=events)
+        client = SharedActivityWatchClient(host=server.host, port=server.port)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result = bf.backfill(client, rules, BEGIN, end, bucket_id="backfilled")
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        client.close()
+    print(
+        f"end to end: {result.window_events} window events over {(end - BEGIN).days} days "
+        f"-> {result.spans} project events in {result.seconds:.2f}s, "
+        f"peak RSS grew {(after - before) / 1024:.1f}MB"
+    )
+
+
+def main(n: int = 200_000, n_rules: int = 300):
+    rules = make_rules(n_rules)
+    print(f"{n} window events, {n_rules} rules, {os.cpu_count()} CPUs")
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        print(f"{workers:>3} workers: {classify(n, workers, rules):>10,.0f} events/s")
+    end_to_end(n // 10, rules)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
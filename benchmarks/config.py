@@ -0,0 +1,47 @@
+"""
+Importing many projects into the config: one save per project, as adding
+them one at a time does, against a single save with ``add_projects``, plus
+reloading and membership checks on the result
+"""
+import sys
+import tempfile
+from pathlib import Path
+from timeit import default_timer as timer
+
+from aw_watcher_project.config import ProjectWatcherConfig
+
+
+def main(n: int = 10_000, one_by_one: int = 500):
+    projects = [f"client-{i // 100}/project-{i}" for i in range(n)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = ProjectWatcherConfig(Path(tmp_dir) / "one-by-one.yml")
+        start = timer()
+        for project in projects[:one_by_one]:
+            config.add_project(project)
+        per_project = (timer() - start) / one_by_one
+        print(
+            f"add_project: {per_project * 1000:.2f}ms per project over the first "
+            f"{one_by_one}, growing with the file"
+        )
+
+        path = Path(tmp_dir) / "bulk.yml"
+        config = ProjectWatcherConfig(path)
+        start = timer()
+        config.add_projects(projects)
+        print(f"add_projects: {n} projects in {timer() - start:.3f}s")
+
+        start = timer()
+        config = ProjectWatcherConfig(path)
+        print(f"load: {len(config)} projects in {timer() - start:.3f}s")
+
+        start = timer()
+        found = sum(project in config for project in projects)
+        print(f"membership: {found} checks in {(timer() - start) * 1000:.2f}ms")
+
+        start = timer()
+        config.remove_projects(projects[::2])
+        print(f"remove_projects: {n // 2} projects in {timer() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
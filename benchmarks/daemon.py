@@ -0,0 +1,81 @@
+"""
+Round-trip latency of ``select`` through the daemon's control socket, and
+resident memory of the daemon's imports against the tray's
+
+Memory is the peak RSS of a fresh interpreter importing each stack, the tray
+one being skipped when PySide6 is not installed.
+"""
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from timeit import default_timer as timer
+
+from aw_watcher_project import ipc
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.daemon import ProjectWatcherDaemon
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from benchmarks.aw_server import StandInServer
+
+BUCKET_ID = "aw-watcher-project-selected_stand-in"
+
+STACKS = {
+    "daemon": "import aw_watcher_project.daemon",
+    "tray": (
+        "from PySide6 import QtWidgets; import aw_watcher_project.gui; "
+        "QtWidgets.QApplication([])"
+    ),
+}
+
+
+def peak_rss_mb(code: str) -> float:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}; import resource; "
+            f"print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"QT_QPA_PLATFORM": "offscreen"},
+    )
+    # Kilobytes on Linux
+    return int(result.stdout.split()[-1]) / 1024
+
+
+def main(n: int = 2000):
+    with StandInServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+        config = ProjectWatcherConfig(Path(tmp_dir) / "config.yml")
+        config.add_projects(["a", "b"])
+        worker = HeartbeatWorker(
+            server.client(), BUCKET_ID, event_type="project-selection"
+        )
+        socket_path = Path(tmp_dir) / "daemon.sock"
+        daemon = ProjectWatcherDaemon(config, worker, socket_path)
+        daemon.start()
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            start = timer()
+            for i in range(n):
+                ipc.select("ab"[i % 2], socket_path=socket_path)
+            elapsed = timer() - start
+        finally:
+            daemon.shutdown()
+            thread.join()
+    print(f"select round trip: {elapsed / n * 1e6:.0f}us over {n} switches")
+
+    for name, code in STACKS.items():
+        try:
+            rss = peak_rss_mb(code)
+        except subprocess.CalledProcessError:
+            print(f"{name} memory: skipped, could not import")
+            continue
+        print(f"{name} memory: {rss:.1f}MB peak RSS")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+Memory and time of the ``__slots__`` event model against the previous
+dict-wrapping model, which parsed the timestamp on every access
+"""
+import datetime
+import gc
+import sys
+import tracemalloc
+from timeit import default_timer as timer
+from typing import Callable
+
+from aw_watcher_project.events import project
+from aw_watcher_project.events.project import ProjectEvent
+from benchmarks.synthetic import project_event_data
+
+
+class DictProjectEvent:
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def duration(self) -> float:
+        return self.data["duration"]
+
+    @property
+    def time(self) -> datetime.datetime:
+        return datetime.datetime.fromisoformat(self.data["timestamp"])
+
+    @property
+    def end_time(self) -> datetime.datetime:
+        return self.time + datetime.timedelta(seconds=self.duration)
+
+    @property
+    def day(self) -> datetime.date:
+        return self.time.date()
+
+    @property
+    def start_end_duration(self):
+        return self.time, self.end_time, self.duration
+
+    @property
+    def project(self) -> str:
+        return self.data["data"]["project"]
+
+
+def _bytes_per_event(n: int, factory: Callable) -> float:
+    # Input dicts are allocated while tracing so that models which keep them
+    # alive are charged for them
+    gc.collect()
+    tracemalloc.start()
+    data = project_event_data(n)
+    events = [factory(event) for event in data]
+    del data
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+    return retained / n
+
+
+def _measure(n: int, memory_sample: int, factory: Callable):
+    data = project_event_data(n)
+    start = timer()
+    events = [factory(event) for event in data]
+    build = timer() - start
+    del data
+
+    start = timer()
+    project.duration_by_project(events)
+    project.duration_by_day_by_project(events)
+    project.start_end_durations_by_project(events)
+    aggregate = timer() - start
+    del events
+
+    print(
+        f"{factory.__name__}: build {build:.2f}s, aggregate {aggregate:.2f}s, "
+        f"{_bytes_per_event(memory_sample, factory):.0f} bytes/event"
+    )
+
+
+def main(n: int = 1_000_000, memory_sample: int = 100_000):
+    print(f"{n} events, memory sampled over {memory_sample}")
+    _measure(n, memory_sample, DictProjectEvent)
+    _measure(n, memory_sample, ProjectEvent)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
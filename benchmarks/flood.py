@@ -0,0 +1,42 @@
+"""
+Flooding event dicts into project events through aw_core events and
+:func:`aw_transform.flood`, as :func:`~aw_watcher_project.get_time_spent.get_events`
+used to, against :func:`aw_watcher_project.events.flood.flood` on our own events
+
+Both start from the dicts the server returns and end with
+:class:`~aw_watcher_project.events.project.ProjectEvents`, so parsing is
+included in both timings.
+"""
+import sys
+from timeit import default_timer as timer
+
+from aw_core import Event as AWEvent
+from aw_transform import flood as aw_flood
+
+from aw_watcher_project.events.flood import flood
+from aw_watcher_project.events.project import ProjectEvents
+from benchmarks.synthetic import project_event_data
+
+
+def main(n: int = 200_000, pulsetime: float = 600):
+    data = project_event_data(n)
+    print(f"{n} events, pulsetime {pulsetime:g}s")
+
+    start = timer()
+    aw_events = ProjectEvents.from_aw_events(
+        aw_flood([AWEvent(**e) for e in data], pulsetime=pulsetime)
+    )
+    aw_time = timer() - start
+
+    start = timer()
+    events = ProjectEvents(data)
+    events.events = flood(events.events, pulsetime=pulsetime)
+    native_time = timer() - start
+
+    assert len(events) == len(aw_events)
+    print(f"aw_transform: {aw_time:.3f}s")
+    print(f"native:       {native_time:.3f}s ({aw_time / native_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
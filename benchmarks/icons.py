@@ -0,0 +1,72 @@
+"""
+Per-switch cost of the tray icon: rendering with QPainter against a lookup in
+:class:`~aw_watcher_project.icons.IconCache`, and the previous pipeline which
+drew with Pillow and read a temporary PNG back when Pillow is installed
+
+Uses the offscreen Qt platform unless ``QT_QPA_PLATFORM`` is set.
+"""
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import default_timer as timer
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import QtGui as g
+
+from aw_watcher_project.icons import IconCache, render_text_icon
+
+# Distinct three character labels, as shown in the tray for 20 projects
+LABELS = tuple(f"p{i:02d}" for i in range(20))
+
+
+def _pillow_text_icon(text: str) -> g.QIcon:
+    from PIL import Image, ImageDraw
+
+    temp_img = Image.new("RGBA", (200, 100), (255, 0, 0, 0))
+    d = ImageDraw.Draw(temp_img)
+    text_width, text_height = d.textsize(text)
+    img = Image.new("RGBA", (text_width, text_height), (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    d.text((0, 0), text, fill=(255, 255, 255))
+    with TemporaryDirectory() as tmp_dir:
+        out_path = str(Path(tmp_dir) / "temp.png")
+        img.save(out_path)
+        icon = g.QIcon(out_path)
+    return icon
+
+
+def _per_switch(render, labels, switches: int) -> float:
+    start = timer()
+    for i in range(switches):
+        render(labels[i % len(labels)])
+    return (timer() - start) / switches
+
+
+def main(switches: int = 2000):
+    app = g.QGuiApplication([])
+    labels = LABELS
+    print(f"{switches} switches between {len(labels)} projects")
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Pillow pipeline: skipped, Pillow is not installed")
+    else:
+        # Disk I/O per icon, so fewer switches are enough
+        cost = _per_switch(_pillow_text_icon, labels, max(1, switches // 10))
+        print(f"Pillow pipeline: {cost * 1e6:.1f}us per switch")
+
+    cost = _per_switch(render_text_icon, labels, switches)
+    print(f"QPainter render: {cost * 1e6:.1f}us per switch")
+
+    cache = IconCache()
+    cache.prerender(labels)
+    cost = _per_switch(cache.get, labels, switches)
+    print(f"Cached lookup: {cost * 1e6:.2f}us per switch")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
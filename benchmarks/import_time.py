@@ -0,0 +1,60 @@
+"""
+Import time of the CLI entry point and its subcommand modules, from
+``python -X importtime`` in a fresh interpreter
+"""
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = (
+    "aw_watcher_project.__main__",
+    "aw_watcher_project.autostart",
+)
+
+
+def import_times(module: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Self and cumulative import time in seconds of every module imported when
+    importing ``module`` in a new interpreter
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, Tuple[float, float]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # Header line
+            continue
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+def slowest(times: Dict[str, Tuple[float, float]], n: int = 10) -> List[Tuple[str, float]]:
+    return sorted(
+        ((name, cumulative) for name, (_, cumulative) in times.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:n]
+
+
+def main(repeat: int = 5):
+    for module in ENTRY_POINTS:
+        runs = [import_times(module) for _ in range(repeat)]
+        totals = sorted(times[module][1] for times in runs)
+        print(
+            f"{module}: median {totals[len(totals) // 2] * 1000:.1f}ms, "
+            f"{len(runs[0])} modules"
+        )
+        below = {name: times for name, times in runs[0].items() if name != module}
+        for name, cumulative in slowest(below, 5):
+            print(f"    {name}: {cumulative * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,46 @@
+"""
+Intersecting project events with the not-AFK periods as aw-server's
+``filter_period_intersect`` does it, against
+:meth:`aw_watcher_project.intervals.Intervals.intersect` on the raw buckets
+
+Both start from the event dicts the server returns and end with event dicts,
+so parsing is included in both timings. The native times should grow
+linearly with the number of events.
+"""
+import sys
+from timeit import default_timer as timer
+
+from aw_core import Event as AWEvent
+from aw_transform import filter_keyvals, filter_period_intersect
+
+from aw_watcher_project.buckets import not_afk_intervals
+from benchmarks.synthetic import afk_event_data, project_event_data
+
+
+def main(max_n: int = 1_000_000, compare_up_to: int = 100_000):
+    n = 10_000
+    while n <= max_n:
+        project_events = project_event_data(n)
+        afk_events = afk_event_data(project_events)
+
+        start = timer()
+        events = not_afk_intervals(project_events, afk_events).to_event_data(project_events)
+        native_time = timer() - start
+        line = f"{n:>8} events: native {native_time:.3f}s ({native_time / n * 1e6:.2f}us/event)"
+
+        if n <= compare_up_to:
+            start = timer()
+            not_afk = filter_keyvals([AWEvent(**e) for e in afk_events], "status", ["not-afk"])
+            expected = filter_period_intersect(
+                [AWEvent(**e) for e in project_events], not_afk
+            )
+            expected = [e.to_json_dict() for e in expected]
+            aw_time = timer() - start
+            assert events == expected
+            line += f", aw_transform {aw_time:.3f}s ({aw_time / native_time:.1f}x)"
+        print(line)
+        n *= 10
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
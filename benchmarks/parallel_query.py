@@ -0,0 +1,53 @@
+"""
+Wall-clock time of querying a year of days from a stand-in aw-server with
+artificial latency, by number of query workers
+
+The stand-in server evaluates queries in this process, so keep the data small
+enough that the artificial latency dominates, as it would for a busy server.
+"""
+import datetime
+import sys
+from timeit import default_timer as timer
+
+from aw_watcher_project.fetch import query_periods
+from aw_watcher_project.periods import split_time_range
+from benchmarks.aw_server import PROJECT_EVENTS_QUERY, StandInServer
+from benchmarks.synthetic import afk_event_data, project_event_data
+
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def main(n: int = 500, latency: float = 0.05, period_latency: float = 0.02):
+    project_events = project_event_data(n, start=BEGIN)
+    with StandInServer(latency=latency, period_latency=period_latency) as server:
+        server.create_bucket(
+            "aw-watcher-project-selected_stand-in",
+            "project-selection",
+            events=project_events,
+        )
+        server.create_bucket(
+            "aw-watcher-afk_stand-in",
+            "afkstatus",
+            events=afk_event_data(project_events),
+        )
+        client = server.client()
+        periods = split_time_range(BEGIN, BEGIN + datetime.timedelta(days=365))
+        print(
+            f"{len(periods)} periods, {latency}s latency per request, "
+            f"{period_latency}s per period"
+        )
+        baseline = None
+        for max_workers in (1, 2, 4, 8):
+            start = timer()
+            query_periods(
+                client, PROJECT_EVENTS_QUERY, periods, max_workers=max_workers
+            )
+            elapsed = timer() - start
+            baseline = baseline or elapsed
+            print(
+                f"{max_workers} workers: {elapsed:.2f}s ({baseline / elapsed:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:])))
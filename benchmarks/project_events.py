@@ -0,0 +1,42 @@
+"""
+Compares the per-object aggregation functions in
+:mod:`aw_watcher_project.events.project` against the columnar
+:class:`~aw_watcher_project.events.project.ProjectEvents` methods
+"""
+import sys
+from timeit import default_timer as timer
+
+from aw_watcher_project.events import project
+from aw_watcher_project.events.project import ProjectEvents
+from benchmarks.synthetic import project_event_data
+
+AGGREGATIONS = (
+    "duration_by_project",
+    "duration_by_day_by_project",
+)
+
+
+def main(n: int = 200_000):
+    events = ProjectEvents(project_event_data(n))
+    print(f"{n} events")
+
+    start = timer()
+    events.columns
+    print(f"build columns: {timer() - start:.3f}s")
+
+    for name in AGGREGATIONS:
+        start = timer()
+        getattr(project, name)(events.events)
+        per_object = timer() - start
+
+        start = timer()
+        getattr(events.columns, name)()
+        columnar = timer() - start
+        print(
+            f"{name}: per-object {per_object:.3f}s, columnar {columnar:.3f}s "
+            f"({per_object / columnar:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
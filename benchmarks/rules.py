@@ -0,0 +1,61 @@
+"""
+Windows matched per second against hundreds of auto-select rules: checking
+rule by rule, the combined pattern, and the combined pattern with its cache
+
+Titles come from synthetic window events, which revisit the same windows the
+way switching between a few editors and browser tabs does.
+"""
+from timeit import default_timer as timer
+from typing import Callable, List, Tuple
+
+from aw_watcher_project.config import RuleData
+from aw_watcher_project.rules import RuleSet, match_sequentially
+from benchmarks.synthetic import DEFAULT_APPS, window_event_data
+
+
+def make_rules(n: int) -> List[RuleData]:
+    rules: List[RuleData] = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            rules.append(RuleData(project=f"path-{i}", path=f"/project-{i}/"))
+        elif kind == 1:
+            rules.append(
+                RuleData(
+                    project=f"title-{i}",
+                    app=DEFAULT_APPS[i % len(DEFAULT_APPS)],
+                    title=rf"project-{i}\b",
+                )
+            )
+        else:
+            rules.append(RuleData(project=f"app-{i}", app=f"app-{i}-*"))
+    return rules
+
+
+def windows_per_second(match: Callable[[str, str], object], windows: List[Tuple[str, str]]) -> float:
+    start = timer()
+    for app, title in windows:
+        match(app, title)
+    return len(windows) / (timer() - start)
+
+
+def main(n_windows: int = 20000):
+    windows = [
+        (event["data"]["app"], event["data"]["title"])
+        for event in window_event_data(n_windows, titles_per_app=500)
+    ]
+    print(f"{'rules':>6} {'sequential':>12} {'combined':>12} {'cached':>12}  windows/s")
+    for n_rules in (10, 100, 500, 1000):
+        rules = make_rules(n_rules)
+        rule_set = RuleSet(rules)
+        # Only a slice for the slow path, it takes seconds with many rules
+        sequential = windows_per_second(
+            lambda app, title: match_sequentially(rules, app, title), windows[:2000]
+        )
+        combined = windows_per_second(rule_set._match, windows)
+        cached = windows_per_second(rule_set.match, windows)
+        print(f"{n_rules:>6} {sequential:>12,.0f} {combined:>12,.0f} {cached:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
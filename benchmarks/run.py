@@ -0,0 +1,363 @@
+"""
+Runs the benchmark suite on a synthetic dataset served by a stand-in
+aw-server and writes the timings as JSON, so that commits can be compared
+
+    python -m benchmarks.run --days 30 --output before.json
+    python -m benchmarks.run --days 30 --output after.json
+    python -m benchmarks.run --compare before.json after.json
+
+Each benchmark runs ``--repeat`` times and the fastest time is compared, as
+the slower runs mostly measure other load on the machine. ``--days`` scales
+the dataset from a day up to years, a year holding about half a million
+window events. The other modules in this package are more detailed
+benchmarks of single changes, printing their results.
+"""
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import count
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from unittest import mock
+
+from aw_client import ActivityWatchClient
+
+from aw_watcher_project import get_activity, get_time_spent, report
+from aw_watcher_project.cache import QueryCache
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.events.project import ProjectEvents, duration_by_project_from_batches
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from aw_watcher_project.spool import HeartbeatSpool
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import Dataset, dataset
+
+RESULTS_VERSION = 1
+
+
+class Context(NamedTuple):
+    dataset: Dataset
+    server: StandInServer
+    client: ActivityWatchClient
+    cache: QueryCache
+    tmp_dir: Path
+
+
+# A benchmark prepares its state and returns the function to time with the
+# number of items it processes per call
+Benchmark = Callable[[Context], Tuple[Callable[[], Any], int]]
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _queried_events(ctx: Context) -> int:
+    return len(ctx.dataset.project_events) + len(ctx.dataset.afk_events)
+
+
+@benchmark("get_events")
+def _get_events(ctx: Context):
+    data = ctx.dataset
+    return lambda: get_time_spent.get_events(data.begin, data.end, use_cache=False), _queried_events(ctx)
+
+
+@benchmark("get_events.flooded")
+def _get_events_flooded(ctx: Context):
+    data = ctx.dataset
+    return (
+        lambda: get_time_spent.get_events(data.begin, data.end, flood_time=600, use_cache=False),
+        _queried_events(ctx),
+    )
+
+
+@benchmark("get_events.cached")
+def _get_events_cached(ctx: Context):
+    data = ctx.dataset
+    get_time_spent.get_events(data.begin, data.end)
+    return lambda: get_time_spent.get_events(data.begin, data.end), _queried_events(ctx)
+
+
+@benchmark("iter_events")
+def _iter_events(ctx: Context):
+    data = ctx.dataset
+
+    def run():
+        return duration_by_project_from_batches(
+            get_time_spent.iter_events(data.begin, data.end, use_cache=False)
+        )
+
+    return run, _queried_events(ctx)
+
+
+@benchmark("get_activity")
+def _get_activity(ctx: Context):
+    data = ctx.dataset
+    return (
+        lambda: get_activity.get_activity_for_projects(None, data.begin, data.end, use_cache=False),
+        len(data),
+    )
+
+
+def _report_range(data: Dataset) -> Tuple[datetime.date, datetime.date]:
+    return data.begin.date(), (data.end - datetime.timedelta(microseconds=1)).date()
+
+
+@benchmark("report")
+def _report_computed(ctx: Context):
+    begin, end = _report_range(ctx.dataset)
+    return (
+        lambda: report.get_report(begin, end, use_cache=False, tz=datetime.timezone.utc),
+        len(ctx.dataset),
+    )
+
+
+@benchmark("report.stored")
+def _report_stored(ctx: Context):
+    begin, end = _report_range(ctx.dataset)
+    report.get_report(begin, end, tz=datetime.timezone.utc)
+    return lambda: report.get_report(begin, end, tz=datetime.timezone.utc), (end - begin).days + 1
+
+
+def _aggregation(name: str) -> Benchmark:
+    def setup(ctx: Context):
+        data = ctx.dataset.project_events
+        # Parsing is included, as every report parses the events it aggregates
+        return lambda: getattr(ProjectEvents(data), name)(), len(data)
+
+    return setup
+
+
+for _name in (
+    "duration_by_project",
+    "duration_by_day_by_project",
+    "start_end_durations_by_project",
+    "events_by_project",
+):
+    benchmark(f"project_events.{_name}")(_aggregation(_name))
+
+
+CONFIG_PROJECTS = [f"client-{i // 100}/project-{i}" for i in range(2000)]
+
+
+@benchmark("config.add_projects")
+def _config_add_projects(ctx: Context):
+    paths = (ctx.tmp_dir / f"add-{i}.yml" for i in count())
+    return lambda: ProjectWatcherConfig(next(paths)).add_projects(CONFIG_PROJECTS), len(CONFIG_PROJECTS)
+
+
+@benchmark("config.add_project")
+def _config_add_project(ctx: Context):
+    config = ProjectWatcherConfig(ctx.tmp_dir / "one.yml")
+    config.add_projects(CONFIG_PROJECTS)
+    names = (f"added-{i}" for i in count())
+    return lambda: config.add_project(next(names)), 1
+
+
+@benchmark("config.reload")
+def _config_reload(ctx: Context):
+    config = ProjectWatcherConfig(ctx.tmp_dir / "reload.yml")
+    config.add_projects(CONFIG_PROJECTS)
+    return config.reload, len(CONFIG_PROJECTS)
+
+
+@benchmark("config.contains")
+def _config_contains(ctx: Context):
+    config = ProjectWatcherConfig(ctx.tmp_dir / "contains.yml")
+    config.add_projects(CONFIG_PROJECTS)
+    return lambda: sum(project in config for project in CONFIG_PROJECTS), len(CONFIG_PROJECTS)
+
+
+HEARTBEAT_SWITCHES = 50
+
+# Workers and spools to close once all benchmarks ran
+BENCHMARK_STATE: List[Any] = []
+
+
+def _heartbeat_loop(ctx: Context, spool: Optional[HeartbeatSpool]):
+    # Project switches, each waited on until the server has the heartbeats
+    bucket_id = f"aw-watcher-project-selected_heartbeats-{len(BENCHMARK_STATE)}"
+    ctx.server.create_bucket(bucket_id, "project-selection")
+    worker = HeartbeatWorker(ctx.server.client(), bucket_id, interval=60, spool=spool)
+    BENCHMARK_STATE.append(worker)
+    switches = count()
+
+    def switch():
+        before = ctx.server.requests
+        worker.select(f"project-{next(switches) % 2}")
+        while ctx.server.requests < before + 2 or (spool is not None and len(spool)):
+            time.sleep(0.0002)
+
+    def run():
+        for _ in range(HEARTBEAT_SWITCHES):
+            switch()
+
+    switch()
+    return run, HEARTBEAT_SWITCHES
+
+
+@benchmark("heartbeat.switch")
+def _heartbeat_switch(ctx: Context):
+    return _heartbeat_loop(ctx, None)
+
+
+@benchmark("heartbeat.switch_spooled")
+def _heartbeat_switch_spooled(ctx: Context):
+    spool = HeartbeatSpool(ctx.tmp_dir / "spool.sqlite")
+    BENCHMARK_STATE.append(spool)
+    return _heartbeat_loop(ctx, spool)
+
+
+def _close_state():
+    for item in reversed(BENCHMARK_STATE):
+        if isinstance(item, HeartbeatWorker):
+            item.stop(timeout=None)
+        else:
+            item.close()
+    BENCHMARK_STATE.clear()
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    days: int = 7,
+    repeat: int = 5,
+    patterns: Sequence[str] = ("*",),
+    latency: float = 0,
+) -> Dict[str, Any]:
+    """
+    Runs the benchmarks with a name matching one of ``patterns``
+    """
+    data = dataset(days)
+    names = [
+        name for name in BENCHMARKS if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+    ]
+    results: Dict[str, Any] = {}
+    with contextlib.ExitStack() as stack:
+        tmp_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        server = stack.enter_context(StandInServer(latency=latency))
+        server.load(data)
+        client = server.client()
+        cache = QueryCache(tmp_dir / "cache.sqlite")
+        stack.callback(cache.close)
+        # The reports get their client and cache from these
+        for module in (get_time_spent, get_activity, report):
+            stack.enter_context(mock.patch.object(module, "get_client", lambda: client))
+            stack.enter_context(mock.patch.object(module, "get_default_cache", lambda: cache))
+        stack.callback(_close_state)
+        ctx = Context(data, server, client, cache, tmp_dir)
+        for name in names:
+            function, n = BENCHMARKS[name](ctx)
+            times: List[float] = []
+            for _ in range(repeat):
+                start = timer()
+                function()
+                times.append(timer() - start)
+            best = min(times)
+            results[name] = {"n": n, "seconds": best, "per_item": best / n, "times": times}
+            print(f"{name:<45} {best:>9.4f}s  {best / n * 1e6:>10.2f}us/item", file=sys.stderr)
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "days": days,
+        "events": len(data),
+        "latency": latency,
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float = 0.1) -> List[str]:
+    """
+    Prints the change of each benchmark and returns those slower by more than
+    ``threshold``
+    """
+    if before.get("days") != after.get("days"):
+        print(
+            f"warning: comparing {before.get('days')} days against {after.get('days')} days",
+            file=sys.stderr,
+        )
+    slower: List[str] = []
+    for name, result in after["benchmarks"].items():
+        old = before["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:<45} {'new':>9} {result['seconds']:>9.4f}s")
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        mark = ""
+        if ratio > 1 + threshold:
+            slower.append(name)
+            mark = "  slower"
+        elif ratio < 1 / (1 + threshold):
+            mark = "  faster"
+        print(f"{name:<45} {old['seconds']:>9.4f}s {result['seconds']:>9.4f}s {ratio:>6.2f}x{mark}")
+    return slower
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=7, help="days of synthetic data")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds of latency per server request"
+    )
+    parser.add_argument(
+        "-k", dest="patterns", action="append", help="only run benchmarks matching this glob"
+    )
+    parser.add_argument("--output", "-o", type=Path, help="JSON file to write the results to")
+    parser.add_argument(
+        "--compare", nargs=2, type=Path, metavar=("BEFORE", "AFTER"),
+        help="compare two result files instead, failing on regressions",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="relative slowdown counted as a regression by --compare",
+    )
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.compare:
+        before, after = (json.loads(path.read_text()) for path in args.compare)
+        slower = compare(before, after, args.threshold)
+        return 1 if slower else 0
+    results = run(args.days, args.repeat, args.patterns or ("*",), args.latency)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Startup timings of the heartbeat path when aw-server comes up after the
+watcher, as at login
+
+For each server delay, reports how long selecting a project blocks the
+caller, which is what the tray waits on, and the time from start until the
+first heartbeat is accepted by the stand-in server. The tray itself needs a
+display and logs its own time to visible on startup.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from timeit import default_timer as timer
+
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from aw_watcher_project.spool import HeartbeatSpool
+from benchmarks.aw_server import StandInServer
+
+BUCKET_ID = "aw-watcher-project-selected_stand-in"
+
+
+def measure(server_delay: float, retry_delay: float = 0.1):
+    server = StandInServer()
+    server.start()
+    server.stop()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spool = HeartbeatSpool(Path(tmp_dir) / "spool.sqlite")
+        worker = HeartbeatWorker(
+            server.client(),
+            BUCKET_ID,
+            spool=spool,
+            event_type="project-selection",
+            retry_delay=retry_delay,
+            max_retry_delay=1,
+        )
+        start = timer()
+        worker.select("project")
+        select_time = timer() - start
+        time.sleep(server_delay)
+        server.start()
+        try:
+            while worker.first_accepted_at is None:
+                time.sleep(0.005)
+        finally:
+            worker.stop(timeout=None)
+            server.stop()
+            spool.close()
+    return select_time, worker.first_accepted_at - worker.created_at
+
+
+def main(*server_delays: float):
+    for server_delay in server_delays or (0, 0.5, 2):
+        select_time, accepted = measure(server_delay)
+        print(
+            f"server up after {server_delay:g}s: select blocked "
+            f"{select_time * 1000:.2f}ms, first heartbeat accepted after {accepted:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,152 @@
+import datetime
+import random
+from typing import List, NamedTuple, Sequence
+
+from aw_watcher_project.events.project import ProjectEventData, ProjectData
+
+DEFAULT_PROJECTS = tuple(f"project-{i}" for i in range(20))
+DEFAULT_START = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Average events per day of the generators below: project events last half
+# an hour on average with five minute gaps, window events a minute
+PROJECT_EVENTS_PER_DAY = 41
+WINDOW_EVENTS_PER_DAY = 1440
+
+
+def project_event_data(
+    n: int,
+    projects: Sequence[str] = DEFAULT_PROJECTS,
+    start: datetime.datetime = datetime.datetime(
+        2019, 1, 1, tzinfo=datetime.timezone.utc
+    ),
+    seed: int = 0,
+) -> List[ProjectEventData]:
+    """
+    Deterministic stream of project event dicts as returned by aw-server
+    """
+    rand = random.Random(seed)
+    events: List[ProjectEventData] = []
+    time = start
+    for i in range(n):
+        duration = round(rand.uniform(5, 3600), 3)
+        events.append(
+            ProjectEventData(
+                id=i,
+                timestamp=time.isoformat(),
+                duration=duration,
+                data=ProjectData(project=rand.choice(projects)),
+            )
+        )
+        time += datetime.timedelta(seconds=duration + round(rand.uniform(0, 600), 3))
+    return events
+
+
+def afk_event_data(
+    project_events: Sequence[ProjectEventData], afk_ratio: float = 0.2, seed: int = 0
+) -> List[dict]:
+    """
+    AFK status events covering the span of ``project_events``, alternating
+    between not-afk and afk stretches
+    """
+    rand = random.Random(seed)
+    if not project_events:
+        return []
+    time = datetime.datetime.fromisoformat(project_events[0]["timestamp"])
+    last = project_events[-1]
+    end = datetime.datetime.fromisoformat(last["timestamp"]) + datetime.timedelta(
+        seconds=last["duration"]
+    )
+    events: List[dict] = []
+    while time < end:
+        afk = rand.random() < afk_ratio
+        duration = round(rand.uniform(60, 1800 if afk else 7200), 3)
+        events.append(
+            dict(
+                id=len(events),
+                timestamp=time.isoformat(),
+                duration=duration,
+                data=dict(status="afk" if afk else "not-afk"),
+            )
+        )
+        time += datetime.timedelta(seconds=duration)
+    return events
+
+
+DEFAULT_APPS = ("firefox", "code", "terminal", "slack", "jetbrains-pycharm-ce")
+
+
+def window_event_data(
+    n: int,
+    apps: Sequence[str] = DEFAULT_APPS,
+    titles_per_app: int = 50,
+    start: datetime.datetime = datetime.datetime(
+        2019, 1, 1, tzinfo=datetime.timezone.utc
+    ),
+    seed: int = 0,
+) -> List[dict]:
+    """
+    Deterministic stream of contiguous aw-watcher-window event dicts
+    """
+    rand = random.Random(seed)
+    events: List[dict] = []
+    time = start
+    for i in range(n):
+        app = rand.choice(apps)
+        duration = round(rand.expovariate(1 / 60), 3)
+        events.append(
+            dict(
+                id=i,
+                timestamp=time.isoformat(),
+                duration=duration,
+                data=dict(
+                    app=app,
+                    title=f"{app} - /home/user/project-{rand.randrange(titles_per_app)}/file.py",
+                ),
+            )
+        )
+        time += datetime.timedelta(seconds=duration)
+    return events
+
+
+class Dataset(NamedTuple):
+    """
+    Project, AFK and window event dicts covering the same days
+    """
+
+    project_events: List[ProjectEventData]
+    afk_events: List[dict]
+    window_events: List[dict]
+
+    @property
+    def begin(self) -> datetime.datetime:
+        return datetime.datetime.fromisoformat(self.project_events[0]["timestamp"])
+
+    @property
+    def end(self) -> datetime.datetime:
+        last = self.window_events[-1]
+        return datetime.datetime.fromisoformat(last["timestamp"]) + datetime.timedelta(
+            seconds=last["duration"]
+        )
+
+    def __len__(self) -> int:
+        return len(self.project_events) + len(self.afk_events) + len(self.window_events)
+
+
+def dataset(
+    days: int,
+    projects: Sequence[str] = DEFAULT_PROJECTS,
+    start: datetime.datetime = DEFAULT_START,
+    seed: int = 0,
+) -> Dataset:
+    """
+    Deterministic buckets for about ``days`` days of use, a year holding half
+    a million window events
+    """
+    project_events = project_event_data(
+        max(1, days * PROJECT_EVENTS_PER_DAY), projects, start, seed
+    )
+    return Dataset(
+        project_events,
+        afk_event_data(project_events, seed=seed),
+        window_event_data(max(1, days * WINDOW_EVENTS_PER_DAY), start=start, seed=seed),
+    )
@@ -67,19 +67,19 @@ PACKAGE_INSTALL_REQUIRES = [
     'tzlocal',
     'PyYAML',
     'PySide6',
-    'Pillow',
     'typing_extensions',
     'aw_client @ https://github.com/ActivityWatch/aw-client/tarball/master',
     'typer',
     'colorama',
     'shellingham',
+    'numpy',
 ]
 
 # Add any third party packages you use in requirements for optional features of your package here
 # Keys should be name of the optional feature and values are lists of required packages
 # E.g. {'feature1': ['pandas', 'numpy'], 'feature2': ['matplotlib']}
 OPTIONAL_PACKAGE_INSTALL_REQUIRES = {
-
+    'parquet': ['pyarrow'],
 }
 
 # Packages added to Binder environment so that examples can be executed in Binder
@@ -0,0 +1,99 @@
+import datetime
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aw_core.models import Event
+
+from aw_watcher_project.events.base import AllEventData
+from aw_watcher_project.periods import TimePeriod
+
+
+class FakeQueryClient:
+    """
+    Stands in for :class:`aw_client.ActivityWatchClient` when querying. Returns,
+    for each period, the events which overlap it without trimming them, as
+    aw-server-python does. Queries of the AFK bucket get ``afk_events``, by
+    default one not-AFK event covering all time, and any other query ``events``.
+    """
+
+    def __init__(
+        self,
+        events: Sequence[AllEventData],
+        buckets: Dict[str, dict] = None,
+        afk_events: Sequence[dict] = None,
+    ):
+        self.events = list(events)
+        if afk_events is None:
+            afk_events = [
+                dict(
+                    id=0,
+                    timestamp="2000-01-01T00:00:00+00:00",
+                    duration=100 * 365 * 86400,
+                    data=dict(status="not-afk"),
+                )
+            ]
+        self.afk_events = list(afk_events)
+        self.buckets = buckets or {
+            "aw-watcher-project-selected_host": {
+                "id": "aw-watcher-project-selected_host",
+                "hostname": "host",
+                "created": "2021-01-01T00:00:00+00:00",
+                "last_updated": "2021-01-01T00:00:00+00:00",
+            }
+        }
+        self.queried: List[List[TimePeriod]] = []
+
+    def get_buckets(self) -> Dict[str, dict]:
+        return self.buckets
+
+    def query(self, query: str, timeperiods: List[TimePeriod]) -> List[Any]:
+        self.queried.append(list(timeperiods))
+        events = self.afk_events if 'find_bucket("aw-watcher-afk_")' in query else self.events
+        results = []
+        for start, end in timeperiods:
+            results.append(
+                [
+                    event
+                    for event in events
+                    if _overlaps(event, start, end)
+                ]
+            )
+        return results
+
+
+class FakeHeartbeatClient:
+    """
+    Records heartbeats with the monotonic time they arrived, optionally taking
+    ``delay`` seconds to answer each one
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.heartbeats: List[Tuple[float, Optional[str], datetime.datetime]] = []
+        self.received = threading.Condition()
+
+    def heartbeat(self, bucket_id: str, event: Event, pulsetime: float, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.received:
+            self.heartbeats.append(
+                (time.monotonic(), event.data["project"], event.timestamp)
+            )
+            self.received.notify_all()
+
+    def wait_for(self, project: Optional[str], timeout: float = 5) -> float:
+        """
+        Monotonic time the first heartbeat for ``project`` arrived
+        """
+        with self.received:
+            self.received.wait_for(
+                lambda: any(hb[1] == project for hb in self.heartbeats), timeout
+            )
+            return next(hb[0] for hb in self.heartbeats if hb[1] == project)
+
+
+def _overlaps(event: AllEventData, start: datetime.datetime, end: datetime.datetime) -> bool:
+    event_start = datetime.datetime.fromisoformat(event["timestamp"])
+    event_end = event_start + datetime.timedelta(seconds=event["duration"])
+    return event_start <= end and event_end >= start
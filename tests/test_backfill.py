@@ -0,0 +1,135 @@
+import datetime
+
+import pytest
+
+from aw_watcher_project.backfill import (
+    ProjectSpan,
+    backfill,
+    merge_spans,
+    subtract_periods,
+)
+from aw_watcher_project.client import SharedActivityWatchClient
+from aw_watcher_project.config import RuleData
+from aw_watcher_project.rules import RuleSet
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import window_event_data
+
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2019, 1, 4, tzinfo=datetime.timezone.utc)
+WINDOW_BUCKET = "aw-watcher-window_stand-in"
+SELECTED_BUCKET = "aw-watcher-project-selected_stand-in"
+
+RULES = [
+    RuleData(project="even", path="/project-2"),
+    RuleData(project="code", app="code"),
+    RuleData(project="chat", app="slack"),
+]
+
+
+def _time(minutes: float) -> datetime.datetime:
+    return BEGIN + datetime.timedelta(minutes=minutes)
+
+
+def _span(start: float, end: float, project: str = "a") -> ProjectSpan:
+    return ProjectSpan(_time(start), _time(end), project)
+
+
+def test_merge_spans():
+    spans = [_span(0, 1), _span(1.5, 2), _span(2, 3, "b"), _span(5, 6, "b"), _span(6, 7)]
+    assert merge_spans(spans, merge_gap=180) == [
+        _span(0, 2),
+        _span(2, 6, "b"),
+        _span(6, 7),
+    ]
+    assert merge_spans(spans, merge_gap=0) == [
+        _span(0, 1),
+        _span(1.5, 2),
+        _span(2, 3, "b"),
+        _span(5, 6, "b"),
+        _span(6, 7),
+    ]
+
+
+def test_subtract_periods():
+    spans = [_span(0, 10), _span(20, 30, "b")]
+    periods = [(_time(2), _time(3)), (_time(8), _time(22)), (_time(29), _time(40))]
+    assert subtract_periods(spans, periods) == [
+        _span(0, 2),
+        _span(3, 8),
+        _span(22, 29, "b"),
+    ]
+
+
+@pytest.fixture(scope="module")
+def windows():
+    return window_event_data(3000, start=BEGIN)
+
+
+@pytest.fixture(scope="module")
+def selected():
+    # An hour selected every six hours
+    return [
+        dict(timestamp=_time(i * 360).isoformat(), duration=3600, data=dict(project="x"))
+        for i in range(12)
+    ]
+
+
+@pytest.fixture
+def server(windows, selected):
+    with StandInServer() as server:
+        server.create_bucket(WINDOW_BUCKET, "currentwindow", events=windows)
+        server.create_bucket(SELECTED_BUCKET, "project-selection", events=selected)
+        yield server
+
+
+def _backfilled(server: StandInServer, **kwargs):
+    client = SharedActivityWatchClient(host=server.host, port=server.port)
+    try:
+        result = backfill(client, RULES, BEGIN, END, bucket_id="backfilled", **kwargs)
+        events = sorted(client.get_events("backfilled"), key=lambda e: e.timestamp)
+    finally:
+        client.close()
+    return result, [
+        ProjectSpan(e.timestamp, e.timestamp + e.duration, e.data["project"]) for e in events
+    ]
+
+
+def test_backfill(server, windows, selected):
+    result, spans = _backfilled(server, max_workers=2, merge_gap=0, batch_size=100)
+    # Events crossing midnight are fetched for both days
+    assert len(windows) <= result.window_events < len(windows) + 5
+
+    rules = RuleSet(RULES)
+    expected = []
+    for event in windows:
+        project = rules.match(event["data"]["app"], event["data"]["title"])
+        start = datetime.datetime.fromisoformat(event["timestamp"])
+        end = start + datetime.timedelta(seconds=event["duration"])
+        if project is not None and start < END and end > BEGIN:
+            expected.append(ProjectSpan(max(start, BEGIN), min(end, END), project))
+    periods = [
+        (
+            datetime.datetime.fromisoformat(event["timestamp"]),
+            datetime.datetime.fromisoformat(event["timestamp"])
+            + datetime.timedelta(seconds=event["duration"]),
+        )
+        for event in selected
+    ]
+    expected = merge_spans(subtract_periods(merge_spans(expected, 0), periods), 0)
+    assert spans == expected
+
+
+def test_workers_agree(server):
+    _, parallel = _backfilled(server, max_workers=3)
+    server.api.delete_bucket("backfilled")
+    _, serial = _backfilled(server, max_workers=1)
+    assert parallel == serial
+    assert len(parallel) > 0
+
+
+def test_no_window_bucket():
+    with StandInServer() as server:
+        client = SharedActivityWatchClient(host=server.host, port=server.port)
+        result = backfill(client, RULES, BEGIN, END, bucket_id="backfilled")
+        client.close()
+    assert result.window_events == 0
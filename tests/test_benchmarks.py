@@ -0,0 +1,49 @@
+import json
+
+from benchmarks import run
+from benchmarks.synthetic import WINDOW_EVENTS_PER_DAY, dataset
+
+
+def test_dataset_covers_days():
+    data = dataset(3)
+    assert len(data.window_events) == 3 * WINDOW_EVENTS_PER_DAY
+    assert data.begin < data.end
+    assert all(
+        data.begin.isoformat() <= event["timestamp"] < data.end.isoformat()
+        for events in data
+        for event in events
+    )
+    assert dataset(3) == data
+
+
+def test_run_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+    assert run.main(
+        ["--days", "1", "--repeat", "2", "-k", "get_events", "-k", "config.*", "-o", str(output)]
+    ) == 0
+    results = json.loads(output.read_text())
+    assert results["days"] == 1
+    assert set(results["benchmarks"]) == {
+        "get_events",
+        "config.add_projects",
+        "config.add_project",
+        "config.reload",
+        "config.contains",
+    }
+    for result in results["benchmarks"].values():
+        assert len(result["times"]) == 2
+        assert result["seconds"] == min(result["times"])
+
+
+def test_compare(tmp_path):
+    before = {"days": 1, "benchmarks": {"a": {"seconds": 1.0}, "b": {"seconds": 1.0}}}
+    after = {
+        "days": 1,
+        "benchmarks": {"a": {"seconds": 1.05}, "b": {"seconds": 1.5}, "c": {"seconds": 1.0}},
+    }
+    assert run.compare(before, after) == ["b"]
+    paths = [tmp_path / "before.json", tmp_path / "after.json"]
+    for path, results in zip(paths, (before, after)):
+        path.write_text(json.dumps(results))
+    assert run.main(["--compare", *map(str, paths)]) == 1
+    assert run.main(["--compare", str(paths[0]), str(paths[0])]) == 0
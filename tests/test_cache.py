@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+from aw_watcher_project.cache import QueryCache, cached_query
+from aw_watcher_project.events.project import ProjectEvents
+from benchmarks.synthetic import project_event_data
+from tests.fake_client import FakeQueryClient
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 1, 11, tzinfo=UTC)
+NOW = datetime.datetime(2019, 1, 10, 12, tzinfo=UTC)
+
+
+@pytest.fixture
+def cache(tmp_path) -> QueryCache:
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def client() -> FakeQueryClient:
+    return FakeQueryClient(project_event_data(300, projects=["a", "b"]))
+
+
+def _uncached(client: FakeQueryClient) -> list:
+    return [
+        event for event in client.events
+        if datetime.datetime.fromisoformat(event["timestamp"]) < END
+    ]
+
+
+def test_only_open_days_are_requeried(cache, client):
+    first = cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    assert len(client.queried[-1]) == 10
+    second = cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    assert client.queried[-1] == [
+        (datetime.datetime(2019, 1, 10, tzinfo=UTC), END)
+    ]
+    assert first == second
+
+
+def test_matches_single_query_totals(cache, client):
+    cached = ProjectEvents(cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1))
+    expect = ProjectEvents(_uncached(client))
+    assert len(cached) == len(expect)
+    assert cached.duration_by_project() == pytest.approx(expect.duration_by_project())
+
+
+def test_last_updated_invalidates_later_days(cache, client):
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    bucket = client.buckets["aw-watcher-project-selected_host"]
+    bucket["last_updated"] = "2019-01-05T12:00:00+00:00"
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    bucket["last_updated"] = "2019-01-10T12:00:00+00:00"
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    # Jan 5 was cached while its data may still have been arriving
+    assert client.queried[-1][0][0] == datetime.datetime(2019, 1, 5, tzinfo=UTC)
+    assert len(client.queried[-1]) == 6
+
+
+def test_recreated_bucket_clears_cache(cache, client):
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    bucket = client.buckets["aw-watcher-project-selected_host"]
+    bucket["created"] = "2019-02-01T00:00:00+00:00"
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    assert len(client.queried[-1]) == 10
+
+
+def test_evicts_least_recently_used(tmp_path, client):
+    cache = QueryCache(tmp_path / "cache.sqlite", max_bytes=5000)
+    cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1)
+    assert 0 < cache.size <= 5000
+    cache.close()
+
+
+def test_event_spanning_days_is_stitched(cache):
+    event = {
+        "id": 1,
+        "timestamp": "2019-01-01T20:00:00+00:00",
+        "duration": 2 * 86400.0,
+        "data": {"project": "a"},
+    }
+    client = FakeQueryClient([event])
+    assert cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1) == [event]
+    assert cached_query(client, "query", BEGIN, END, cache, now=NOW, max_workers=1) == [event]
+
+
+def test_get_many(cache):
+    periods = [
+        (BEGIN + datetime.timedelta(days=i), BEGIN + datetime.timedelta(days=i + 1))
+        for i in range(3)
+    ]
+    cache.put("query", periods[0], [1])
+    cache.put("query", periods[2], [])
+    assert cache.get_many("query", periods) == [[1], None, []]
+    assert cache.get_many("other", periods) == [None] * 3
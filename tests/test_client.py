@@ -0,0 +1,82 @@
+import datetime
+import multiprocessing
+import sys
+
+import pytest
+
+from aw_watcher_project import client as aw_client
+from aw_watcher_project.client import SharedActivityWatchClient
+from benchmarks.aw_server import StandInServer
+
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2019, 1, 2, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer() as server:
+        server.create_bucket("aw-watcher-project-selected_host", "project-selection")
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    client = SharedActivityWatchClient(host=server.host, port=server.port)
+    yield client
+    client.close()
+
+
+def test_reuses_connection(server, client):
+    start = server.connections
+    for _ in range(5):
+        client.query("RETURN = 1;", [(BEGIN, END)])
+    assert server.connections - start == 1
+
+
+def test_caches_buckets(server, client):
+    start = server.requests
+    buckets = client.get_buckets()
+    assert "aw-watcher-project-selected_host" in buckets
+    assert client.get_buckets() is buckets
+    assert server.requests - start == 1
+
+    client.invalidate_buckets()
+    client.get_buckets()
+    assert server.requests - start == 2
+
+
+def test_buckets_expire(server, client):
+    client.buckets_ttl = 0
+    start = server.requests
+    client.get_buckets()
+    client.get_buckets()
+    assert server.requests - start == 2
+
+
+def test_create_bucket_invalidates(server, client):
+    client.get_buckets()
+    client.create_bucket("test-bucket", "test")
+    assert "test-bucket" in client.get_buckets()
+    client.delete_bucket("test-bucket", force=True)
+    assert "test-bucket" not in client.get_buckets()
+
+
+def test_get_client_is_shared():
+    assert aw_client.get_client() is aw_client.get_client()
+    assert aw_client.get_client(testing=True) is not aw_client.get_client()
+
+
+def _query_in_child(host: str, port: int):
+    client = SharedActivityWatchClient(host=host, port=port)
+    if client.query("RETURN = 1;", [(BEGIN, END)]) != [1]:
+        sys.exit(1)
+
+
+def test_clients_in_several_processes(server, client):
+    # aw-client exits a process whose client name is locked by another one
+    context = multiprocessing.get_context("fork")
+    process = context.Process(target=_query_in_child, args=(server.host, server.port))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert client.client_name == aw_client.DEFAULT_CLIENT_NAME
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+
+import pytest
+
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.exc import CannotAddProjectException, CannotRemoveProjectException
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    return tmp_path / "config" / "config.yml"
+
+
+@pytest.fixture
+def config(config_path) -> ProjectWatcherConfig:
+    return ProjectWatcherConfig(config_path)
+
+
+def _count_saves(monkeypatch, config):
+    saves = []
+    save = config.save
+    monkeypatch.setattr(config, "save", lambda: saves.append(1) or save())
+    return saves
+
+
+def test_add_and_remove(config, config_path):
+    config.add_project("a")
+    config.add_project("b")
+    config.remove_project("a")
+    assert config.projects == ["b"]
+    assert "b" in config and "a" not in config
+    assert ProjectWatcherConfig(config_path).projects == ["b"]
+    with pytest.raises(CannotAddProjectException):
+        config.add_project("b")
+    with pytest.raises(CannotRemoveProjectException):
+        config.remove_project("a")
+
+
+def test_bulk_changes_save_once(config, config_path, monkeypatch):
+    saves = _count_saves(monkeypatch, config)
+    assert config.add_projects(["a", "b", "a", "c"]) == ["a", "b", "c"]
+    assert config.add_projects(["c", "d"]) == ["d"]
+    assert config.remove_projects(["b", "x"]) == ["b"]
+    assert len(saves) == 3
+    with config.batch():
+        config.add_project("e")
+        config.remove_project("a")
+        config.add_projects(["f"])
+    assert len(saves) == 4
+    assert ProjectWatcherConfig(config_path).projects == ["c", "d", "e", "f"]
+
+
+def test_no_changes_no_save(config, monkeypatch):
+    config.add_projects(["a"])
+    saves = _count_saves(monkeypatch, config)
+    config.add_projects(["a"])
+    config.remove_projects(["b"])
+    assert saves == []
+
+
+def test_save_replaces_file_atomically(config, config_path):
+    config.add_projects(f"project-{i}" for i in range(100))
+    os.chmod(config_path, 0o640)
+    config.add_project("another")
+    # No temporary files are left next to the config and its lock file
+    assert sorted(os.listdir(config_path.parent)) == [".config.yml.lock", "config.yml"]
+    assert config_path.stat().st_mode & 0o777 == 0o640
+
+
+def test_reloads_changes_from_other_processes(config, config_path):
+    config.add_projects(["a", "b"])
+    other = ProjectWatcherConfig(config_path)
+    other.add_project("c")
+
+    assert config.reload_if_changed()
+    assert config.projects == ["a", "b", "c"]
+    assert not config.reload_if_changed()
+
+    # Changes start from the latest file rather than overwriting it
+    other.remove_project("a")
+    config.add_project("d")
+    assert ProjectWatcherConfig(config_path).projects == ["b", "c", "d"]
+
+
+def test_same_size_replace_is_noticed(config, config_path):
+    config.add_projects(["a", "b"])
+    other = ProjectWatcherConfig(config_path)
+    with other.batch():
+        other.remove_project("b")
+        other.add_project("c")
+    # Same size, and possibly within the same mtime tick
+    os.utime(config_path, ns=(config._file_state[1], config._file_state[1]))
+    assert config.reload_if_changed()
+    assert config.projects == ["a", "c"]
+
+
+def _add_projects(config_path, worker: int):
+    config = ProjectWatcherConfig(config_path)
+    for i in range(20):
+        config.add_project(f"{worker}-{i}")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the config lock needs fcntl")
+def test_concurrent_processes_keep_all_projects(config, config_path):
+    config.add_project("first")
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_add_projects, args=(config_path, worker)) for worker in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert len(ProjectWatcherConfig(config_path)) == 61
@@ -0,0 +1,153 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from aw_watcher_project import ipc
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.daemon import ProjectWatcherDaemon
+from aw_watcher_project.exc import (
+    DaemonAlreadyRunningException,
+    DaemonCommandException,
+    DaemonNotRunningException,
+)
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from aw_watcher_project.metrics import REGISTRY, TextfileWriter
+from tests.fake_client import FakeHeartbeatClient
+
+
+@pytest.fixture
+def client() -> FakeHeartbeatClient:
+    return FakeHeartbeatClient()
+
+
+@pytest.fixture
+def config(tmp_path) -> ProjectWatcherConfig:
+    config = ProjectWatcherConfig(tmp_path / "config.yml")
+    config.add_projects(["a", "b"])
+    return config
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    # Unix socket paths are limited to about 100 characters
+    return tmp_path / "d.sock"
+
+
+@pytest.fixture
+def daemon(client, config, socket_path):
+    worker = HeartbeatWorker(client, "bucket", interval=10)
+    daemon = ProjectWatcherDaemon(config, worker, socket_path)
+    daemon.start()
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join()
+
+
+def test_select_and_clear(daemon, client, socket_path):
+    assert ipc.select("a", socket_path=socket_path)["project"] == "a"
+    client.wait_for("a")
+    assert ipc.status(socket_path)["project"] == "a"
+    ipc.select(None, socket_path=socket_path)
+    assert ipc.status(socket_path)["project"] is None
+
+
+def test_unknown_project(daemon, config, socket_path):
+    with pytest.raises(DaemonCommandException):
+        ipc.select("c", socket_path=socket_path)
+    ipc.select("c", add=True, socket_path=socket_path)
+    assert "c" in config
+    assert ipc.list_projects(socket_path)["projects"] == ["a", "b", "c"]
+
+
+def test_unknown_command(daemon, socket_path):
+    with pytest.raises(DaemonCommandException):
+        ipc.send_command("nope", socket_path)
+
+
+def test_requests_which_are_not_objects(daemon, socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        f = sock.makefile("rwb")
+        for request in (b"[]\n", b'"x"\n', b"1\n", b"{\n"):
+            f.write(request)
+            f.flush()
+            response = json.loads(f.readline())
+            assert response["ok"] is False
+            assert response["error"].startswith("invalid request")
+    # The daemon keeps serving
+    assert ipc.status(socket_path)["project"] is None
+
+
+def test_select_latency(daemon, socket_path):
+    start = time.perf_counter()
+    for i in range(100):
+        ipc.select("ab"[i % 2], socket_path=socket_path)
+    assert (time.perf_counter() - start) / 100 < 0.01
+
+
+def test_shutdown_sends_closing_heartbeat(client, config, socket_path):
+    daemon = ProjectWatcherDaemon(
+        config, HeartbeatWorker(client, "bucket", interval=10), socket_path
+    )
+    daemon.start()
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    ipc.select("a", socket_path=socket_path)
+    client.wait_for("a")
+    daemon.shutdown()
+    thread.join()
+    assert [hb[1] for hb in client.heartbeats] == ["a", "a"]
+    assert not socket_path.exists()
+    with pytest.raises(DaemonNotRunningException):
+        ipc.status(socket_path)
+
+
+def test_one_daemon_per_socket(daemon, client, config, socket_path):
+    other = ProjectWatcherDaemon(
+        config, HeartbeatWorker(client, "bucket", interval=10), socket_path
+    )
+    with pytest.raises(DaemonAlreadyRunningException):
+        other.start()
+
+
+def test_replaces_stale_socket(client, config, socket_path):
+    socket_path.write_text("")
+    daemon = ProjectWatcherDaemon(
+        config, HeartbeatWorker(client, "bucket", interval=10), socket_path
+    )
+    daemon.start()
+    daemon._close()
+
+
+def test_metrics(client, config, socket_path, tmp_path):
+    metrics_file = tmp_path / "metrics.prom"
+    daemon = ProjectWatcherDaemon(
+        config,
+        HeartbeatWorker(client, "bucket", interval=10),
+        socket_path,
+        metrics=TextfileWriter(metrics_file, interval=60),
+    )
+    daemon.start()
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    sent = _heartbeats_sent()
+    ipc.select("a", socket_path=socket_path)
+    client.wait_for("a")
+    snapshot = ipc.metrics(socket_path)["metrics"]
+    assert _heartbeats_sent(snapshot) == sent + 1
+    daemon.shutdown()
+    thread.join()
+    # Written on shutdown, with the closing heartbeat
+    assert 'aw_watcher_project_heartbeats_total{result="sent"}' in metrics_file.read_text()
+    assert _heartbeats_sent() == sent + 2
+
+
+def _heartbeats_sent(snapshot=None) -> float:
+    snapshot = snapshot or REGISTRY.snapshot()
+    samples = snapshot["aw_watcher_project_heartbeats_total"]["samples"]
+    return sum(s["value"] for s in samples if s["labels"] == {"result": "sent"})
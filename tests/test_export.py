@@ -0,0 +1,122 @@
+import csv
+import datetime
+import importlib.util
+import io
+import json
+from collections import defaultdict
+
+import pytest
+
+from aw_watcher_project import export, get_activity, get_time_spent
+from aw_watcher_project.exc import ExportException
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import dataset
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 1, 5, tzinfo=UTC)
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer() as server:
+        server.load(dataset(4, projects=["a", "b", "c"]))
+        yield server
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    client = server.client()
+    for module in (get_time_spent, get_activity, export):
+        monkeypatch.setattr(module, "get_client", lambda: client)
+    return client
+
+
+def _totals(rows) -> dict:
+    totals = defaultdict(float)
+    for row in rows:
+        totals[row["project"]] += float(row["duration"])
+    return dict(totals)
+
+
+def test_csv_matches_events(client, tmp_path):
+    path = tmp_path / "events.csv"
+    rows = export.export_events(path, begin=BEGIN, end=END, chunk="day", use_cache=False)
+    events = get_time_spent.get_events(BEGIN, END, use_cache=False)
+    with open(path, newline="") as f:
+        exported = list(csv.DictReader(f))
+    assert rows == len(exported) == len(events)
+    assert list(exported[0]) == list(export.COLUMNS)
+    assert _totals(exported) == pytest.approx(events.duration_by_project())
+    first = events[0]
+    assert exported[0]["start"] == first.time.isoformat()
+    assert exported[0]["end"] == first.end_time.isoformat()
+    assert exported[0]["day"] == first.day.isoformat()
+
+
+def test_windows_match_activity(client):
+    output = io.StringIO()
+    export.export_events(
+        output, format="ndjson", begin=BEGIN, end=END, windows=True, use_cache=False
+    )
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert list(rows[0]) == list(export.COLUMNS + export.WINDOW_COLUMNS)
+    events = get_time_spent.get_events(BEGIN, END, use_cache=False)
+    # Split events still add up to the events
+    assert _totals(rows) == pytest.approx(events.duration_by_project())
+    # and the parts with a window to the window activity of each project
+    activity = get_activity.get_activity_for_projects(None, BEGIN, END, use_cache=False)
+    with_window = _totals(row for row in rows if row["app"] is not None)
+    assert with_window == pytest.approx(
+        {project: sum(e.duration for e in a.events) for project, a in activity.items()}
+    )
+    assert all(row["start"] <= row["end"] for row in rows)
+    assert all(row["title"].startswith(row["app"]) for row in rows if row["app"])
+
+
+def test_cached_and_flooded(client, monkeypatch, tmp_path):
+    from aw_watcher_project.cache import QueryCache
+
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    for module in (get_time_spent, export):
+        monkeypatch.setattr(module, "get_default_cache", lambda: cache)
+    try:
+        output = io.StringIO()
+        rows = export.export_events(
+            output, format="csv", begin=BEGIN, end=END, flood_time=300, windows=True
+        )
+    finally:
+        cache.close()
+    events = get_time_spent.get_events(BEGIN, END, flood_time=300, use_cache=False)
+    exported = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert rows == len(exported) > len(events)
+    assert _totals(exported) == pytest.approx(events.duration_by_project())
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="needs pyarrow")
+def test_parquet(client, tmp_path):
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "events.parquet"
+    rows = export.export_events(
+        path, begin=BEGIN, end=END, windows=True, use_cache=False, row_group_size=1000
+    )
+    file = pq.ParquetFile(path)
+    assert file.metadata.num_rows == rows
+    assert file.metadata.num_row_groups == -(-rows // 1000)
+    assert file.schema_arrow.names == list(export.COLUMNS + export.WINDOW_COLUMNS)
+
+
+@pytest.mark.skipif(HAS_PYARROW, reason="pyarrow is installed")
+def test_parquet_needs_pyarrow(tmp_path):
+    with pytest.raises(ExportException, match="pyarrow"):
+        export.export_events(tmp_path / "events.parquet", begin=BEGIN, end=END)
+
+
+def test_format_errors(tmp_path):
+    with pytest.raises(ExportException):
+        export.export_events(tmp_path / "events.txt", begin=BEGIN, end=END)
+    with pytest.raises(ExportException):
+        export.export_events(io.StringIO(), format="parquet", begin=BEGIN, end=END)
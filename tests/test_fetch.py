@@ -0,0 +1,23 @@
+import datetime
+
+import pytest
+
+from aw_watcher_project.fetch import query_periods
+from aw_watcher_project.periods import split_time_range
+from benchmarks.synthetic import project_event_data
+from tests.fake_client import FakeQueryClient
+
+UTC = datetime.timezone.utc
+PERIODS = split_time_range(
+    datetime.datetime(2019, 1, 1, tzinfo=UTC), datetime.datetime(2019, 2, 1, tzinfo=UTC)
+)
+
+
+@pytest.mark.parametrize("max_workers", [1, 4, 7, 100])
+def test_results_in_period_order(max_workers):
+    client = FakeQueryClient(project_event_data(1000))
+    expect = client.query("query", PERIODS)
+    client.queried.clear()
+    assert query_periods(client, "query", PERIODS, max_workers=max_workers) == expect
+    assert len(client.queried) == min(max_workers, len(PERIODS))
+    assert sorted(period for periods in client.queried for period in periods) == PERIODS
@@ -0,0 +1,94 @@
+import datetime
+from typing import List, Tuple
+
+from aw_core import Event as AWEvent
+from aw_transform import flood as aw_flood
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from aw_watcher_project.events.flood import flood
+from aw_watcher_project.events.project import ProjectEvent, ProjectEventData
+from benchmarks.synthetic import project_event_data
+
+BEGIN = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+Row = Tuple[object, datetime.datetime, float, str]
+
+
+def _rows(events: List[ProjectEvent]) -> List[Row]:
+    return [(e.id, e.time, e.duration, e.project) for e in events]
+
+
+def _aw_rows(events: List[ProjectEventData], pulsetime: float) -> List[Row]:
+    flooded = aw_flood([AWEvent(**e) for e in events], pulsetime=pulsetime)
+    return _rows([ProjectEvent.from_aw_event(e) for e in flooded])
+
+
+def _assert_same(events: List[ProjectEventData], pulsetime: float):
+    rows = _rows(flood([ProjectEvent(e) for e in events], pulsetime=pulsetime))
+    expected = _aw_rows(events, pulsetime)
+    assert rows == expected
+    assert [time.utcoffset() for _, time, _, _ in rows] == [
+        time.utcoffset() for _, time, _, _ in expected
+    ]
+
+
+@st.composite
+def project_events(draw) -> List[ProjectEventData]:
+    n = draw(st.integers(min_value=0, max_value=30))
+    offsets = st.sampled_from([0, 3600, -5 * 3600, 5 * 3600 + 1800])
+    events = []
+    for i in range(n):
+        start = BEGIN + datetime.timedelta(
+            microseconds=draw(st.integers(min_value=0, max_value=600_000_000))
+        )
+        tz = datetime.timezone(datetime.timedelta(seconds=draw(offsets)))
+        events.append(
+            ProjectEventData(
+                id=i,
+                timestamp=start.astimezone(tz).isoformat(),
+                duration=draw(
+                    st.one_of(
+                        st.floats(min_value=0, max_value=120, allow_nan=False),
+                        st.integers(min_value=0, max_value=120).map(float),
+                    )
+                ),
+                data={"project": draw(st.sampled_from(["a", "b", "c"]))},
+            )
+        )
+    return events
+
+
+@settings(max_examples=500, deadline=None)
+@given(events=project_events(), pulsetime=st.sampled_from([0, 0.05, 1, 5, 60, 600]))
+def test_matches_aw_transform(events, pulsetime):
+    _assert_same(events, pulsetime)
+
+
+@settings(max_examples=100, deadline=None)
+@given(
+    events=project_events(),
+    gaps=st.lists(st.integers(min_value=-200_000, max_value=5_000_000), max_size=30),
+)
+def test_matches_aw_transform_contiguous(events, gaps):
+    # Events following each other closely, as heartbeats produce them
+    time = BEGIN
+    for event, gap in zip(events, gaps):
+        time += datetime.timedelta(microseconds=gap)
+        event["timestamp"] = time.isoformat()
+        time += datetime.timedelta(seconds=event["duration"])
+    _assert_same(events, 5)
+
+
+def test_synthetic_events():
+    _assert_same(project_event_data(2000), 600)
+
+
+def test_naive_timestamps():
+    events = [
+        ProjectEventData(id=0, timestamp="2021-01-01T00:00:00", duration=10, data={"project": "a"}),
+        ProjectEventData(id=1, timestamp="2021-01-01T00:00:12", duration=10, data={"project": "a"}),
+    ]
+    _assert_same(events, 5)
+    (event,) = flood([ProjectEvent(e) for e in events], 5)
+    assert event.duration == 22
@@ -0,0 +1,110 @@
+import datetime
+import json
+
+import pytest
+
+from aw_watcher_project import get_activity
+from aw_watcher_project.aw_time import local_time
+from aw_watcher_project.cache import QueryCache
+from aw_watcher_project.events.window import WindowEvent
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import afk_event_data, project_event_data, window_event_data
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 1, 8, tzinfo=UTC)
+PROJECTS = ["a", 'quoted "b"', "c"]
+
+
+def _single_project_query(project: str) -> str:
+    # Query previously built per project by get_activity
+    return f"""
+afk_events = query_bucket(find_bucket("aw-watcher-afk_"));
+project_events = query_bucket(find_bucket("aw-watcher-project-selected_"));
+project_events = filter_keyvals(project_events, "project", [{json.dumps(project)}]);
+project_events = filter_period_intersect(project_events, filter_keyvals(afk_events, "status", ["not-afk"]));
+aw_watcher_window_events = query_bucket(find_bucket("aw-watcher-window_"));
+aw_watcher_window_events = filter_period_intersect(aw_watcher_window_events, project_events);
+RETURN = {{"aw_watcher_window_events": aw_watcher_window_events}};
+"""
+
+
+@pytest.fixture(scope="module")
+def server():
+    project_events = project_event_data(200, projects=PROJECTS, start=BEGIN)
+    with StandInServer() as server:
+        server.create_bucket(
+            "aw-watcher-project-selected_host",
+            "project-selection",
+            events=project_events,
+        )
+        server.create_bucket(
+            "aw-watcher-afk_host", "afkstatus", events=afk_event_data(project_events)
+        )
+        server.create_bucket(
+            "aw-watcher-window_host",
+            "currentwindow",
+            events=window_event_data(2000, start=BEGIN),
+        )
+        yield server
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    client = server.client()
+    monkeypatch.setattr(get_activity, "get_client", lambda: client)
+    return client
+
+
+def test_matches_per_project_queries(server, client):
+    start = server.requests
+    activity = get_activity.get_activity_for_projects(
+        PROJECTS, BEGIN, END, use_cache=False
+    )
+    # One query per bucket: projects, AFK and windows
+    assert server.requests - start == 3
+    assert list(activity) == PROJECTS
+    for project in PROJECTS:
+        expect = client.query(_single_project_query(project), [(BEGIN, END)])[0]
+        events = expect["aw_watcher_window_events"]
+        assert len(events) > 0
+        assert [event.data for event in activity[project]] == [
+            WindowEvent(event).data for event in events
+        ]
+        assert list(activity[project].buckets) == ["aw_watcher_window_events"]
+
+
+def test_all_projects(client):
+    activity = get_activity.get_activity_for_projects(
+        begin=BEGIN, end=END, use_cache=False
+    )
+    assert sorted(activity) == sorted(PROJECTS)
+
+
+def test_naive_times_are_local(client, tmp_path, monkeypatch):
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(get_activity, "get_default_cache", lambda: cache)
+    begin = BEGIN.replace(tzinfo=None)
+    end = END.replace(tzinfo=None)
+    activity = get_activity.get_activity_for_projects(begin=begin, end=end)
+    local = get_activity.get_activity_for_projects(
+        begin=local_time(begin), end=local_time(end), use_cache=False
+    )
+    assert {project: len(events) for project, events in activity.items()} == {
+        project: len(events) for project, events in local.items()
+    }
+    assert get_activity.get_project_names(begin, end) == list(local)
+    cache.close()
+
+
+def test_window_event_keeps_data():
+    data = {
+        "id": 1,
+        "timestamp": BEGIN.isoformat(),
+        "duration": 1.5,
+        "data": {"url": "https://example.com", "title": "Example", "audible": False},
+    }
+    event = WindowEvent(data)
+    assert (event.app, event.title) == ("", "Example")
+    assert event.data == data
+    assert event.data["data"] is not data["data"]
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from aw_watcher_project import get_time_spent
+from aw_watcher_project.aw_time import local_time
+from aw_watcher_project.cache import QueryCache
+from aw_watcher_project.events.project import (
+    duration_by_day_by_project_from_batches,
+    duration_by_project_from_batches,
+)
+from benchmarks.synthetic import project_event_data
+from tests.fake_client import FakeQueryClient
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 3, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path) -> FakeQueryClient:
+    client = FakeQueryClient(project_event_data(2000, projects=["a", "b", "c"]))
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(get_time_spent, "get_client", lambda: client)
+    monkeypatch.setattr(get_time_spent, "get_default_cache", lambda: cache)
+    yield client
+    cache.close()
+
+
+@pytest.mark.parametrize("chunk", ["day", "week", "month"])
+@pytest.mark.parametrize("use_cache", [True, False])
+@pytest.mark.parametrize("flood_time", [None, 300])
+def test_streamed_totals_match(client, chunk, use_cache, flood_time):
+    events = get_time_spent.get_events(
+        BEGIN, END, flood_time=flood_time, use_cache=use_cache
+    )
+    batches = list(
+        get_time_spent.iter_events(
+            BEGIN, END, flood_time=flood_time, use_cache=use_cache, chunk=chunk
+        )
+    )
+    assert len(batches) > 1
+    assert sum(len(batch) for batch in batches) == len(events)
+    assert duration_by_project_from_batches(batches) == pytest.approx(
+        events.duration_by_project()
+    )
+    by_day = duration_by_day_by_project_from_batches(batches)
+    expect = events.duration_by_day_by_project()
+    assert by_day.keys() == expect.keys()
+    for day, durations in expect.items():
+        assert by_day[day] == pytest.approx(durations)
+
+
+def test_naive_times_are_local(client):
+    begin = BEGIN.replace(tzinfo=None)
+    end = END.replace(tzinfo=None)
+    for use_cache in (True, False):
+        local = get_time_spent.get_events(local_time(begin), local_time(end), use_cache=use_cache)
+        events = get_time_spent.get_events(begin, end, use_cache=use_cache)
+        assert events.duration_by_project() == pytest.approx(local.duration_by_project())
+        batches = list(get_time_spent.iter_events(begin, end, use_cache=use_cache))
+        assert duration_by_project_from_batches(batches) == pytest.approx(
+            local.duration_by_project()
+        )
@@ -1,3 +1,81 @@
-# TODO [#4]: add real tests
-def test_dummy():
-    pass
+import os
+import signal
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+c = pytest.importorskip("PySide6.QtCore")
+g = pytest.importorskip("PySide6.QtGui")
+
+from aw_watcher_project import gui
+from aw_watcher_project.config import ProjectWatcherConfig
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from tests.fake_client import FakeHeartbeatClient
+
+
+class _ExercisedGUI(gui.ProjectWatcherGUI):
+    """
+    Runs :meth:`exercise` once the event loop started, then quits
+    """
+
+    def _wake_on_signals(self):
+        super()._wake_on_signals()
+        c.QTimer.singleShot(0, self._run_exercise)
+
+    def _run_exercise(self):
+        try:
+            self.exercise()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.quit()
+
+    def exercise(self):
+        # Every configured project was rendered when the GUI started
+        misses = self.icons.misses
+        theme = gui.current_theme()
+        self.results = {}
+        for project in ("alpha", "beta", "alpha"):
+            self._select_project(project)
+            self.results[project] = (
+                self.tray.icon().cacheKey(), self.icons.get(project[:3], theme).cacheKey()
+            )
+        self._set_no_project()
+        self.results["N/A"] = (
+            self.tray.icon().cacheKey(), self.icons.get("N/A", theme).cacheKey()
+        )
+        self.results["misses"] = self.icons.misses - misses
+        # A project added later is rendered once, on its first selection
+        self.add_project("delta")
+        self._select_project("delta")
+        self._select_project("delta")
+        self.results["added_misses"] = self.icons.misses - misses
+
+
+@pytest.fixture
+def app_instance():
+    if g.QGuiApplication.instance() is not None:
+        pytest.skip("the GUI creates its own QApplication")
+    yield
+    signal.set_wakeup_fd(-1)
+
+
+def test_selection_uses_cached_icons(app_instance, tmp_path, monkeypatch):
+    config = ProjectWatcherConfig(tmp_path / "config.yml")
+    config.add_projects(["alpha", "beta", "client/gamma"])
+    client = FakeHeartbeatClient()
+    monkeypatch.setattr(
+        gui,
+        "create_heartbeat_worker",
+        lambda interval, aw_testing=False: HeartbeatWorker(client, "bucket", interval=60),
+    )
+    window = _ExercisedGUI(config)
+    assert getattr(window, "error", None) is None
+    results = window.results
+    for project in ("alpha", "beta", "N/A"):
+        shown, cached = results[project]
+        assert shown == cached
+    assert results["alpha"][0] != results["beta"][0]
+    assert results["misses"] == 0
+    assert results["added_misses"] == 1
+    client.wait_for("delta")
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from tests.fake_client import FakeHeartbeatClient
+
+# Well below the interval, so a switch must not wait for the next pulse
+MAX_SWITCH_LATENCY = 0.5
+
+
+@pytest.fixture
+def client() -> FakeHeartbeatClient:
+    return FakeHeartbeatClient()
+
+
+@pytest.fixture
+def worker(client):
+    worker = HeartbeatWorker(client, "bucket", interval=10)
+    yield worker
+    worker.stop(timeout=None)
+
+
+def test_first_selection_latency(client, worker):
+    start = time.monotonic()
+    worker.select("a")
+    assert client.wait_for("a") - start < MAX_SWITCH_LATENCY
+
+
+def test_switch_latency(client, worker):
+    worker.select("a")
+    client.wait_for("a")
+    start = time.monotonic()
+    worker.select("b")
+    assert client.wait_for("b") - start < MAX_SWITCH_LATENCY
+    # The previous project is closed at the switch time
+    projects = [hb[1] for hb in client.heartbeats]
+    assert projects == ["a", "a", "b"]
+    assert client.heartbeats[1][2] == client.heartbeats[2][2]
+
+
+def test_no_project_closes_previous(client, worker):
+    worker.select("a")
+    client.wait_for("a")
+    worker.select(None)
+    worker.select("b")
+    client.wait_for("b")
+    assert [hb[1] for hb in client.heartbeats] == ["a", "a", "b"]
+
+
+def test_pulses_on_interval(client):
+    worker = HeartbeatWorker(client, "bucket", interval=0.05)
+    try:
+        worker.select("a")
+        time.sleep(0.3)
+    finally:
+        worker.stop(timeout=None)
+    assert len(client.heartbeats) >= 4
+    assert all(hb[1] == "a" for hb in client.heartbeats)
+
+
+def test_stop_does_not_block():
+    client = FakeHeartbeatClient(delay=1)
+    worker = HeartbeatWorker(client, "bucket", interval=10)
+    try:
+        worker.select("a")
+        # Let the first heartbeat get under way
+        time.sleep(0.1)
+        start = time.monotonic()
+        worker.stop()
+        worker.select(None)
+        assert time.monotonic() - start < 0.1
+    finally:
+        worker.stop(timeout=None)
+    assert [hb[1] for hb in client.heartbeats] == ["a", "a"]
+
+
+def test_restart_after_stop(client, worker):
+    worker.select("a")
+    client.wait_for("a")
+    worker.stop(timeout=None)
+    assert not worker.running
+    worker.select("b")
+    client.wait_for("b")
+    assert worker.running
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+g = pytest.importorskip("PySide6.QtGui")
+
+from aw_watcher_project.icons import IconCache, icon_label, render_text_icon
+
+
+@pytest.fixture(scope="module")
+def app():
+    return g.QGuiApplication.instance() or g.QGuiApplication([])
+
+
+def test_render_text_icon(app):
+    icon = render_text_icon("abc", 32)
+    assert not icon.isNull()
+    assert icon.availableSizes()[0].width() == 32
+
+
+def test_cache_reuses_icons():
+    rendered = []
+    cache = IconCache(render=lambda *key: rendered.append(key) or key)
+    assert cache.get("abc") is cache.get("abc")
+    assert cache.get("abc", theme="light") != cache.get("abc")
+    assert rendered == [("abc", cache.size, "dark"), ("abc", cache.size, "light")]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = IconCache(max_icons=2, render=lambda *key: key)
+    cache.prerender(["a", "b"])
+    cache.get("a")
+    cache.get("c")
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.get("a")
+    assert cache.misses == misses
+    cache.get("b")
+    assert cache.misses == misses + 1
+
+
+def test_icon_label():
+    assert icon_label("project") == "pro"
+    assert icon_label("N/A") == "N/A"
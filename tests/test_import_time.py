@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.import_time import ENTRY_POINTS, import_times
+
+# The CLI runs from login scripts, keep it well clear of the GUI stack
+MAX_IMPORT_SECONDS = 0.5
+GUI_AND_CLIENT_MODULES = ("PySide6", "aw_client", "aw_core", "numpy", "yaml", "requests")
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_import_time(module):
+    # Best of three to ride out a busy machine
+    total = min(import_times(module)[module][1] for _ in range(3))
+    assert total < MAX_IMPORT_SECONDS
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_does_not_import_gui_or_client(module):
+    imported = {name.split(".")[0] for name in import_times(module)}
+    assert imported.isdisjoint(GUI_AND_CLIENT_MODULES)
@@ -0,0 +1,143 @@
+import datetime
+from typing import List
+
+import numpy as np
+from aw_core import Event as AWEvent
+from aw_transform import filter_period_intersect, period_union
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from aw_watcher_project.buckets import get_not_afk_project_event_data
+from aw_watcher_project.aw_time import to_epoch_us
+from aw_watcher_project.intervals import Intervals
+from benchmarks.aw_server import PROJECT_EVENTS_QUERY, StandInServer
+from benchmarks.synthetic import afk_event_data, project_event_data
+
+BEGIN = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _json(events: List[AWEvent]) -> List[dict]:
+    return [event.to_json_dict() for event in events]
+
+
+@st.composite
+def event_data(draw, max_size: int = 20) -> List[dict]:
+    n = draw(st.integers(min_value=0, max_value=max_size))
+    events = []
+    for i in range(n):
+        start = BEGIN + datetime.timedelta(
+            milliseconds=draw(st.integers(min_value=0, max_value=100_000))
+        )
+        events.append(
+            AWEvent(
+                id=i,
+                timestamp=start,
+                duration=draw(st.integers(min_value=0, max_value=20_000)) / 1000,
+                data={"i": i},
+            ).to_json_dict()
+        )
+    return events
+
+
+@st.composite
+def disjoint_event_data(draw) -> List[dict]:
+    # Like the heartbeat buckets, which only touch or leave gaps
+    time = BEGIN
+    events = []
+    for i in range(draw(st.integers(min_value=0, max_value=30))):
+        time += datetime.timedelta(milliseconds=draw(st.integers(min_value=0, max_value=5000)))
+        duration = draw(st.integers(min_value=0, max_value=5000)) / 1000
+        events.append(AWEvent(id=i, timestamp=time, duration=duration, data={"i": i}).to_json_dict())
+        time += datetime.timedelta(seconds=duration)
+    return events
+
+
+def _intersect(events: List[dict], filter_events: List[dict]) -> List[dict]:
+    intervals = Intervals.from_event_data(events)
+    return intervals.intersect(Intervals.from_event_data(filter_events)).to_event_data(events)
+
+
+def _aw_intersect(events: List[dict], filter_events: List[dict]) -> List[dict]:
+    return _json(
+        filter_period_intersect(
+            [AWEvent(**e) for e in events], [AWEvent(**e) for e in filter_events]
+        )
+    )
+
+
+@settings(max_examples=500, deadline=None)
+@given(events=event_data(), filter_events=event_data())
+def test_intersect_matches_server(events, filter_events):
+    assert _intersect(events, filter_events) == _aw_intersect(events, filter_events)
+
+
+@settings(max_examples=200, deadline=None)
+@given(events=disjoint_event_data(), filter_events=disjoint_event_data())
+def test_intersect_disjoint_matches_server(events, filter_events):
+    assert _intersect(events, filter_events) == _aw_intersect(events, filter_events)
+
+
+@settings(max_examples=300, deadline=None)
+@given(events=event_data(), other=event_data())
+def test_union_matches_server(events, other):
+    union = Intervals.from_event_data(events).union(Intervals.from_event_data(other))
+    expected = period_union([AWEvent(**e) for e in events], [AWEvent(**e) for e in other])
+    assert [
+        (event["timestamp"], event["duration"]) for event in union.to_event_data(events + other)
+    ] == [(event["timestamp"], event["duration"]) for event in _json(expected)]
+
+
+@settings(max_examples=300, deadline=None)
+@given(events=event_data(), other=event_data())
+def test_difference(events, other):
+    intervals = Intervals.from_event_data(events)
+    other_intervals = Intervals.from_event_data(other)
+    difference = intervals.difference(other_intervals)
+    # Nothing left overlaps the subtracted time, and together with the
+    # overlap with it the original time is covered again
+    covered = other_intervals.union()
+    for start, end, i in zip(difference.starts, difference.ends, difference.index):
+        assert intervals.starts[intervals.index == i][0] <= start < end
+        assert end <= intervals.ends[intervals.index == i][0]
+        assert not ((covered.starts < end) & (covered.ends > start)).any()
+    original = intervals.union().duration
+    rest = difference.union().duration
+    overlap = intervals.union().intersect(covered).duration
+    assert abs(original - rest - overlap) < 1e-6
+
+
+def test_not_afk_project_events_match_server():
+    project_events = project_event_data(500, start=BEGIN)
+    begin, end = BEGIN, BEGIN + datetime.timedelta(days=30)
+    with StandInServer() as server:
+        server.create_bucket(
+            "aw-watcher-project-selected_host", "project-selection", events=project_events
+        )
+        server.create_bucket(
+            "aw-watcher-afk_host", "afkstatus", events=afk_event_data(project_events)
+        )
+        client = server.client()
+        expected = client.query(PROJECT_EVENTS_QUERY, [(begin, end)])[0]
+        events = get_not_afk_project_event_data(client, begin, end)
+    assert len(events) > 100
+    assert events == expected
+
+
+@settings(max_examples=300, deadline=None)
+@given(
+    events=event_data(),
+    points=st.lists(st.integers(min_value=0, max_value=130_000), max_size=10, unique=True),
+)
+def test_split(events, points):
+    intervals = Intervals.from_event_data(events)
+    cuts = np.array(sorted(points), dtype=np.int64) * 1000 + to_epoch_us(BEGIN)
+    split = intervals.split(cuts)
+    assert list(split.starts) == sorted(split.starts)
+    # Each interval is covered exactly by its parts, none of which crosses a cut
+    for start, end, i in zip(intervals.starts, intervals.ends, intervals.index):
+        parts = split.index == i
+        assert split.starts[parts].min() == start
+        assert split.ends[parts].max() == end
+        assert (split.ends[parts] - split.starts[parts]).sum() == end - start
+    for start, end in zip(split.starts, split.ends):
+        assert not ((cuts > start) & (cuts < end)).any()
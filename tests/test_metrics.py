@@ -0,0 +1,127 @@
+import json
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from aw_watcher_project import metrics
+from aw_watcher_project.__main__ import app
+from aw_watcher_project.events.project import AGGREGATION_SECONDS, ProjectEvents
+from aw_watcher_project.metrics import Registry, prometheus_text, timed, write_textfile
+from benchmarks.synthetic import project_event_data
+
+
+@pytest.fixture
+def registry() -> Registry:
+    return Registry()
+
+
+def _sample(registry: Registry, name: str, **labels) -> dict:
+    (sample,) = [
+        s for s in registry.snapshot()[name]["samples"] if s["labels"] == labels
+    ]
+    return sample
+
+
+def test_counter_and_gauge(registry):
+    counter = registry.counter("requests_total", "Requests", ("result",))
+    counter.labels("ok").inc()
+    counter.labels("ok").inc(2)
+    counter.labels("failed").inc()
+    gauge = registry.gauge("pending", "Pending")
+    gauge.set(5)
+    assert _sample(registry, "requests_total", result="ok")["value"] == 3
+    assert _sample(registry, "requests_total", result="failed")["value"] == 1
+    assert _sample(registry, "pending")["value"] == 5
+    with pytest.raises(ValueError):
+        counter.labels()
+
+
+def test_histogram(registry):
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    sample = _sample(registry, "latency_seconds")
+    assert sample["count"] == 4
+    assert sample["sum"] == pytest.approx(2.65)
+    assert sample["buckets"] == [(0.1, 2), (1, 3)]
+
+
+def test_histogram_threads(registry):
+    histogram = registry.histogram("latency_seconds", "Latency")
+
+    def observe():
+        for _ in range(10_000):
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _sample(registry, "latency_seconds")["count"] == 40_000
+
+
+def test_timed(registry):
+    histogram = registry.histogram("call_seconds", "Calls", ("function",))
+
+    @timed(histogram, "fail")
+    def fail():
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        fail()
+    with histogram.labels("block").time():
+        pass
+    assert _sample(registry, "call_seconds", function="fail")["count"] == 1
+    assert _sample(registry, "call_seconds", function="block")["count"] == 1
+
+
+def test_register_again(registry):
+    counter = registry.counter("requests_total", "Requests")
+    assert registry.counter("requests_total", "Requests") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
+
+
+def test_prometheus_text(registry, tmp_path):
+    registry.counter("requests_total", "Requests", ("path",)).labels('a "b"\n').inc()
+    registry.histogram("latency_seconds", "Latency", buckets=(0.5,)).observe(0.25)
+    expected = "\n".join([
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{path="a \\"b\\"\\n"} 1',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.5"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        "latency_seconds_sum 0.25",
+        "latency_seconds_count 1",
+        "",
+    ])
+    assert prometheus_text(registry.snapshot()) == expected
+    # Snapshots sent as JSON over the control socket format the same
+    assert prometheus_text(json.loads(json.dumps(registry.snapshot()))) == expected
+    path = tmp_path / "metrics" / "aw.prom"
+    write_textfile(path, registry)
+    assert path.read_text() == expected
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_aggregations_are_timed():
+    events = ProjectEvents(project_event_data(100))
+    value = AGGREGATION_SECONDS.labels("duration_by_project")
+    count = value.count
+    events.duration_by_project()
+    assert value.count == count + 1
+    assert "aw_watcher_project_parse_seconds" in metrics.REGISTRY.snapshot()
+
+
+def test_cli_metrics_file(tmp_path):
+    path = tmp_path / "report.prom"
+    result = CliRunner().invoke(
+        app, ["--metrics-file", str(path), "status", "--socket", str(tmp_path / "none.sock")]
+    )
+    # Written on exit even when the command fails
+    assert result.exit_code == 1
+    assert "# TYPE aw_watcher_project_parsed_events_total counter" in path.read_text()
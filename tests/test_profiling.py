@@ -0,0 +1,82 @@
+import os
+import pstats
+import signal
+import threading
+import time
+
+import pytest
+
+from aw_watcher_project.profiling import (
+    ProfileSession,
+    Profiler,
+    StackSampler,
+    install_dump_handler,
+)
+
+
+def _busy_in_thread(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(100))
+
+
+def _function_names(path) -> set:
+    return {name for _, _, name in pstats.Stats(str(path)).stats}
+
+
+def test_profiler_includes_threads(tmp_path):
+    profiler = Profiler(tmp_path, "test")
+    profiler.start()
+    thread = threading.Thread(target=_busy_in_thread, args=(0.05,), name="worker")
+    thread.start()
+    thread.join()
+    paths = profiler.stop()
+    assert all(path.parent == tmp_path for path in paths)
+    merged, *threads = paths
+    assert "_busy_in_thread" in _function_names(merged)
+    assert any("worker" in path.name for path in threads)
+    assert profiler.stop() == []
+
+
+def test_sampler():
+    sampler = StackSampler()
+    stop = threading.Event()
+
+    def waiting_in_thread():
+        stop.wait()
+
+    thread = threading.Thread(target=waiting_in_thread, name="waiter")
+    thread.start()
+    try:
+        sampler.sample()
+    finally:
+        stop.set()
+        thread.join()
+    (stack,) = [stack for stack in sampler.stacks if stack.startswith("waiter;")]
+    assert "waiting_in_thread (test_profiling.py:" in stack
+    assert ";wait (threading.py:" in stack
+    assert sampler.collapsed().endswith(" 1\n")
+
+
+def test_session(tmp_path):
+    session = ProfileSession(tmp_path, "test")
+    session.start()
+    _busy_in_thread(0.05)
+    paths = session.stop()
+    assert [path.suffix for path in paths] == [".pstats", ".collapsed"]
+    assert "_busy_in_thread" in paths[1].read_text()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="needs SIGUSR1")
+def test_dump_on_signal(tmp_path):
+    previous = signal.getsignal(signal.SIGUSR1)
+    try:
+        assert install_dump_handler(0.05, tmp_path, "dump")
+        os.kill(os.getpid(), signal.SIGUSR1)
+        deadline = time.monotonic() + 5
+        while not list(tmp_path.glob("dump-*.collapsed")) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        (path,) = tmp_path.glob("dump-*.collapsed")
+        assert "MainThread;" in path.read_text()
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
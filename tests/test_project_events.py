@@ -0,0 +1,58 @@
+import datetime
+
+from aw_core import Event as AWEvent
+
+from aw_watcher_project.events import project
+from aw_watcher_project.events.project import ProjectEvents
+from benchmarks.synthetic import project_event_data
+
+
+def _events() -> ProjectEvents:
+    data = project_event_data(500, projects=["a", "b", "c"])
+    # Mix of offsets and a naive timestamp, including a day boundary which differs by offset
+    data[0]["timestamp"] = "2019-01-01T23:30:00-05:00"
+    data[1]["timestamp"] = "2019-01-02T00:30:00"
+    return ProjectEvents(data)
+
+
+def test_duration_by_project_matches_per_object():
+    events = _events()
+    assert events.duration_by_project() == project.duration_by_project(events.events)
+
+
+def test_duration_by_day_by_project_matches_per_object():
+    events = _events()
+    result = events.duration_by_day_by_project()
+    expect = project.duration_by_day_by_project(events.events)
+    assert result == expect
+    assert list(result) == list(expect)
+    assert datetime.date(2019, 1, 1) in result
+
+
+def test_columns_rebuilt_when_events_replaced():
+    events = _events()
+    assert len(events.columns) == 500
+    events.events = events.events[:10]
+    assert len(events.columns) == 10
+
+
+def test_empty():
+    events = ProjectEvents([])
+    assert events.duration_by_project() == {}
+    assert events.duration_by_day_by_project() == {}
+    assert events.start_end_durations_by_project() == {}
+
+
+def test_event_data_round_trip():
+    data = project_event_data(1)[0]
+    event = project.ProjectEvent(data)
+    assert event.data == data
+    assert not hasattr(event, "__dict__")
+
+
+def test_from_aw_events():
+    data = project_event_data(20, projects=["a", "b"])
+    aw_events = [AWEvent(**event) for event in data]
+    events = ProjectEvents.from_aw_events(aw_events)
+    assert [event.data for event in events] == data
+    assert events.duration_by_project() == ProjectEvents(data).duration_by_project()
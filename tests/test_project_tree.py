@@ -0,0 +1,61 @@
+from aw_watcher_project.project_tree import ProjectFilter, ProjectTree
+
+PROJECTS = ["acme/site", "acme/app/ios", "acme/app/android", "internal", "acme"]
+
+
+def _children(tree, path=""):
+    return [(node.name, node.is_project, node.is_group) for node in tree.node(path).children.values()]
+
+
+def test_nests_by_prefix():
+    tree = ProjectTree(PROJECTS)
+    assert list(tree) == PROJECTS
+    assert len(tree) == 5
+    assert _children(tree) == [("acme", True, True), ("internal", True, False)]
+    assert _children(tree, "acme") == [("site", True, False), ("app", False, True)]
+    assert tree.node("acme/app/ios").path == "acme/app/ios"
+    assert tree.node("acme/missing") is None
+    assert "acme/app" not in tree
+
+
+def test_remove_prunes_empty_prefixes():
+    tree = ProjectTree(PROJECTS)
+    tree.remove("acme/app/ios")
+    assert _children(tree, "acme/app") == [("android", True, False)]
+    tree.remove("acme/app/android")
+    assert tree.node("acme/app") is None
+    tree.remove("acme")
+    assert _children(tree) == [("acme", False, True), ("internal", True, False)]
+    tree.remove("acme/site")
+    assert _children(tree) == [("internal", True, False)]
+
+
+def test_names_with_empty_parts_keep_their_name():
+    tree = ProjectTree(["a//b", "/x", "y/", "a/b"])
+    assert _children(tree) == [("a", False, True), ("x", True, False), ("y", True, False)]
+    # The node path drops empty parts, the project keeps the real name
+    assert tree.node("a//b").path == "a/b"
+    assert tree.node("a//b").project == "a//b"
+    assert tree.node("/x").project == "/x"
+    assert tree.node("y").project == "y/"
+    tree.remove("a//b")
+    assert tree.node("a/b").project == "a/b"
+    tree.remove("a/b")
+    assert tree.node("a") is None
+
+
+def test_parent_path():
+    tree = ProjectTree()
+    assert tree.parent_path("a/b/c") == "a/b"
+    assert tree.parent_path("a") == ""
+
+
+def test_filter_narrows_incrementally():
+    tree = ProjectTree(f"client-{i}/project-{j}" for i in range(20) for j in range(50))
+    project_filter = ProjectFilter(tree)
+    assert len(project_filter.matches("")) == 1000
+    assert len(project_filter.matches("client-1")) == 550
+    assert len(project_filter.matches("client-1/")) == 50
+    assert project_filter.matches("client-1/PROJECT-49") == ["client-1/project-49"]
+    # Deleting text searches everything again
+    assert len(project_filter.matches("project-49")) == 20
@@ -0,0 +1,176 @@
+import datetime
+import itertools
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from aw_watcher_project import get_activity, get_time_spent, report
+from aw_watcher_project.__main__ import app
+from aw_watcher_project.cache import QueryCache
+from aw_watcher_project.metrics import REGISTRY
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import dataset
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 1, 5, tzinfo=UTC)
+FIRST_DAY = BEGIN.date()
+LAST_DAY = datetime.date(2019, 1, 4)
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer() as server:
+        server.load(dataset(3, projects=["a", "b", "c"]))
+        yield server
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    client = server.client()
+    for module in (get_time_spent, get_activity, report):
+        monkeypatch.setattr(module, "get_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(report, "get_default_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def queries(client, monkeypatch):
+    periods = []
+    query = client.query
+
+    def counted(query_text, timeperiods, *args, **kwargs):
+        periods.extend(timeperiods)
+        return query(query_text, timeperiods, *args, **kwargs)
+
+    monkeypatch.setattr(client, "query", counted)
+    return periods
+
+
+def _report(**kwargs) -> report.Report:
+    return report.get_report(FIRST_DAY, LAST_DAY, tz=UTC, **kwargs)
+
+
+def test_matches_events(client, cache):
+    result = _report()
+    events = get_time_spent.get_events(BEGIN, END, use_cache=False)
+    assert result.by_project == pytest.approx(events.duration_by_project())
+    assert list(result.by_project.values()) == sorted(result.by_project.values(), reverse=True)
+    assert set(result.by_day) <= {FIRST_DAY + datetime.timedelta(days=i) for i in range(4)}
+    # 2019-01-01 is a Tuesday
+    assert set(result.by_week) == {datetime.date(2018, 12, 31)}
+    assert result.by_week[datetime.date(2018, 12, 31)] == pytest.approx(result.by_project)
+
+
+def test_apps_match_activity(client, cache):
+    result = _report()
+    activity = get_activity.get_activity_for_projects(None, BEGIN, END, use_cache=False)
+    for project, project_activity in activity.items():
+        apps = dict(result.top_apps(project, 1000))
+        titles = result.top_titles(project, 1000)
+        expected = sum(event.duration for event in project_activity.events)
+        assert sum(apps.values()) == pytest.approx(expected)
+        assert sum(seconds for _, _, seconds in titles) == pytest.approx(expected)
+        assert all(title.startswith(app) for app, title, _ in titles)
+    assert len(result.top_titles("a", 3)) == 3
+
+
+def test_stored_days_are_not_requeried(client, cache, queries):
+    first = _report()
+    assert queries
+    queries.clear()
+    second = _report()
+    assert queries == []
+    assert second.by_project == pytest.approx(first.by_project)
+    assert second.top_titles("a") == first.top_titles("a")
+
+
+def test_without_cache_or_windows(client, queries):
+    result = _report(use_cache=False, windows=False)
+    # One period per bucket, for the project and AFK buckets only
+    assert len(queries) == 2
+    assert result.top_apps("a") == []
+    assert result.total > 0
+
+
+def test_project_filter(client, cache):
+    result = _report(projects={"a", "c"})
+    assert set(result.by_project) == {"a", "c"}
+    data = result.to_dict(top=2)
+    assert set(data["top"]) == {"a", "c"}
+    assert all(len(top["apps"]) <= 2 for top in data["top"].values())
+    assert data["total"] == pytest.approx(sum(data["projects"].values()))
+    json.dumps(data)
+
+
+def test_day_boundaries_split_events():
+    project_events = [
+        {
+            "timestamp": "2019-01-01T23:00:00+00:00",
+            "duration": 7200.0,
+            "data": {"project": "a"},
+        }
+    ]
+    afk_events = [
+        {
+            "timestamp": "2019-01-01T00:00:00+00:00",
+            "duration": 2 * 86400.0,
+            "data": {"status": "not-afk"},
+        }
+    ]
+    periods = report.report_periods(FIRST_DAY, datetime.date(2019, 1, 2), UTC)
+    aggregates = report.compute_day_aggregates(project_events, afk_events, None, periods)
+    assert [aggregate["projects"] for aggregate in aggregates] == [{"a": 3600}, {"a": 3600}]
+
+
+def test_follow_only_computes_open_days(client, cache, monkeypatch):
+    monkeypatch.setattr(report.time, "sleep", lambda seconds: None)
+    computed = report.REPORT_DAYS.labels("computed")
+    before = computed.value
+    reports = list(
+        itertools.islice(
+            report.follow_report(FIRST_DAY, LAST_DAY, tz=UTC, interval=0), 3
+        )
+    )
+    assert computed.value - before == 4
+    assert reports[0].by_project == reports[2].by_project
+
+
+def test_cli(client, cache):
+    runner = CliRunner()
+    result = runner.invoke(
+        app, ["report", "--begin", "2019-01-01", "--end", "2019-01-04", "--top", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].split() == ["Project", "Time", "Share"]
+    assert any(line.startswith("Total") for line in lines)
+
+    result = runner.invoke(
+        app,
+        ["report", "--begin", "2019-01-01", "--end", "2019-01-04", "--by", "week",
+         "-p", "b", "--json"],
+    )
+    assert result.exit_code == 0, result.output
+    assert set(json.loads(result.output)["projects"]) == {"b"}
+
+    result = runner.invoke(app, ["report", "--by", "month"])
+    assert result.exit_code == 1
+
+
+def test_counter_names():
+    counters = [
+        name
+        for name, metric in REGISTRY.snapshot().items()
+        if metric["type"] == "counter"
+    ]
+    assert "aw_watcher_project_report_days_total" in counters
+    assert all(name.endswith("_total") for name in counters)
@@ -0,0 +1,157 @@
+import datetime
+import multiprocessing
+
+import pytest
+from aw_core import Event
+
+from aw_watcher_project import client as aw_client
+from aw_watcher_project.autoselect import (
+    AUTO_SELECT_CLIENT_NAME,
+    AutoSelectWatcher,
+    create_auto_select_watcher,
+)
+from aw_watcher_project.config import ProjectWatcherConfig, RuleData
+from aw_watcher_project.exc import RuleException
+from aw_watcher_project.rules import RuleSet, match_sequentially
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import window_event_data
+
+RULES = [
+    RuleData(project="docs", app="firefox", title=r"(?i)^readme"),
+    RuleData(project="watcher", path="/home/user/project-1/"),
+    RuleData(project="editor", app="jetbrains-*"),
+    RuleData(project="chat", app="slack", title="general$"),
+    RuleData(project="terminal", title=r"\bssh\b"),
+    RuleData(project="any-code", app="CODE"),
+]
+
+WINDOWS = [
+    ("firefox", "README.md - GitHub"),
+    ("firefox", "Issues - README"),
+    ("code", "file.py - /home/user/project-1/x.py"),
+    ("code", "file.py - /home/user/project-10/x.py"),
+    ("jetbrains-pycharm-ce", "main.py"),
+    ("slack", "general"),
+    ("slack", "general random"),
+    ("terminal", "ssh server"),
+    ("terminal", "sshd"),
+    ("Code", "anything"),
+    ("", ""),
+]
+
+
+@pytest.mark.parametrize("app, title", WINDOWS)
+def test_matches_like_sequential(app, title):
+    assert RuleSet(RULES).match(app, title) == match_sequentially(RULES, app, title)
+
+
+def test_first_rule_wins():
+    rules = RuleSet(
+        [RuleData(project="first", app="code"), RuleData(project="second", title="x")]
+    )
+    assert rules.match("code", "x") == "first"
+    assert rules.match("other", "x") == "second"
+    assert rules.match("other", "y") is None
+
+
+def test_synthetic_windows():
+    rules = [
+        RuleData(project=f"project-{i}", path=f"/project-{i}/") for i in range(0, 50, 3)
+    ] + [RuleData(project="slack", app="slack")]
+    rule_set = RuleSet(rules)
+    for event in window_event_data(500):
+        app, title = event["data"]["app"], event["data"]["title"]
+        assert rule_set.match(app, title) == match_sequentially(rules, app, title)
+
+
+def test_cache():
+    rules = RuleSet(RULES, cache_size=2)
+    for _ in range(3):
+        rules.match("slack", "general")
+    info = rules.match.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+
+
+def test_empty():
+    assert RuleSet([]).match("code", "title") is None
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"app": "code"},
+        {"project": "a"},
+        {"project": "a", "title": "("},
+        {"project": "a", "title": "(?P<name>x)"},
+        {"project": "a", "title": r"(x)\1"},
+    ],
+)
+def test_invalid_rules(rule):
+    with pytest.raises(RuleException):
+        RuleSet([rule])
+
+
+def test_rules_in_config(tmp_path):
+    path = tmp_path / "config.yml"
+    path.write_text(
+        "projects: [a]\nrules:\n  - project: a\n    app: code\n    title: '^x'\n"
+    )
+    config = ProjectWatcherConfig(path)
+    assert RuleSet.from_config(config).match("code", "xy") == "a"
+    config.add_project("b")
+    assert ProjectWatcherConfig(path).rules == config.rules
+
+
+def test_auto_select(tmp_path):
+    config = ProjectWatcherConfig(tmp_path / "config.yml")
+    config.rules = [RuleData(project="watcher", app="code")]
+    selected = []
+    start = datetime.datetime.now(datetime.timezone.utc)
+    with StandInServer() as server:
+        server.create_bucket("aw-watcher-window_stand-in", "currentwindow")
+        watcher = AutoSelectWatcher(server.client(), config, selected.append)
+        assert watcher.poll() is None
+
+        def show(i: int, app: str):
+            server.api.create_events(
+                "aw-watcher-window_stand-in",
+                [
+                    Event(
+                        timestamp=start + datetime.timedelta(seconds=i),
+                        data=dict(app=app, title="t"),
+                    )
+                ],
+            )
+
+        show(0, "code")
+        assert watcher.poll() == "watcher"
+        assert watcher.poll() == "watcher"
+        show(1, "slack")
+        assert watcher.poll() is None
+        show(2, "code")
+        watcher.poll()
+    assert selected == ["watcher", "watcher"]
+
+
+def _create_query_client():
+    aw_client.get_client()
+
+
+def test_auto_select_has_its_own_client(tmp_path):
+    watcher = create_auto_select_watcher(ProjectWatcherConfig(tmp_path / "config.yml"), print)
+    assert watcher.client.client_name == AUTO_SELECT_CLIENT_NAME
+    assert watcher.client is not aw_client.get_client()
+    # Reports run next to the daemon create their own query client
+    process = multiprocessing.get_context("fork").Process(target=_create_query_client)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+def test_auto_select_keeps_rules_on_error(tmp_path):
+    config = ProjectWatcherConfig(tmp_path / "config.yml")
+    config.rules = [RuleData(project="a", app="code")]
+    watcher = AutoSelectWatcher(None, config, print)
+    config.rules = [RuleData(project="b", title="(")]
+    watcher._update_rules()
+    assert watcher.rules.match("code", "") == "a"
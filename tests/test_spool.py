@@ -0,0 +1,162 @@
+import datetime
+import time
+
+import pytest
+import requests
+
+from aw_watcher_project.heartbeat import HeartbeatWorker
+from aw_watcher_project.spool import HeartbeatSpool
+from benchmarks.aw_server import StandInServer
+
+UTC = datetime.timezone.utc
+BUCKET_ID = "aw-watcher-project-selected_host"
+START = datetime.datetime(2021, 1, 1, 9, tzinfo=UTC)
+PULSETIME = 6
+
+
+def _pulses(projects):
+    """
+    One heartbeat every 5 seconds per project, with a closing heartbeat at
+    each switch like :class:`HeartbeatWorker` sends
+    """
+    pulse_time = START
+    pulses = []
+    previous = None
+    for project, count in projects:
+        if previous is not None:
+            pulses.append((pulse_time, previous))
+        for _ in range(count):
+            pulses.append((pulse_time, project))
+            pulse_time += datetime.timedelta(seconds=5)
+        previous = project
+    pulses.append((pulse_time, previous))
+    return pulses
+
+
+@pytest.fixture
+def spool(tmp_path) -> HeartbeatSpool:
+    spool = HeartbeatSpool(tmp_path / "spool.sqlite", batch_size=2)
+    yield spool
+    spool.close()
+
+
+@pytest.fixture
+def server():
+    with StandInServer() as server:
+        server.create_bucket(BUCKET_ID, "project-selection")
+        yield server
+
+
+def _append(spool, pulses):
+    for pulse_time, project in pulses:
+        spool.append(BUCKET_ID, pulse_time, {"project": project}, PULSETIME)
+
+
+def _server_events(server, client):
+    events = client.get_events(BUCKET_ID, limit=-1)
+    return sorted(
+        (event.timestamp, event.duration.total_seconds(), event.data["project"])
+        for event in events
+    )
+
+
+def test_segments(spool):
+    _append(spool, _pulses([("a", 3), ("b", 2), ("a", 1)]))
+    _append(spool, [(START + datetime.timedelta(minutes=5), "a")])
+    events = [segment.to_event() for segment in spool.segments()[BUCKET_ID]]
+    assert [(e.data["project"], e.duration.total_seconds()) for e in events] == [
+        ("a", 15), ("b", 10), ("a", 5), ("a", 0)
+    ]
+
+
+def test_replay_after_outage(server, spool):
+    client = server.client()
+    pulses = _pulses([("a", 30), ("b", 20), ("c", 10), ("a", 40), ("b", 5)])
+    server.stop()
+    _append(spool, pulses)
+    with pytest.raises(requests.RequestException):
+        spool.replay(client)
+    assert len(spool) == len(pulses)
+
+    server.start()
+    start = server.requests
+    assert spool.replay(client) == 5
+    # Two batches of closed segments and two heartbeats for the last one
+    assert server.requests - start == 4
+    assert len(spool) == 0
+    assert _server_events(server, client) == [
+        (START, 150, "a"),
+        (START + datetime.timedelta(seconds=150), 100, "b"),
+        (START + datetime.timedelta(seconds=250), 50, "c"),
+        (START + datetime.timedelta(seconds=300), 200, "a"),
+        (START + datetime.timedelta(seconds=500), 25, "b"),
+    ]
+
+
+def test_spool_survives_restart(server, tmp_path):
+    path = tmp_path / "spool.sqlite"
+    spool = HeartbeatSpool(path)
+    _append(spool, _pulses([("a", 3)]))
+    spool.close()
+
+    spool = HeartbeatSpool(path)
+    assert len(spool) == 4
+    spool.replay(server.client())
+    spool.close()
+    assert _server_events(server, server.client()) == [(START, 15, "a")]
+
+
+def test_worker_spools_while_server_down(server, spool):
+    client = server.client()
+    worker = HeartbeatWorker(client, BUCKET_ID, interval=0.05, spool=spool)
+    try:
+        server.stop()
+        worker.select("a")
+        _wait(lambda: len(spool) >= 5)
+        server.start()
+        _wait(lambda: len(spool) == 0 and len(_server_events(server, client)) == 1)
+    finally:
+        worker.stop(timeout=None)
+    [(_, duration, project)] = _server_events(server, client)
+    assert project == "a"
+    assert duration > 0.2
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_worker_creates_bucket_once_server_is_up(tmp_path):
+    server = StandInServer()
+    server.start()
+    server.stop()
+    client = server.client()
+    spool = HeartbeatSpool(tmp_path / "spool.sqlite")
+    worker = HeartbeatWorker(
+        client,
+        BUCKET_ID,
+        interval=0.05,
+        spool=spool,
+        event_type="project-selection",
+        retry_delay=0.05,
+        max_retry_delay=0.2,
+    )
+    try:
+        worker.select("a")
+        time.sleep(0.2)
+        worker.select("b")
+        time.sleep(0.2)
+        assert not worker.bucket_ready
+        assert worker.first_accepted_at is None
+        server.start()
+        _wait(lambda: worker.first_accepted_at is not None)
+        assert worker.bucket_ready
+        worker.stop(timeout=None)
+        assert [event[2] for event in _server_events(server, client)] == ["a", "b"]
+    finally:
+        worker.stop(timeout=None)
+        server.stop()
+        spool.close()
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+
+from aw_watcher_project import get_time_spent
+from aw_watcher_project.cache import QueryCache
+from benchmarks.aw_server import StandInServer
+from benchmarks.synthetic import afk_event_data, project_event_data
+
+UTC = datetime.timezone.utc
+BEGIN = datetime.datetime(2019, 1, 1, tzinfo=UTC)
+END = datetime.datetime(2019, 1, 15, tzinfo=UTC)
+
+
+def _within_day(event: dict) -> bool:
+    start = datetime.datetime.fromisoformat(event["timestamp"])
+    end = start + datetime.timedelta(seconds=event["duration"])
+    return start.date() == end.date()
+
+
+@pytest.fixture(scope="module")
+def server():
+    # Per-day server totals split events at midnight, the client-side path does not
+    project_events = [
+        event
+        for event in project_event_data(400, projects=["a", "b", "c"], start=BEGIN)
+        if _within_day(event)
+    ]
+    afk_events = [
+        event for event in afk_event_data(project_events) if _within_day(event)
+    ]
+    with StandInServer() as server:
+        server.create_bucket(
+            "aw-watcher-project-selected_host",
+            "project-selection",
+            events=project_events,
+        )
+        server.create_bucket("aw-watcher-afk_host", "afkstatus", events=afk_events)
+        yield server
+
+
+@pytest.fixture
+def client(server, monkeypatch, tmp_path):
+    client = server.client()
+    cache = QueryCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(get_time_spent, "get_client", lambda: client)
+    monkeypatch.setattr(get_time_spent, "get_default_cache", lambda: cache)
+    yield client
+    cache.close()
+
+
+@pytest.mark.parametrize("flood_time", [None, 300, 1e6])
+def test_summary_matches_client_side(client, flood_time):
+    events = get_time_spent.get_events(
+        BEGIN, END, flood_time=flood_time, use_cache=False
+    )
+    expect = events.duration_by_project()
+    assert len(expect) == 3
+    assert get_time_spent.get_duration_by_project(
+        BEGIN, END, flood_time=flood_time
+    ) == pytest.approx(expect)
+
+
+def test_summary_rejects_fractional_flood_time(client):
+    with pytest.raises(ValueError, match="whole seconds"):
+        get_time_spent.get_duration_by_project(BEGIN, END, flood_time=2.5)
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_summary_by_day_matches_client_side(client, use_cache):
+    events = get_time_spent.get_events(BEGIN, END, use_cache=False)
+    expect = events.duration_by_day_by_project()
+    result = get_time_spent.get_duration_by_day_by_project(
+        BEGIN, END, use_cache=use_cache
+    )
+    assert result.keys() == expect.keys()
+    for day, durations in expect.items():
+        assert result[day] == pytest.approx(durations)